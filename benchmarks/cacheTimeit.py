@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+Time repeated lookups of a small set of hot records in a screed database,
+with and without the ScreedDB record cache.
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import sys
+import time
+
+thisdir = sys.path[0]
+libdir = os.path.abspath(os.path.join(thisdir, '..'))
+sys.path.insert(0, libdir)
+
+import screed  # nopep8
+
+
+def time_lookups(db, keys):
+    start = time.time()
+    for key in keys:
+        str(db[key].sequence)
+    return time.time() - start
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print("Usage: %s <screed db> [<number of lookups>]" % sys.argv[0])
+        exit(1)
+
+    screedFile = sys.argv[1]
+    if not os.path.isfile(screedFile):
+        print("No such file: %s" % screedFile)
+        exit(1)
+    count = int(sys.argv[2]) if len(sys.argv) == 3 else 100000
+
+    # 90% of the lookups go to 1% of the records
+    db = screed.ScreedDB(screedFile)
+    keys = db.keys()
+    hot = random.sample(keys, max(1, len(keys) // 100))
+    keys = [random.choice(hot if random.random() < 0.9 else keys)
+            for _ in range(count)]
+    db.close()
+
+    print("[SCREED CACHE]%s:" % screedFile)
+    for cache_records in (None, len(hot), 10 * len(hot)):
+        db = screed.ScreedDB(screedFile, cache_records=cache_records)
+        elapsed = time_lookups(db, keys)
+        print("cache_records=%-8s %8d lookups %8.3f s %10.0f lookups/s" %
+              (cache_records, count, elapsed, count / elapsed))
+        info = db.cache_info()
+        if info is not None:
+            print("    hits %d, misses %d, %d records, %d bytes" %
+                  (info.hits, info.misses, info.records, info.bytes))
+        db.close()
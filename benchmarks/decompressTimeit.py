@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+Measure decompression plus parsing throughput of compressed FASTA/FASTQ
+files, e.g. the same reads compressed with each of gzip, bgzip, bzip2,
+xz, zstd and lz4. BGZF (bgzip) files are timed with 1 up to the number
+of CPUs threads, doubling each time.
+"""
+
+from __future__ import print_function
+
+import io
+import multiprocessing
+import os
+import sys
+import time
+
+thisdir = sys.path[0]
+libdir = os.path.abspath(os.path.join(thisdir, '..'))
+sys.path.insert(0, libdir)
+
+import screed  # nopep8
+from screed.streams import is_bgzf  # nopep8
+
+MAGIC = (
+    (b"\x1f\x8b\x08", "gz"),
+    (b"\x42\x5a\x68", "bz2"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+    (b"\xfd\x37\x7a\x58\x5a\x00", "xz"),
+    (b"\x04\x22\x4d\x18", "lz4"),
+)
+
+
+def codec(filename):
+    with io.open(filename, 'rb') as f:
+        start = f.read(1 << 10)
+    if is_bgzf(start):
+        return 'bgzf'
+    for magic, name in MAGIC:
+        if start.startswith(magic):
+            return name
+    return 'none'
+
+
+def time_parse(filename, **kwargs):
+    """
+    Parse the whole file once, returning the record count, the number of
+    sequence bytes and the wall time
+    """
+    start = time.time()
+    count = 0
+    bases = 0
+    with screed.open(filename, engine='block', mode='bytes',
+                     **kwargs) as records:
+        for record in records:
+            count += 1
+            bases += len(record.sequence)
+    return count, bases, time.time() - start
+
+
+def report(label, megabytes, count, bases, elapsed):
+    print("%-14s %10d records %8.3f s %12.0f records/s %8.1f Mbases/s "
+          "%8.1f MB/s compressed" %
+          (label, count, elapsed, count / elapsed, bases / elapsed / 1e6,
+           megabytes / elapsed))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: %s <filename> [<filename> ...]" % sys.argv[0])
+        exit(1)
+
+    for filename in sys.argv[1:]:
+        if not os.path.isfile(filename):
+            print("No such file: %s" % filename)
+            exit(1)
+
+    for filename in sys.argv[1:]:
+        name = codec(filename)
+        megabytes = os.path.getsize(filename) / float(1 << 20)
+        print("[SCREED DECOMPRESS]%s:" % filename)
+        if name != 'bgzf':
+            report(name, megabytes, *time_parse(filename))
+            continue
+
+        threads = 1
+        while threads <= multiprocessing.cpu_count():
+            report('bgzf %d threads' % threads, megabytes,
+                   *time_parse(filename, threads=threads))
+            threads *= 2
@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 # Copyright (c) 2016, The Regents of the University of California.
 
-import sys, os
+from __future__ import print_function
+
+import sys
 import random
 
 seqLength = 37
@@ -15,7 +17,7 @@ class collectionOFiles(object):
         self.fileHandles = {}
         for i in range(0, divisions):
             filename = self.baseName + "_%d" % i
-            fh = open(filename, "wb")
+            fh = open(filename, "w")
             divisor = 2 ** i
 
             self.fileHandles[filename]= (fh, self.totalSize/divisor, 0)
@@ -72,7 +74,7 @@ def createFastqFiles(filename, size, divisions):
 
 if __name__ == '__main__':
     if len(sys.argv) != 4:
-        print "Usage: <filename> <size> <divisions>"
+        print("Usage: <filename> <size> <divisions>")
         exit(1)
 
     filename = sys.argv[1]
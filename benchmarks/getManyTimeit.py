@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+Compare retrieving many random records from a screed database one key
+at a time with ScreedDB.get_many().
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import sys
+import time
+
+thisdir = sys.path[0]
+libdir = os.path.abspath(os.path.join(thisdir, '..'))
+sys.path.insert(0, libdir)
+
+import screed  # nopep8
+
+
+def time_lookups(db, keys):
+    start = time.time()
+    for key in keys:
+        str(db[key].sequence)
+    return time.time() - start
+
+
+def time_get_many(db, keys):
+    start = time.time()
+    for record in db.get_many(keys):
+        str(record.sequence)
+    return time.time() - start
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print("Usage: %s <screed db> [<number of keys>]" % sys.argv[0])
+        exit(1)
+
+    screedFile = sys.argv[1]
+    if not os.path.isfile(screedFile):
+        print("No such file: %s" % screedFile)
+        exit(1)
+    count = int(sys.argv[2]) if len(sys.argv) == 3 else 100000
+
+    db = screed.ScreedDB(screedFile)
+    keys = db.keys()
+    keys = [random.choice(keys) for _ in range(count)]
+
+    print("[SCREED GET MANY]%s:" % screedFile)
+    elapsed = time_lookups(db, keys)
+    print("%-10s %8d keys %8.3f s %10.0f records/s" %
+          ('getitem', count, elapsed, count / elapsed))
+    elapsed = time_get_many(db, keys)
+    print("%-10s %8d keys %8.3f s %10.0f records/s" %
+          ('get_many', count, elapsed, count / elapsed))
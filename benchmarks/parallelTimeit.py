@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+Measure how parsing an uncompressed FASTA/FASTQ file scales with the
+number of worker processes given to screed.open.
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import os
+import sys
+import time
+
+thisdir = sys.path[0]
+libdir = os.path.abspath(os.path.join(thisdir, '..'))
+sys.path.insert(0, libdir)
+
+import screed  # nopep8
+
+
+def time_workers(filename, workers, ordered):
+    """
+    Parse the whole file once, returning the record count and wall time
+    """
+    start = time.time()
+    count = 0
+    with screed.open(filename, workers=workers, ordered=ordered,
+                     mode='bytes') as records:
+        for _ in records:
+            count += 1
+    return count, time.time() - start
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print("Usage: %s <filename> [<max workers>]" % sys.argv[0])
+        exit(1)
+
+    filename = sys.argv[1]
+    if not os.path.isfile(filename):
+        print("No such file: %s" % filename)
+        exit(1)
+    if len(sys.argv) == 3:
+        max_workers = int(sys.argv[2])
+    else:
+        max_workers = multiprocessing.cpu_count()
+    megabytes = os.path.getsize(filename) / float(1 << 20)
+
+    print("[SCREED PARALLEL]%s:" % filename)
+    count, serial = time_workers(filename, None, True)
+    print("%-10s %10d records %8.3f s %8.1f MB/s" %
+          ('serial', count, serial, megabytes / serial))
+    workers = 1
+    while workers <= max_workers:
+        for ordered in (True, False):
+            count, elapsed = time_workers(filename, workers, ordered)
+            label = '%d%s' % (workers, '' if ordered else ' unord')
+            print("%-10s %10d records %8.3f s %8.1f MB/s %5.2fx" %
+                  (label, count, elapsed, megabytes / elapsed,
+                   serial / elapsed))
+        workers *= 2
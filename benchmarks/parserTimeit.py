@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+Compare the throughput of screed's parsing engines on a FASTA/FASTQ file.
+Reports records/sec and MB/sec (of the file as stored on disk).
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+thisdir = sys.path[0]
+libdir = os.path.abspath(os.path.join(thisdir, '..'))
+sys.path.insert(0, libdir)
+
+import screed  # nopep8
+
+ENGINES = ('line', 'block')
+
+
+def time_engine(filename, engine, repeat):
+    """
+    Parse the whole file 'repeat' times, returning the record count and
+    the best wall time
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        count = 0
+        with screed.open(filename, engine=engine) as records:
+            for _ in records:
+                count += 1
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return count, best
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print("Usage: %s <filename> [<repeat>]" % sys.argv[0])
+        exit(1)
+
+    filename = sys.argv[1]
+    if not os.path.isfile(filename):
+        print("No such file: %s" % filename)
+        exit(1)
+    repeat = int(sys.argv[2]) if len(sys.argv) == 3 else 3
+    megabytes = os.path.getsize(filename) / float(1 << 20)
+
+    print("[SCREED PARSE]%s:" % filename)
+    for engine in ENGINES:
+        count, elapsed = time_engine(filename, engine, repeat)
+        print("%-6s %10d records %8.3f s %12.0f records/s %8.1f MB/s" %
+              (engine, count, elapsed, count / elapsed, megabytes / elapsed))
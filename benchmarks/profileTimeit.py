@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+Measure the build time, peak memory and database size of each of the
+create_db build profiles, for a FASTA/FASTQ file such as those made by
+fqGen.py. Each build runs in a process of its own, so that its peak
+resident set size is its own. Build times vary a lot from one run to the
+next, so the profiles are built in turn a number of times (3 by default)
+and the median time is reported.
+"""
+
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+
+thisdir = sys.path[0]
+libdir = os.path.abspath(os.path.join(thisdir, '..'))
+sys.path.insert(0, libdir)
+
+from screed import createscreed  # nopep8
+from screed.DBConstants import fileExtension  # nopep8
+
+# Builds the database and prints its time and the peak RSS in KiB
+_BUILD = """
+import resource, sys, time
+sys.path.insert(0, %r)
+import screed
+start = time.time()
+screed.make_db(sys.argv[1], profile=sys.argv[2] or None)
+print(time.time() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def time_profile(filename, profile):
+    """
+    Build the database once with the profile, returning the wall time,
+    the peak RSS in MiB and the size of the database in MiB
+    """
+    output = subprocess.check_output([sys.executable, '-c', _BUILD % libdir,
+                                      filename, profile or ''])
+    elapsed, rss = output.split()
+    size = os.path.getsize(filename + fileExtension)
+    os.unlink(filename + fileExtension)
+    return float(elapsed), int(rss) / 1024.0, size / float(1 << 20)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print("Usage: %s <filename> [runs]" % sys.argv[0])
+        exit(1)
+
+    filename = sys.argv[1]
+    if not os.path.isfile(filename):
+        print("No such file: %s" % filename)
+        exit(1)
+    runs = int(sys.argv[2]) if len(sys.argv) == 3 else 3
+
+    profiles = [None] + sorted(createscreed.BUILD_PROFILES)
+    results = dict((profile, []) for profile in profiles)
+    for run in range(runs):
+        for profile in profiles:
+            results[profile].append(time_profile(filename, profile))
+
+    print("[SCREED PROFILES]%s:" % filename)
+    for profile in profiles:
+        times = sorted(elapsed for elapsed, rss, size in results[profile])
+        rss = max(rss for elapsed, rss, size in results[profile])
+        size = results[profile][-1][2]
+        print("%-12s %8.1f s %8.1f MiB RSS %8.1f MiB db" %
+              (profile or 'default', times[len(times) // 2], rss, size))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+Compare extracting many random regions from a screed database one slice
+at a time with ScreedDB.fetch_regions().
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import sys
+import time
+
+thisdir = sys.path[0]
+libdir = os.path.abspath(os.path.join(thisdir, '..'))
+sys.path.insert(0, libdir)
+
+import screed  # nopep8
+from screed.dna import reverse_complement_iupac  # nopep8
+
+
+def time_slices(db, intervals):
+    start = time.time()
+    for name, begin, end, strand in intervals:
+        region = db[name].sequence[begin:end]
+        if strand == '-':
+            region = reverse_complement_iupac(region)
+    return time.time() - start
+
+
+def time_fetch_regions(db, intervals):
+    start = time.time()
+    db.fetch_regions(intervals)
+    return time.time() - start
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print("Usage: %s <screed db> [<number of regions>]" % sys.argv[0])
+        exit(1)
+
+    screedFile = sys.argv[1]
+    if not os.path.isfile(screedFile):
+        print("No such file: %s" % screedFile)
+        exit(1)
+    count = int(sys.argv[2]) if len(sys.argv) == 3 else 100000
+
+    db = screed.ScreedDB(screedFile)
+    names = db.keys()
+    lengths = list(db.lengths())
+    intervals = []
+    for _ in range(count):
+        i = random.randrange(len(names))
+        begin = random.randrange(max(1, lengths[i] - 200))
+        intervals.append((names[i], begin, begin + 200, random.choice('+-')))
+
+    print("[SCREED REGIONS]%s:" % screedFile)
+    elapsed = time_slices(db, intervals)
+    print("%-14s %8d regions %8.3f s %10.0f regions/s" %
+          ('slices', count, elapsed, count / elapsed))
+    elapsed = time_fetch_regions(db, intervals)
+    print("%-14s %8d regions %8.3f s %10.0f regions/s" %
+          ('fetch_regions', count, elapsed, count / elapsed))
@@ -1,22 +1,24 @@
 #!/usr/bin/env python
 # Copyright (c) 2016, The Regents of the University of California.
 
+from __future__ import print_function
+
 import timeit
 import sys
 import os
 
 if __name__ == '__main__':
     if len(sys.argv) != 2:
-        print "Usage: %s <filename>" % sys.argv[0]
+        print("Usage: %s <filename>" % sys.argv[0])
         exit(1)
 
     screedFile = sys.argv[1]
     if not os.path.isfile(screedFile):
-        print "No such file: %s" % screedFile
+        print("No such file: %s" % screedFile)
         exit(1)
 
     runStatement = """
-for i in xrange(0, 100000):
+for i in range(0, 100000):
     entry = str(db[random.choice(keys)].sequence)
 """
 
@@ -33,5 +35,5 @@ keys = db.keys()
 
     t = timeit.Timer(runStatement, setupStatement)
 
-    print "[SCREED RUN]%s:" % screedFile
-    print t.repeat(2, 1)
+    print("[SCREED RUN]%s:" % screedFile)
+    print(t.repeat(2, 1))
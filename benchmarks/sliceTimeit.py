@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+Time slicing regions out of a synthetic chromosome-scale record, stored
+with each of the create_db storages, at increasing offsets into it.
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+thisdir = sys.path[0]
+libdir = os.path.abspath(os.path.join(thisdir, '..'))
+sys.path.insert(0, libdir)
+
+import screed  # nopep8
+from screed.createscreed import STORAGES  # nopep8
+
+LINE_LENGTH = 60
+
+
+def write_record(filename, length):
+    # Random 1 Mbp block, repeated
+    block = ''.join(random.choice('ACGT') for _ in range(1 << 20))
+    with open(filename, 'w') as fp:
+        fp.write('>chrSynthetic\n')
+        written = 0
+        while written < length:
+            text = block[:min(len(block), length - written)]
+            for start in range(0, len(text), LINE_LENGTH):
+                fp.write(text[start:start + LINE_LENGTH] + '\n')
+            written += len(text)
+
+
+def time_slices(db, offsets, size):
+    start = time.time()
+    for offset in offsets:
+        db['chrSynthetic'].sequence[offset:offset + size]
+    return time.time() - start
+
+
+def time_slices_one_record(db, offsets, size):
+    start = time.time()
+    sequence = db['chrSynthetic'].sequence
+    for offset in offsets:
+        sequence[offset:offset + size]
+    return time.time() - start
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (1, 2, 3):
+        print("Usage: %s [<length in Mbp> [<number of slices>]]" % sys.argv[0])
+        exit(1)
+
+    length = int(float(sys.argv[1]) * 1e6) if len(sys.argv) > 1 else 200000000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    size = 1000
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        fasta = os.path.join(tempdir, 'chr.fa')
+        write_record(fasta, length)
+
+        print("[SCREED SLICE] %d bp record, %d slices of %d bp:" %
+              (length, count, size))
+        for storage in sorted(STORAGES):
+            filename = os.path.join(tempdir, storage + '.fa')
+            shutil.copy(fasta, filename)
+            start = time.time()
+            screed.make_db(filename, storage=storage)
+            print("%-8s build %8.3f s" % (storage, time.time() - start))
+
+            db = screed.ScreedDB(filename)
+            for fraction in (0, 0.5, 0.99):
+                at = int(length * fraction)
+                offsets = [random.randint(at, at + length // 100 - size)
+                           for _ in range(count)]
+                for label, fn in (('lookup', time_slices),
+                                  ('reuse', time_slices_one_record)):
+                    elapsed = fn(db, offsets, size)
+                    print("%-8s %-6s at %3d%% %8.3f s %8.2f ms/slice" %
+                          (storage, label, fraction * 100, elapsed,
+                           elapsed * 1000 / count))
+            db.close()
+    finally:
+        shutil.rmtree(tempdir)
@@ -16,11 +16,37 @@ _PRIMARY_KEY = 'id'
 # Names of roles
 _STANDARD_TEXT = 'STANDARDATTR'
 _SLICEABLE_TEXT = 'SLICEABLEATTR'
+_SLICEABLE_BLOB = 'SLICEABLEBLOBATTR'
+_SLICEABLE_CHUNKED = 'SLICEABLECHUNKEDATTR'
+_SLICEABLE_2BIT = 'SLICEABLE2BITATTR'
 _INDEXED_TEXT_KEY = 'TEXTKEYATTR'
 _PRIMARY_KEY_ROLE = 'INTKEYATTR'
+_LENGTH_ROLE = 'LENGTHATTR'
+_FORMAT_VERSION_ROLE = 'FORMATVERSION'
+
+# Suffix of the columns holding the lengths of sliceable fields (and of
+# data fields in version 2 databases), which are listed in _SCREEDADMIN
+# with the _LENGTH_ROLE
+_LENGTH_SUFFIX = '_length'
 
 # Name of table holding sequence information
 _DICT_TABLE = 'DICTIONARY_TABLE'
 
 # The file extension given to all screed databases
 fileExtension = '_screed'
+
+# Suffix of the names of the tables holding the chunks of chunked fields,
+# and their columns: the id of the record, the offset of the chunk in the
+# field and the chunk itself
+_CHUNK_TABLE_SUFFIX = '_CHUNKS'
+_CHUNK_COLUMNS = ('record', 'start', 'data')
+
+# Versions of the database layout. Version 1 keeps all fields in
+# _DICT_TABLE; version 2 keeps the _DATA_FIELDS in tables of their own,
+# named after the field with _DATA_TABLE_SUFFIX and keyed by record id,
+# so that _DICT_TABLE only holds narrow metadata rows. The version is
+# listed in _SCREEDADMIN, as the field name of a _FORMAT_VERSION_ROLE row;
+# databases without one are version 1
+_FORMAT_VERSIONS = (1, 2)
+_DATA_FIELDS = ('sequence', 'quality')
+_DATA_TABLE_SUFFIX = '_DATA'
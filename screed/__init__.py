@@ -32,7 +32,8 @@ from screed.createscreed import create_db, make_db
 from screed.seqparse import read_fastq_sequences
 from screed.seqparse import read_fasta_sequences
 from screed.dna import rc
-from screed.screedRecord import Record
+from screed.screedRecord import Record, FastaRecord, FastqRecord
+from screed.batch import RecordBatch
 
 from screed._version import get_versions
 __version__ = get_versions()['version']
@@ -0,0 +1,244 @@
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+Columnar batches of sequence records, for code that works on whole arrays
+of sequences at a time instead of one record object per sequence.
+"""
+
+from __future__ import absolute_import
+
+from array import array
+from itertools import islice
+
+from .fasta import _fasta_block_events
+from .fastq import _fastq_block_fields
+from .utils import check_mode, DEFAULT_BLOCK_SIZE
+
+try:
+    import numpy
+except ImportError:
+    pass
+
+try:
+    array('q')
+    _INDEX_TYPECODE = 'q'
+except ValueError:  # No 64-bit typecode before Python 3.3
+    _INDEX_TYPECODE = 'l'
+
+DEFAULT_BATCH_SIZE = 65536
+
+
+def _as_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode('utf-8')
+
+
+class RecordBatch(object):
+
+    """
+    A batch of records stored column by column. 'sequences' is all the
+    sequences concatenated into one buffer; sequence i is found at
+    offsets[i] and is lengths[i] bytes long. 'qualities' is laid out
+    the same way for FASTQ records and is None for FASTA records.
+    'names' is a list with the name of each record.
+    """
+
+    def __init__(self, names, sequences, offsets, lengths, qualities=None):
+        self.names = names
+        self.sequences = sequences
+        self.offsets = offsets
+        self.lengths = lengths
+        self.qualities = qualities
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a batch from an iterable of records. Fields that are not
+        already bytes (e.g. str) are UTF-8 encoded.
+        """
+        names = []
+        sequences = []
+        qualities = []
+        for record in records:
+            names.append(record.name)
+            sequences.append(_as_bytes(record.sequence))
+            if qualities is not None:
+                try:
+                    qualities.append(_as_bytes(record.quality))
+                except AttributeError:  # No quality, e.g. FASTA
+                    qualities = None
+
+        lengths = array(_INDEX_TYPECODE, [len(s) for s in sequences])
+        offsets = array(_INDEX_TYPECODE, [0]) * len(lengths)
+        position = 0
+        for i, length in enumerate(lengths):
+            offsets[i] = position
+            position += length
+
+        if qualities is not None:
+            qualities = b''.join(qualities)
+        return cls(names, b''.join(sequences), offsets, lengths, qualities)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return "<%s of %d records>" % (self.__class__.__name__, len(self))
+
+    def sequence(self, i):
+        """
+        Returns the sequence of record i from the sequence buffer
+        """
+        start = self.offsets[i]
+        return self.sequences[start:start + self.lengths[i]]
+
+    def quality(self, i):
+        """
+        Returns the quality of record i from the quality buffer
+        """
+        if self.qualities is None:
+            raise AttributeError('quality')
+        start = self.offsets[i]
+        return self.qualities[start:start + self.lengths[i]]
+
+    def to_numpy(self):
+        """
+        Returns a copy-free view of this batch with NumPy arrays: uint8
+        arrays for the sequence and quality buffers and integer arrays,
+        of the type of the offset and length arrays, for the offsets and
+        lengths.
+        """
+        try:
+            numpy
+        except NameError:
+            raise Exception("error: numpy is needed for this " +
+                            "functionality, but is not installed.")
+
+        qualities = self.qualities
+        if qualities is not None:
+            qualities = numpy.frombuffer(qualities, dtype=numpy.uint8)
+        return RecordBatch(self.names,
+                           numpy.frombuffer(self.sequences,
+                                            dtype=numpy.uint8),
+                           numpy.frombuffer(self.offsets,
+                                            dtype=_dtype(self.offsets)),
+                           numpy.frombuffer(self.lengths,
+                                            dtype=_dtype(self.lengths)),
+                           qualities)
+
+
+def _dtype(indices):
+    """
+    Returns the NumPy type of the items of the array 'indices'. NumPy
+    names the C integer types with the same codes as the array module,
+    so 'l' is a C long, of whatever size it has on this platform.
+    """
+    return numpy.dtype(indices.typecode)
+
+
+def iter_batches(records, n=DEFAULT_BATCH_SIZE):
+    """
+    Iterator over RecordBatch objects of up to 'n' records each, built
+    from the given record iterator.
+    """
+    records = iter(records)
+    while True:
+        batch = list(islice(records, n))
+        if not batch:
+            break
+        yield RecordBatch.from_records(batch)
+
+
+def _index_array():
+    return array(_INDEX_TYPECODE)
+
+
+def _decode_names(names, mode):
+    if mode == 'bytes':
+        return names
+    return [name.decode('utf-8') for name in names]
+
+
+def _fasta_batches(handle, n, parse_description, bufsize, mode):
+    """
+    Iterator over RecordBatch objects of the FASTA records in 'handle',
+    filled from the header and sequence pieces of _fasta_block_events.
+    """
+    names = []
+    sequences = bytearray()
+    offsets = _index_array()
+    lengths = _index_array()
+    for is_header, value in _fasta_block_events(handle, bufsize, 'bytes'):
+        if not is_header:
+            sequences += value
+            continue
+        if names:
+            lengths.append(len(sequences) - offsets[-1])
+            if len(names) == n:
+                yield RecordBatch(_decode_names(names, mode),
+                                  bytes(sequences), offsets, lengths)
+                names = []
+                sequences = bytearray()
+                offsets = _index_array()
+                lengths = _index_array()
+        name = value[1:]
+        if parse_description:
+            name = name.split(b' ', 1)[0]
+        names.append(name.strip())
+        offsets.append(len(sequences))
+
+    if names:
+        lengths.append(len(sequences) - offsets[-1])
+        yield RecordBatch(_decode_names(names, mode), bytes(sequences),
+                          offsets, lengths)
+
+
+def _fastq_batches(handle, n, parse_description, bufsize, mode):
+    """
+    Iterator over RecordBatch objects of the FASTQ records in 'handle',
+    filled from the fields scanned by _fastq_block_fields.
+    """
+    fields = _fastq_block_fields(handle, parse_description, bufsize, 'bytes')
+    while True:
+        names = []
+        sequences = []
+        qualities = []
+        for name, _, sequence, quality in islice(fields, n):
+            names.append(name)
+            sequences.append(sequence)
+            qualities.append(quality)
+        if not names:
+            break
+
+        lengths = array(_INDEX_TYPECODE, map(len, sequences))
+        offsets = _index_array()
+        position = 0
+        for length in lengths:
+            offsets.append(position)
+            position += length
+        yield RecordBatch(_decode_names(names, mode), b''.join(sequences),
+                          offsets, lengths, b''.join(qualities))
+
+
+_SCANNERS = {'>': _fasta_batches, '@': _fastq_batches}
+
+
+def scan_batches(handle, first_char, n=DEFAULT_BATCH_SIZE,
+                 parse_description=False, bufsize=DEFAULT_BLOCK_SIZE,
+                 mode='text', slots=False):
+    """
+    Iterator over RecordBatch objects of up to 'n' records each, read
+    from the FASTA ('>') or FASTQ ('@') file handle without building a
+    record per sequence: the input is scanned in blocks of 'bufsize'
+    bytes like the 'block' engine does, and the sequences and
+    qualities go into the batch buffers as read, undecoded. Names are
+    decoded in 'text' mode, as iter_batches over records parsed with
+    the same options would return them. 'slots' is accepted for
+    symmetry with the parsers and has no effect.
+    """
+    check_mode(mode)
+    if first_char not in _SCANNERS:
+        raise ValueError("unknown file format: '%s'" % first_char)
+    return _SCANNERS[first_char](handle, n, parse_description, bufsize,
+                                 mode)
@@ -0,0 +1,109 @@
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+Bounded least-recently-used cache of records, used by ScreedDB to keep
+frequently requested records in memory.
+"""
+
+from __future__ import absolute_import
+
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'records', 'bytes',
+                                     'max_records', 'max_bytes'])
+
+
+def record_size(record):
+    """
+    Returns the number of characters held in the fields of 'record',
+    the measure of its size used by RecordCache.
+    """
+    size = 0
+    for value in record.values():
+        if not isinstance(value, int):
+            size += len(value)
+    return size
+
+
+class RecordCache(object):
+
+    """
+    Mapping of keys to records that holds at most 'max_records' records
+    and 'max_bytes' characters of field values, evicting the least
+    recently used records first. Either limit can be None for no limit.
+    A record larger than 'max_bytes' on its own is never kept.
+    """
+
+    def __init__(self, max_records=None, max_bytes=None):
+        if max_records is not None and max_records < 0:
+            raise ValueError("max_records must not be negative")
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self._records = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, key):
+        """
+        Returns the record kept for 'key', or None, and counts a hit or a
+        miss.
+        """
+        try:
+            record, size = self._records.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self._records[key] = (record, size)  # Now the most recently used
+        self.hits += 1
+        return record
+
+    def put(self, key, record):
+        """
+        Keeps 'record' for 'key', evicting records until the cache is
+        within its limits again.
+        """
+        size = record_size(record)
+        if not self.fits(size):
+            return
+
+        old = self._records.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._records[key] = (record, size)
+        self._bytes += size
+
+        while (self.max_records is not None and
+               len(self._records) > self.max_records) or \
+                (self.max_bytes is not None and self._bytes > self.max_bytes):
+            _, (_, evicted) = self._records.popitem(last=False)
+            self._bytes -= evicted
+
+    def fits(self, size):
+        """
+        Tells whether a record of 'size' characters would be kept.
+        """
+        if self.max_bytes is not None and size > self.max_bytes:
+            return False
+        return self.max_records != 0
+
+    def clear(self):
+        """
+        Drops all records and resets the statistics.
+        """
+        self._records.clear()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """
+        Returns the statistics and limits of the cache as a CacheInfo.
+        """
+        return CacheInfo(self.hits, self.misses, len(self._records),
+                         self._bytes, self.max_records, self.max_bytes)
@@ -54,7 +54,7 @@ def ToFastq(dbFile, outputFile):
     outFile = open(outputFile, 'wb')
     db = ScreedDB(dbFile)
 
-    for n, value in enumerate(db.itervalues()):
+    for n, value in enumerate(db.itervalues(lazy=False)):
         line = '@%s %s\n%s\n+\n%s\n' % (value['name'],
                                         GetComments(value),
                                         linewrap(str(value['sequence'])),
@@ -74,7 +74,7 @@ def ToFasta(dbFile, outputFile):
     outFile = open(outputFile, 'wb')
     db = ScreedDB(dbFile)
 
-    for n, value in enumerate(db.itervalues()):
+    for n, value in enumerate(db.itervalues(lazy=False)):
         line = '>%s %s\n%s\n' % (value['name'], GetComments(value),
                                  linewrap(str(value['sequence'])))
         outFile.write(line.encode('UTF-8'))
@@ -3,44 +3,422 @@
 from __future__ import absolute_import
 
 import argparse
+import functools
+import io
 import itertools
 import os
+import re
 try:
     import sqlite3
 except ImportError:
     pass
 import itertools
 import sys
+import time
+from contextlib import contextmanager
 
-from . import DBConstants, fasta, fastq, openscreed
+from . import DBConstants, dedup, fasta, fastq, openscreed, parallel, twobit
 
+# Types of the file names create_db reads records from
+try:
+    _FILENAME_TYPES = (basestring,)
+except NameError:
+    _FILENAME_TYPES = (str, bytes)
+
+# Ways of storing sliceable fields, and the roles they are given in
+# _SCREEDADMIN: 'text' is a TEXT column sliced with substr(), 'blob' is a
+# BLOB column sliced with incremental blob I/O, 'chunked' splits them
+# into pieces kept in a table of their own, of which slices read only the
+# ones they overlap, and '2bit' packs DNA four bases per byte in a BLOB
+# column (see the twobit module)
+STORAGES = {
+    'text': DBConstants._SLICEABLE_TEXT,
+    'blob': DBConstants._SLICEABLE_BLOB,
+    'chunked': DBConstants._SLICEABLE_CHUNKED,
+    '2bit': DBConstants._SLICEABLE_2BIT,
+}
+
+# Default size of the pieces of chunked fields
+DEFAULT_SEQUENCE_CHUNK = 1 << 14
+
+# Number of chunks inserted at a time, which bounds the memory used for
+# them
+_CHUNK_BATCH = 1000
+
+# Column types of roles stored as something else than TEXT
+_COLUMN_TYPES = {
+    DBConstants._SLICEABLE_BLOB: 'BLOB',
+    DBConstants._SLICEABLE_2BIT: 'BLOB',
+}
+
+# SQLite settings create_db can be given, in the order they are applied:
+# the page size must be set before anything is written, and before the
+# journal mode
+PRAGMAS = ('page_size', 'journal_mode', 'synchronous', 'locking_mode',
+           'cache_size', 'temp_store', 'mmap_size')
+
+# Settings of a build without a profile. The database is only usable once
+# it is complete, so there's no point in syncing it while it's written
+_DEFAULT_PRAGMAS = {
+    'synchronous': 'OFF',
+    'locking_mode': 'EXCLUSIVE',
+}
+
+# Settings replacing the default ones when appending: the database was
+# complete before, and the rollback journal must reach the disk before the
+# database is written for a crash or power loss to leave it as it was
+_APPEND_PRAGMAS = {
+    'synchronous': 'FULL',
+}
+
+# Named sets of settings, on top of the default ones. Parsing takes most
+# of the time of a build, and only the settings measured to make builds
+# faster are kept (see benchmarks/profileTimeit.py): 'fast' has 16 KiB
+# pages, which make for fewer B-tree pages to write. A larger page cache,
+# sorting the index in memory or memory-mapping the file all made builds
+# slower, or no faster, and a smaller cache saved no memory
+BUILD_PROFILES = {
+    'fast': {
+        'page_size': 16384,
+    },
+}
 
-def create_db(filepath, fields, rcrditer):
+_PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+# Stages of a build timed by create_db, in the order they are printed
+_STAGES = ('parse', 'workers', 'duplicates', 'insert', 'index', 'total')
+
+# Functions encoding the values of roles that are not stored as they are
+_ENCODERS = {
+    DBConstants._SLICEABLE_2BIT: twobit.encode,
+}
+
+
+def _iter_chunks(sequence, size):
     """
-    Creates a screed database in the given filepath. Fields is a tuple
-    specifying the names and relative order of attributes in a
-    record. rcrditer is an iterator returning records over a
-    sequence dataset. Records yielded are in dictionary form
+    Iterator over pieces of 'size' characters (the last one may be
+    shorter) of a sequence, or of an iterator over consecutive pieces of
+    a sequence as returned by the 'stream' parsing engine.
     """
+    if iter(sequence) is sequence:
+        pieces = sequence
+    elif isinstance(sequence, bytes):
+        pieces = [sequence]
+    else:
+        pieces = [str(sequence)]
+
+    buffered = []
+    count = 0
+    for piece in pieces:
+        buffered.append(piece)
+        count += len(piece)
+        if count >= size:
+            data = piece[:0].join(buffered)
+            end = count - count % size
+            for start in range(0, end, size):
+                yield data[start:start + size]
+            buffered = [data[end:]]
+            count -= end
+    if count:
+        yield buffered[0][:0].join(buffered)
+
+
+@contextmanager
+def _timed(timings, stage):
+    """
+    Adds the time spent in the block to the 'stage' entry of 'timings'.
+    """
+    start = time.time()
     try:
-        sqlite3
-    except NameError:
-        raise Exception("error: sqlite3 is needed for this functionality" +
-                        " but is not installed.")
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0) + time.time() - start
 
-    if not filepath.endswith(DBConstants.fileExtension):
-        filepath += DBConstants.fileExtension
 
-    if os.path.exists(filepath):  # Remove existing files
-        os.unlink(filepath)
+def _rows(rcrditer, fields):
+    """
+    Iterator over the tuples of the values of 'fields' of the records of
+    'rcrditer', as taken by _insert().
+    """
+    data = (tuple(record[fieldname] for fieldname, role in fields)
+            for record in rcrditer)
+    encoded = [i for i, (field, role) in enumerate(fields)
+               if role in _ENCODERS]
+    if encoded:
+        data = (_encode(row, fields, encoded) for row in data)
+    return data
 
-    con = sqlite3.connect(filepath)
-    cur = con.cursor()
 
-    # Sqlite PRAGMA settings for speed
-    cur.execute("PRAGMA synchronous='OFF'")
-    cur.execute("PRAGMA locking_mode=EXCLUSIVE")
+def _insert(cur, fields, types, lengths, rows, separate=(), timings=None,
+            duplicates=None, keyindex=0, last_id=0):
+    """
+    Inserts the 'rows' made by _rows() into the dictionary table, and
+    their fields named in 'separate' into tables of their own. The time
+    spent waiting for rows and inserting them is added to the 'parse'
+    and 'insert' entries of 'timings'.
+
+    With 'duplicates', a dedup.DuplicateFilter, the key of each row, its
+    field at 'keyindex', is checked before the row is inserted, and the
+    time spent doing so added to the 'duplicates' entry of 'timings'.
+    The ids of the rows are numbered on from 'last_id'.
+    """
+    if timings is None:
+        timings = {}
+
+    # Setup the 'qmarks' sqlite substring. Values are cast to TEXT so that
+    # records parsed in 'bytes' mode are stored without decoding them first.
+    # Lengths are computed by sqlite from the same parameters, except for
+    # encoded fields, whose lengths are passed after the fields. With
+    # separate fields the record id is passed last, and every query takes
+    # the same parameters
+    encoded = [i for i, (field, role) in enumerate(fields)
+               if role in _ENCODERS]
+    if encoded and not lengths:
+        # No length columns (when appending to a database that predates
+        # them), so the lengths of the encoded fields are left out
+        rows = (tuple(row[:len(fields)]) for row in rows)
+        encoded = []
+    casts = ['CAST(?%d AS %s)' % (i + 1, columnType)
+             for i, columnType in enumerate(types)]
+    columns = [(fieldname, cast) for (fieldname, role), cast
+               in zip(fields, casts) if fieldname not in separate]
+    columns += [(lengthfield,
+                 '?%d' % (len(fields) + encoded.index(i) + 1)
+                 if i in encoded else 'length(CAST(?%d AS TEXT))' % (i + 1))
+                for i, lengthfield in lengths]
+    rowid = '?%d' % (len(fields) + len(encoded) + 1)
+    if separate:
+        columns.insert(0, (DBConstants._PRIMARY_KEY, rowid))
+
+    # Setup the sql substring for inserting fields into database
+    fieldsub = ','.join([column for column, qmark in columns])
+    qmarks = ','.join([qmark for column, qmark in columns])
+
+    queries = ['INSERT INTO %s (%s) VALUES (%s)' %
+               (DBConstants._DICT_TABLE, fieldsub, qmarks)]
+    queries.extend(['INSERT INTO %s (%s, %s) VALUES (%s, %s)' %
+                    (fieldname + DBConstants._DATA_TABLE_SUFFIX,
+                     DBConstants._PRIMARY_KEY, fieldname, rowid, cast)
+                    for (fieldname, role), cast in zip(fields, casts)
+                    if fieldname in separate])
+
+    # Pull data from the iterator and store in database
+    # Commiting in batches seems faster than a single call to executemany
+    rowid = last_id
+    while True:
+        with _timed(timings, 'parse'):
+            batch = list(itertools.islice(rows, 10000))
+        if not batch:
+            break
+        if duplicates is not None:
+            with _timed(timings, 'duplicates'):
+                batch = _deduplicate(batch, duplicates, keyindex)
+        if separate:
+            batch = [tuple(row) + (i,)
+                     for i, row in enumerate(batch, rowid + 1)]
+        rowid += len(batch)
+        with _timed(timings, 'insert'):
+            for query in queries:
+                cur.executemany(query, batch)
+        if duplicates is not None:
+            duplicates.flushed()
+
+
+def _deduplicate(rows, duplicates, keyindex):
+    """
+    Returns the 'rows' kept by the dedup.DuplicateFilter 'duplicates',
+    with the keys, at 'keyindex', it gives them.
+    """
+    kept = []
+    for row in rows:
+        key = duplicates.check(row[keyindex])
+        if key is None:
+            continue
+        if key is not row[keyindex]:
+            row = list(row)
+            row[keyindex] = key
+        kept.append(row)
+    return kept
+
+
+def _encode(row, fields, encoded):
+    """
+    Returns 'row' with its fields at the indices 'encoded' encoded,
+    followed by their lengths.
+    """
+    row = list(row)
+    sizes = []
+    for i in encoded:
+        sizes.append(len(row[i]))
+        row[i] = _ENCODERS[fields[i][1]](row[i])
+    return row + sizes
+
+
+def _insert_chunked(cur, fields, types, lengths, rcrditer, chunk_size,
+                    separate=(), timings=None, duplicates=None, keyindex=0,
+                    last_id=0):
+    """
+    Inserts the records of 'rcrditer' into a database whose chunked
+    fields are stored in tables of their own, as are the fields named in
+    'separate'. The chunks of a record are inserted as they are read,
+    before its row, so that only a batch of chunks is ever held in
+    memory. Timings are added to 'timings', keys checked against
+    'duplicates' and ids numbered on from 'last_id', as by _insert().
+    """
+    if timings is None:
+        timings = {}
+    started = time.time()
+    inserting = timings.get('insert', 0)
+
+    def executemany(query, rows):
+        with _timed(timings, 'insert'):
+            cur.executemany(query, rows)
+
+    chunked = [field for field, role in fields
+               if role == DBConstants._SLICEABLE_CHUNKED]
+    stored = [(field, columnType) for (field, role), columnType
+              in zip(fields, types)
+              if field not in chunked and field not in separate]
+    sliceable = [fields[i][0] for i, lengthfield in lengths]
+    keyfield = fields[keyindex][0]
+    checking = 0
+
+    query = 'INSERT INTO %s (%s) VALUES (%s)' % \
+        (DBConstants._DICT_TABLE,
+         ','.join([DBConstants._PRIMARY_KEY] +
+                  [field for field, columnType in stored] +
+                  [lengthfield for i, lengthfield in lengths]),
+         ','.join(['?'] +
+                  ['CAST(? AS %s)' % columnType
+                   for field, columnType in stored] +
+                  ['?'] * len(lengths)))
+    chunkQueries = dict(
+        (field, 'INSERT INTO %s (%s) VALUES (?, ?, CAST(? AS TEXT))' %
+         (field + DBConstants._CHUNK_TABLE_SUFFIX,
+          ','.join(DBConstants._CHUNK_COLUMNS)))
+        for field in chunked)
+    separateQueries = dict(
+        (field, 'INSERT INTO %s (%s, %s) VALUES (?, CAST(? AS %s))' %
+         (field + DBConstants._DATA_TABLE_SUFFIX, DBConstants._PRIMARY_KEY,
+          field, columnType))
+        for (field, role), columnType in zip(fields, types)
+        if field in separate)
+    separateRows = dict((field, []) for field in separateQueries)
+
+    rows = []
+    chunks = dict((field, []) for field in chunked)
+    rowid = last_id
+    for record in rcrditer:
+        key = record[keyfield]
+        if duplicates is not None:
+            checked = time.time()
+            key = duplicates.check(key)
+            checking += time.time() - checked
+            if key is None:
+                continue
+        rowid += 1
+        size = {}
+        for field in chunked:
+            start = 0
+            batch = chunks[field]
+            for chunk in _iter_chunks(record[field], chunk_size):
+                batch.append((rowid, start, chunk))
+                start += len(chunk)
+                if len(batch) >= _CHUNK_BATCH:
+                    executemany(chunkQueries[field], batch)
+                    del batch[:]
+            size[field] = start
+
+        row = [rowid] + [key if field == keyfield else record[field]
+                         for field, columnType in stored]
+        for field in sliceable:
+            row.append(size[field] if field in size else len(record[field]))
+        rows.append(row)
+        for field in separateRows:
+            separateRows[field].append((rowid, record[field]))
+        if len(rows) >= 10000:
+            executemany(query, rows)
+            rows = []
+            if duplicates is not None:
+                duplicates.flushed()
+            for field in separateRows:
+                executemany(separateQueries[field], separateRows[field])
+                separateRows[field] = []
+
+    for field in chunked:
+        executemany(chunkQueries[field], chunks[field])
+    executemany(query, rows)
+    for field in separateRows:
+        executemany(separateQueries[field], separateRows[field])
+    if duplicates is not None:
+        duplicates.flushed()
+        timings['duplicates'] = timings.get('duplicates', 0) + checking
+
+    # Parsing happens between the inserts
+    timings['parse'] = timings.get('parse', 0) + time.time() - started - \
+        (timings['insert'] - inserting) - checking
+
 
+def _pragmas(profile, overrides, append=False):
+    """
+    Returns the (name, value) SQLite settings of a build with the given
+    profile (or None) and overrides, in the order they must be applied.
+    """
+    pragmas = dict(_DEFAULT_PRAGMAS)
+    if append:
+        pragmas.update(_APPEND_PRAGMAS)
+    if profile is not None:
+        if profile not in BUILD_PROFILES:
+            raise ValueError("unknown build profile %s, must be one of: %s" %
+                             (profile, ', '.join(sorted(BUILD_PROFILES))))
+        pragmas.update(BUILD_PROFILES[profile])
+    pragmas.update(overrides or {})
+
+    for name, value in pragmas.items():
+        if name not in PRAGMAS:
+            raise ValueError("unknown build setting %s, must be one of: %s" %
+                             (name, ', '.join(PRAGMAS)))
+        if not _PRAGMA_VALUE.match(str(value)):
+            raise ValueError("invalid value %r for build setting %s" %
+                             (value, name))
+    return [(name, pragmas[name]) for name in PRAGMAS if name in pragmas]
+
+
+def _file_rows(filename, fields, workers, timings):
+    """
+    Returns an iterator over the rows, as made by _rows(), of the records
+    of the given FASTA or FASTQ file. An uncompressed file is parsed by
+    'workers' processes, which make the rows too; compressed input can't
+    be split, so it is decompressed in a background thread while it is
+    parsed instead.
+    """
+    reader = openscreed.Open(filename, parse_description=True)
+    reader.close()
+    if reader.compression is not None or not os.path.isfile(filename):
+        return _rows(openscreed.Open(filename, parse_description=True,
+                                     prefetch=True), fields)
+
+    with io.open(filename, 'rb') as handle:
+        first_char = handle.read(1).decode('latin-1')
+    if not first_char:  # Empty file
+        return iter(())
+    encoded = [i for i, (field, role) in enumerate(fields)
+               if role in _ENCODERS]
+    transform = None
+    if encoded:
+        transform = functools.partial(_encode, fields=fields, encoded=encoded)
+    batches = parallel.parallel_rows(
+        filename, first_char, [fieldname for fieldname, role in fields],
+        workers, transform=transform, timings=timings,
+        parse_description=True)
+    return itertools.chain.from_iterable(batches)
+
+
+def _create_tables(cur, fields, types, admin, lengths, separate):
+    """
+    Creates the tables of a new database, and fills in its admin table
+    with the 'admin' rows.
+    """
     # Create the admin table
     cur.execute('CREATE TABLE %s (%s INTEGER PRIMARY KEY, '
                 '%s TEXT, %s TEXT)' % (DBConstants._SCREEDADMIN,
@@ -50,79 +428,409 @@ def create_db(filepath, fields, rcrditer):
     query = 'INSERT INTO %s (%s, %s) VALUES (?, ?)' % \
             (DBConstants._SCREEDADMIN, DBConstants._FIELDNAME,
              DBConstants._ROLENAME)
+    cur.executemany(query, admin)
 
-    # Put the primary key in as an attribute
-    cur.execute(query, (DBConstants._PRIMARY_KEY,
-                        DBConstants._PRIMARY_KEY_ROLE))
-    for attribute, role in fields:
-        cur.execute(query, (attribute, role))
-
-    # Setup the dictionary table creation field substring
-    fieldsub = ','.join(['%s TEXT' % field for field, role in fields])
+    # Setup the dictionary table creation field substring. Sliceable fields
+    # go last, so that reading the other columns of a row never has to go
+    # through the overflow pages of a long sequence. Chunked and separate
+    # fields are left out
+    columns = ['%s %s' % (field, columnType) for (field, role), columnType
+               in zip(fields, types)
+               if role != DBConstants._SLICEABLE_CHUNKED and
+               field not in separate]
+    sliceable = [role in STORAGES.values() for field, role in fields
+                 if role != DBConstants._SLICEABLE_CHUNKED and
+                 field not in separate]
+    fieldsub = ','.join(
+        [column for column, last in zip(columns, sliceable) if not last] +
+        ['%s INTEGER' % field for i, field in lengths] +
+        [column for column, last in zip(columns, sliceable) if last])
 
     # Create the dictionary table
     cur.execute('CREATE TABLE %s (%s INTEGER PRIMARY KEY, %s)' %
                 (DBConstants._DICT_TABLE, DBConstants._PRIMARY_KEY,
                  fieldsub))
 
-    # Setup the 'qmarks' sqlite substring
-    qmarks = ','.join(['?' for i in range(len(fields))])
+    # Chunked fields are kept in tables of chunks keyed by record id and
+    # start offset
+    for field, role in fields:
+        if role == DBConstants._SLICEABLE_CHUNKED:
+            record, start, data = DBConstants._CHUNK_COLUMNS
+            cur.execute('CREATE TABLE %s (%s INTEGER, %s INTEGER, %s TEXT, '
+                        'PRIMARY KEY (%s, %s))' %
+                        (field + DBConstants._CHUNK_TABLE_SUFFIX,
+                         record, start, data, record, start))
 
-    # Setup the sql substring for inserting fields into database
-    fieldsub = ','.join([fieldname for fieldname, role in fields])
+    # Separate fields are kept in tables keyed by record id
+    for (field, role), columnType in zip(fields, types):
+        if field in separate:
+            cur.execute('CREATE TABLE %s (%s INTEGER PRIMARY KEY, %s %s)' %
+                        (field + DBConstants._DATA_TABLE_SUFFIX,
+                         DBConstants._PRIMARY_KEY, field, columnType))
 
-    query = 'INSERT INTO %s (%s) VALUES (%s)' %\
-            (DBConstants._DICT_TABLE, fieldsub, qmarks)
-    # Pull data from the iterator and store in database
-    # Commiting in batches seems faster than a single call to executemany
-    data = (tuple(record[fieldname] for fieldname, role in fields)
-            for record in rcrditer)
-    while True:
-        batch = list(itertools.islice(data, 10000))
-        if not batch:
-            break
-        cur.executemany(query, batch)
-    con.commit()
+
+def create_db(filepath, fields, rcrditer, storage='text',
+              chunk_size=DEFAULT_SEQUENCE_CHUNK, format_version=1,
+              workers=None, profile=None, pragmas=None, duplicates=None,
+              append=False, seqfile=None):
+    """
+    Creates a screed database in the given filepath. Fields is a tuple
+    specifying the names and relative order of attributes in a
+    record. rcrditer is an iterator returning records over a
+    sequence dataset. Records yielded are in dictionary form
+
+    'storage' is how sliceable fields are stored, one of STORAGES, and
+    'chunk_size' the size of the pieces of chunked fields. Records
+    returned by the 'stream' parsing engine can be stored chunked
+    without holding their sequence in memory. The length of each
+    sliceable field is stored in a column of its own, so that it can be
+    read without reading the field.
+
+    'format_version' is the layout of the database, one of
+    DBConstants._FORMAT_VERSIONS. Version 2 keeps sequences and qualities
+    in tables of their own, keyed by record id, so that going over the
+    names or descriptions of the records doesn't read them; version 2
+    databases can't be read by screed versions older than this one.
+
+    The records can be read from the FASTA or FASTQ file named by
+    'seqfile' instead, with 'rcrditer' None. With 'workers' set, an
+    uncompressed file is split into chunks parsed by that many
+    processes, which send back rows ready to be inserted by this one,
+    the only writer (see parallel.parallel_rows); a compressed file is
+    decompressed in a background thread. Chunked storage needs the
+    records one at a time, and can't be built with workers.
+
+    Returns a dictionary of the time in seconds spent on the stages of
+    the build: 'parse' waiting for records (parsing them, or waiting for
+    the workers), 'insert' inserting them, 'index' indexing them and
+    'total'. With workers, 'workers' is the time the workers spent
+    parsing, summed over all of them: 'parse' well above zero means the
+    workers are the bottleneck, 'insert' close to 'total' that SQLite is.
+
+    The SQLite settings of the build come from 'profile', one of
+    BUILD_PROFILES ('fast'), which 'pragmas' overrides with a dictionary
+    of settings named in PRAGMAS. By default syncs are off and the
+    database is locked exclusively; when appending, syncs are full.
+
+    'duplicates' is what to do with records whose key (the name of
+    FASTA and FASTQ records) was already seen, one of dedup.POLICIES:
+    'error' fails at the first one, 'report' fails once all the records
+    are read, listing them, 'skip' and 'keep-first' leave them out, the
+    latter warning about them, and 'rename' appends a '_<n>' suffix to
+    their key. Keys are then checked as the records are inserted, and
+    the time taken is the 'duplicates' entry of the timings; by default
+    a duplicate only makes the build fail once all the records are in,
+    when the unique index is created. If it fails, the database file is
+    removed.
+
+    With 'append', the records are added to the database already in
+    'filepath' instead, after those it holds. Its fields, storage and
+    format version, as listed in its admin table, must be those the
+    records would be stored with; a database built before the lengths of
+    sliceable fields were stored is appended to without them. Record ids
+    go on from the last one, the unique index is updated as the records
+    are inserted, and if anything fails, a duplicate key included, the
+    database is left as it was; appending can't be done without a
+    rollback journal.
+    """
+    started = time.time()
+    timings = {}
+    try:
+        sqlite3
+    except NameError:
+        raise Exception("error: sqlite3 is needed for this functionality" +
+                        " but is not installed.")
+
+    if seqfile is not None:
+        if rcrditer is not None:
+            raise TypeError("records are read from either 'rcrditer' or "
+                            "'seqfile', not both")
+        if not isinstance(seqfile, _FILENAME_TYPES):
+            raise TypeError("'seqfile' must be the name of a file, not %s"
+                            % type(seqfile).__name__)
+    elif isinstance(rcrditer, _FILENAME_TYPES) or \
+            not hasattr(rcrditer, '__iter__'):
+        raise TypeError("'rcrditer' must be an iterable of records, not %s; "
+                        "give a file name as 'seqfile'"
+                        % type(rcrditer).__name__)
+    if workers is not None and seqfile is None:
+        raise ValueError("workers can only parse records read from "
+                         "'seqfile'")
+
+    if storage not in STORAGES:
+        raise ValueError("unknown storage '%s', must be one of: %s" %
+                         (storage, ', '.join(sorted(STORAGES))))
+    fields = tuple([(field, STORAGES[storage])
+                    if role == DBConstants._SLICEABLE_TEXT else (field, role)
+                    for field, role in fields])
+    types = [_COLUMN_TYPES.get(role, 'TEXT') for field, role in fields]
+    if workers is not None and \
+            DBConstants._SLICEABLE_CHUNKED in [role for field, role in fields]:
+        raise ValueError("chunked storage can't be built with workers")
+
+    settings = _pragmas(profile, pragmas, append)
+
+    if duplicates is not None and duplicates not in dedup.POLICIES:
+        raise ValueError("unknown duplicate policy %s, must be one of: %s" %
+                         (duplicates, ', '.join(dedup.POLICIES)))
+
+    if format_version not in DBConstants._FORMAT_VERSIONS:
+        raise ValueError("unknown format version %s, must be one of: %s" %
+                         (format_version, ', '.join(
+                             map(str, DBConstants._FORMAT_VERSIONS))))
+    # Data fields kept in tables of their own, besides chunked fields
+    separate = []
+    if format_version >= 2:
+        separate = [field for field, role in fields
+                    if field in DBConstants._DATA_FIELDS and
+                    role != DBConstants._SLICEABLE_CHUNKED]
+
+    if not filepath.endswith(DBConstants.fileExtension):
+        filepath += DBConstants.fileExtension
+
+    if append:
+        if not os.path.exists(filepath):
+            raise ValueError("no database to append to in %s" % filepath)
+        if str(dict(settings).get('journal_mode', '')).upper() == 'OFF':
+            raise ValueError("appending to a database needs a rollback "
+                             "journal, to leave it as it was if it fails")
+    elif os.path.exists(filepath):  # Remove existing files
+        os.unlink(filepath)
+
+    con = sqlite3.connect(filepath)
+    cur = con.cursor()
+
+    # Sqlite PRAGMA settings for speed
+    for name, value in settings:
+        cur.execute("PRAGMA %s=%s" % (name, value))
+
+    # Sliceable and separate fields get a column holding their length
+    lengths = [(i, field + DBConstants._LENGTH_SUFFIX)
+               for i, (field, role) in enumerate(fields)
+               if role in STORAGES.values() or field in separate]
+
+    # The rows of the admin table: the primary key, the fields, the format
+    # version and the length fields
+    admin = [(DBConstants._PRIMARY_KEY, DBConstants._PRIMARY_KEY_ROLE)]
+    admin.extend(fields)
+    if format_version > 1:
+        admin.append((str(format_version), DBConstants._FORMAT_VERSION_ROLE))
+    admin.extend([(lengthfield, DBConstants._LENGTH_ROLE)
+                  for i, lengthfield in lengths])
+
+    chunked = [field for field, role in fields
+               if role == DBConstants._SLICEABLE_CHUNKED]
+
+    # Without workers a file is parsed here, chunked sequences as they
+    # are read
+    if seqfile is not None and workers is None:
+        rcrditer = openscreed.Open(seqfile, parse_description=True,
+                                   engine='stream' if chunked else 'line')
 
     # Attribute to index
-    queryby = fields[0][0]  # Defaults to the first field
-    for fieldname, role in fields:
+    keyindex = 0  # Defaults to the first field
+    for i, (fieldname, role) in enumerate(fields):
         if role == DBConstants._INDEXED_TEXT_KEY:
-            queryby = fieldname
+            keyindex = i
             break
+    queryby = fields[keyindex][0]
+
+    if append:
+        # The records must be stored as those already in the database
+        try:
+            stored = cur.execute(
+                'SELECT %s, %s FROM %s ORDER BY %s' %
+                (DBConstants._FIELDNAME, DBConstants._ROLENAME,
+                 DBConstants._SCREEDADMIN,
+                 DBConstants._PRIMARY_KEY)).fetchall()
+        except sqlite3.DatabaseError:
+            stored = []
+        stored = [tuple(row) for row in stored]
+        if stored != admin and stored == admin[:len(admin) - len(lengths)]:
+            # Databases built before the lengths of sliceable fields were
+            # stored are appended to without them
+            lengths = []
+        elif stored != admin:
+            con.close()
+            raise ValueError("the database in %s doesn't hold records with "
+                             "the same fields, storage and format version"
+                             % filepath)
+        last_id, = cur.execute('SELECT MAX(%s) FROM %s' %
+                               (DBConstants._PRIMARY_KEY,
+                                DBConstants._DICT_TABLE)).fetchone()
+        last_id = last_id or 0
+    else:
+        last_id = 0
+        _create_tables(cur, fields, types, admin, lengths, separate)
+
+    # Keys already inserted are read back by id to check them exactly;
+    # when appending, those already in the database are found through the
+    # index
+    checker = None
+    if duplicates is not None:
+        lookup = 'SELECT %s FROM %s WHERE %s = ?' % \
+            (queryby, DBConstants._DICT_TABLE, DBConstants._PRIMARY_KEY)
+        existing = None
+        if append:
+            find = 'SELECT %s FROM %s WHERE %s = CAST(? AS TEXT)' % \
+                (DBConstants._PRIMARY_KEY, DBConstants._DICT_TABLE, queryby)
 
-    # Make the index on the 'queryby' attribute
-    cur.execute('CREATE UNIQUE INDEX %sidx ON %s(%s)' %
-                (queryby, DBConstants._DICT_TABLE, queryby))
+            def find_existing(key):
+                row = con.execute(find, (key,)).fetchone()
+                return row[0] if row else None
+            existing = find_existing
+        checker = dedup.DuplicateFilter(
+            duplicates, lambda recordid: con.execute(
+                lookup, (recordid,)).fetchone()[0], last_id, existing)
 
-    con.commit()
+    try:
+        if workers is not None:
+            rows = _file_rows(seqfile, fields, workers, timings)
+            _insert(cur, fields, types, lengths, rows, separate, timings,
+                    checker, keyindex, last_id)
+        elif chunked:
+            _insert_chunked(cur, fields, types, lengths, rcrditer,
+                            chunk_size, separate, timings, checker,
+                            keyindex, last_id)
+        else:
+            _insert(cur, fields, types, lengths, _rows(rcrditer, fields),
+                    separate, timings, checker, keyindex, last_id)
+        if checker is not None:
+            checker.finish()
+    except Exception as e:
+        # A failed append leaves the database as it was
+        if append:
+            con.rollback()
+            con.close()
+        elif isinstance(e, ValueError) and checker is not None and \
+                checker.duplicates:
+            con.close()
+            os.unlink(filepath)
+        raise
+    with _timed(timings, 'insert'):
+        con.commit()
+
+    # Make the index on the 'queryby' attribute. When appending, it is
+    # updated as the records are inserted
+    if not append:
+        with _timed(timings, 'index'):
+            cur.execute('CREATE UNIQUE INDEX %sidx ON %s(%s)' %
+                        (queryby, DBConstants._DICT_TABLE, queryby))
+            con.commit()
     con.close()
 
+    timings['total'] = time.time() - started
+    return timings
 
-def make_db(filename):
-    iterfunc = openscreed.Open(filename, parse_description=True)
+
+def make_db(filename, storage='text', chunk_size=DEFAULT_SEQUENCE_CHUNK,
+            format_version=1, workers=None, profile=None, pragmas=None,
+            duplicates=None, append=None):
+    # Chunked sequences are stored as they are read
+    engine = 'stream' if storage == 'chunked' else 'line'
+    iterfunc = openscreed.Open(filename, parse_description=True,
+                               engine=engine)
 
     field_mapping = {
         fastq.fastq_iter.__name__: fastq.FieldTypes,
-        fasta.fasta_iter.__name__: fasta.FieldTypes
+        fastq.fastq_block_iter.__name__: fastq.FieldTypes,
+        fasta.fasta_iter.__name__: fasta.FieldTypes,
+        fasta.fasta_block_iter.__name__: fasta.FieldTypes,
+        fasta.fasta_stream_iter.__name__: fasta.FieldTypes,
     }
 
     fieldTypes = field_mapping[iterfunc.iter_fn.__name__]
 
-    # Create the screed db
-    create_db(filename, fieldTypes, iterfunc)
+    # With workers, create_db parses the file itself
+    records, seqfile = iterfunc, None
+    if storage == 'chunked':
+        workers = None
+    if workers is not None:
+        iterfunc.close()
+        records, seqfile = None, filename
+
+    # Create the screed db, or add the records to the database of the
+    # 'append' file
+    return create_db(append or filename, fieldTypes, records, storage,
+                     chunk_size, format_version, workers, profile, pragmas,
+                     duplicates, append is not None, seqfile)
 
 
 def main(args):
     parser = argparse.ArgumentParser(description="A shell interface to the "
                                      "screed database writing function")
     parser.add_argument('filename')
+    parser.add_argument('--storage', choices=sorted(STORAGES),
+                        default='text',
+                        help="how to store sequences that can be sliced "
+                        "(FASTA sequences); 'blob' and 'chunked' make "
+                        "slices far into long sequences faster, '2bit' "
+                        "packs DNA into about a quarter of the space")
+    parser.add_argument('--chunk-size', type=int,
+                        default=DEFAULT_SEQUENCE_CHUNK,
+                        help="size of the pieces of chunked sequences")
+    parser.add_argument('--format-version', type=int,
+                        choices=DBConstants._FORMAT_VERSIONS, default=1,
+                        help="layout of the database; version 2 keeps "
+                        "sequences and qualities apart from names and "
+                        "descriptions, for faster scans of those")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="parse uncompressed input in this many "
+                        "processes (compressed input is decompressed in a "
+                        "background thread instead)")
+    parser.add_argument('--timings', action='store_true',
+                        help="print the time spent on each stage of the "
+                        "build to stderr")
+    parser.add_argument('--profile', choices=sorted(BUILD_PROFILES),
+                        help="SQLite settings of the build: 'fast' uses "
+                        "larger pages, for a slightly faster build")
+    parser.add_argument('--pragma', action='append', default=[],
+                        metavar='NAME=VALUE',
+                        help="override an SQLite setting of the build, one "
+                        "of: %s (may be repeated)" % ', '.join(PRAGMAS))
+    parser.add_argument('--append', metavar='DATABASE',
+                        help="add the records to this existing database, "
+                        "built with the same --storage and "
+                        "--format-version, instead of building a new one")
+    parser.add_argument('--duplicates', choices=dedup.POLICIES,
+                        help="check record names for duplicates as they "
+                        "are inserted: 'error' stops at the first one, "
+                        "'report' lists them all, 'skip' and 'keep-first' "
+                        "leave them out and 'rename' adds a suffix to "
+                        "them (by default duplicates make the build fail "
+                        "at the end)")
     args = parser.parse_args(args)
 
-    make_db(args.filename)
+    pragmas = {}
+    for pragma in args.pragma:
+        name, equals, value = pragma.partition('=')
+        if not equals:
+            parser.error("--pragma takes NAME=VALUE, not %s" % pragma)
+        pragmas[name.strip()] = value.strip()
+
+    try:
+        _pragmas(args.profile, pragmas)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        timings = make_db(args.filename, args.storage, args.chunk_size,
+                          args.format_version, args.jobs, args.profile,
+                          pragmas, args.duplicates, args.append)
+    except ValueError as e:
+        if args.duplicates is None and args.append is None:
+            raise
+        sys.stderr.write("error: %s\n" % e)
+        exit(1)
+    if args.timings:
+        sys.stderr.write(', '.join('%s %.2fs' % (stage, timings[stage])
+                                   for stage in _STAGES
+                                   if stage in timings) + '\n')
 
-    print("Database saved in {}{}".format(args.filename,
-                                          DBConstants.fileExtension))
+    database = args.append or args.filename
+    if not database.endswith(DBConstants.fileExtension):
+        database += DBConstants.fileExtension
+    print("Database saved in {}".format(database))
     exit(0)
 
 
@@ -0,0 +1,205 @@
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+Detection of duplicate keys while a database is built, so that a
+duplicate record name is found when it is read instead of when the
+unique index is created after all the records are in.
+
+The keys seen so far are kept in an open addressing hash table of 64-bit
+slots, each holding 31 bits of the hash of a key and the id of its
+record, so that the table takes 12 to 24 bytes per key whatever their
+length. A key whose hash bits match those of a slot is compared with the
+key of that record, read from the database by id, which makes the check
+exact.
+"""
+
+from __future__ import absolute_import
+
+import warnings
+from array import array
+
+# What to do with the records whose key was already seen: 'error' fails
+# at the first one, 'report' goes through all the records and then fails
+# with the list of duplicate keys, 'skip' and 'keep-first' leave them out
+# (keeping the first record of each key, 'keep-first' warning about the
+# records left out) and 'rename' stores them with a '_<n>' suffix on
+# their key, the first unused of _2, _3 and so on
+POLICIES = ('error', 'report', 'skip', 'keep-first', 'rename')
+
+_INITIAL_SIZE = 1 << 16
+
+# Array type code of signed 64-bit integers ('q' is missing from Python 2)
+try:
+    _SLOT_TYPECODE = array('q').typecode
+except ValueError:
+    _SLOT_TYPECODE = 'l'
+
+_FINGERPRINT = 0x7fffffff
+_ID_BITS = 32
+_ID_MASK = (1 << _ID_BITS) - 1
+
+# Number of duplicate keys named in error messages and warnings
+_SHOWN = 10
+
+
+def _shown(keys):
+    """
+    Returns the first few of 'keys', as text for a message.
+    """
+    shown = ', '.join(key.decode('utf-8', 'replace')
+                      if isinstance(key, bytes) else key
+                      for key in keys[:_SHOWN])
+    if len(keys) > _SHOWN:
+        shown += ', ...'
+    return shown
+
+
+class KeySet(object):
+    """
+    The set of the keys of the records inserted into a database, each
+    with the id of its record.
+
+    'lookup' is a function returning the key of an inserted record given
+    its id. The keys of the records added since the last call to
+    flushed(), which may not be in the database yet, are kept in memory
+    instead.
+    """
+
+    def __init__(self, lookup, size=_INITIAL_SIZE):
+        self._lookup = lookup
+        self._table = array(_SLOT_TYPECODE, [0]) * size
+        self._mask = size - 1
+        self._count = 0
+        self._pending = {}
+
+    def __len__(self):
+        return self._count
+
+    def find(self, key):
+        """
+        Returns the id of the record with the given key, or None.
+        """
+        fingerprint = hash(key) & _FINGERPRINT
+        table = self._table
+        i = fingerprint & self._mask
+        while True:
+            slot = table[i]
+            if not slot:
+                return None
+            if slot >> _ID_BITS == fingerprint:
+                recordid = slot & _ID_MASK
+                stored = self._key(recordid)
+                if isinstance(key, bytes) and not isinstance(stored, bytes):
+                    stored = stored.encode('utf-8')
+                if stored == key:
+                    return recordid
+            i = (i + 1) & self._mask
+
+    def add(self, key, recordid):
+        """
+        Adds 'key', which must not be in the set, as the key of record
+        'recordid'.
+        """
+        fingerprint = hash(key) & _FINGERPRINT
+        self._put((fingerprint << _ID_BITS) | recordid)
+        self._pending[recordid] = key
+        self._count += 1
+        if self._count * 3 > len(self._table) * 2:
+            self._grow()
+
+    def flushed(self):
+        """
+        Tells the set that the records added so far are in the database.
+        """
+        self._pending.clear()
+
+    def _key(self, recordid):
+        key = self._pending.get(recordid)
+        if key is None:
+            key = self._lookup(recordid)
+        return key
+
+    def _put(self, slot):
+        table = self._table
+        i = (slot >> _ID_BITS) & self._mask
+        while table[i]:
+            i = (i + 1) & self._mask
+        table[i] = slot
+
+    def _grow(self):
+        old = self._table
+        self._table = array(_SLOT_TYPECODE, [0]) * (2 * len(old))
+        self._mask = len(self._table) - 1
+        for slot in old:
+            if slot:
+                self._put(slot)
+
+
+class DuplicateFilter(object):
+    """
+    Applies one of POLICIES to the records inserted into a database, in
+    order. check() is given the key of each record and returns the key to
+    store it under, or None to leave it out; the ids of the records kept
+    are numbered on from 'last_id'.
+
+    'existing', if given, is a function returning the id of the record
+    with a given key among those in the database before these, or None.
+    """
+
+    def __init__(self, policy, lookup, last_id=0, existing=None):
+        self.policy = policy
+        self._existing = existing
+        self.keys = KeySet(lookup)
+        self.last_id = last_id
+        self.duplicates = []
+        self._suffixes = {}
+
+    def check(self, key):
+        recordid = self._find(key)
+        if recordid is not None:
+            self.duplicates.append(key)
+            if self.policy == 'error':
+                raise ValueError("duplicate key %s (records %d and %d)" %
+                                 (_shown([key]), recordid, self.last_id + 1))
+            if self.policy != 'rename':
+                return None
+            key = self._rename(key)
+
+        self.last_id += 1
+        self.keys.add(key, self.last_id)
+        return key
+
+    def flushed(self):
+        self.keys.flushed()
+
+    def finish(self):
+        """
+        Fails, or warns, about the duplicates seen, as the policy says.
+        """
+        if not self.duplicates:
+            return
+        if self.policy == 'report':
+            raise ValueError("%d records with duplicate keys: %s" %
+                             (len(self.duplicates), _shown(self.duplicates)))
+        if self.policy == 'keep-first':
+            warnings.warn("left out %d records with duplicate keys: %s" %
+                          (len(self.duplicates), _shown(self.duplicates)))
+
+    def _find(self, key):
+        recordid = self.keys.find(key)
+        if recordid is None and self._existing is not None:
+            recordid = self._existing(key)
+        return recordid
+
+    def _rename(self, key):
+        suffix = self._suffixes.get(key, 2)
+        while True:
+            renamed = '_%d' % suffix
+            if isinstance(key, bytes):
+                renamed = renamed.encode('ascii')
+            renamed = key + renamed
+            suffix += 1
+            if self._find(renamed) is None:
+                break
+        self._suffixes[key] = suffix
+        return renamed
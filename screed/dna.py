@@ -52,3 +52,21 @@ def reverse(s):
     r = "".join(reversed(s))
 
     return r
+
+
+# IUPAC nucleotide codes, in both cases, and their complements
+_IUPAC = 'ACGTUNRYSWKMBDHVacgtunryswkmbdhv'
+_IUPAC_COMPLEMENT = 'TGCAANYRSWMKVHDBtgcaanyrswmkvhdb'
+try:
+    _IUPAC_TABLE = str.maketrans(_IUPAC, _IUPAC_COMPLEMENT)
+except AttributeError:  # Python 2
+    _IUPAC_TABLE = string.maketrans(_IUPAC, _IUPAC_COMPLEMENT)
+
+
+def reverse_complement_iupac(s):
+    """
+    Build reverse complement of 's', keeping the case of each base and
+    complementing IUPAC ambiguity codes; other characters are kept as
+    they are.
+    """
+    return s.translate(_IUPAC_TABLE)[::-1]
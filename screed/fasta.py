@@ -2,48 +2,234 @@
 
 from __future__ import absolute_import
 from . import DBConstants
-from .screedRecord import Record
-from .utils import to_str
+from .screedRecord import Record, FastaRecord
+from .utils import get_decoder, literals, iter_line_blocks
+from .utils import DEFAULT_BLOCK_SIZE
 
 FieldTypes = (('name', DBConstants._INDEXED_TEXT_KEY),
               ('description', DBConstants._STANDARD_TEXT),
               ('sequence', DBConstants._SLICEABLE_TEXT))
 
 
-def fasta_iter(handle, parse_description=False, line=None):
+# Whitespace stripped from sequence lines besides the newline itself
+_LINE_SPACES = {
+    'text': (' ', '\t', '\r', '\x0b', '\x0c', '\x1c', '\x1d', '\x1e', '\x1f'),
+    'bytes': (b' ', b'\t', b'\r', b'\x0b', b'\x0c'),
+}
+
+
+def fasta_iter(handle, parse_description=False, line=None, mode='text',
+               slots=False):
     """
     Iterator over the given FASTA file handle, returning records. handle
-    is a handle to a file opened for reading
+    is a handle to a file opened for reading. In 'bytes' mode the input
+    is not decoded and record fields are bytes. With slots=True, the
+    records are compact FastaRecord objects instead of Records.
     """
+    record_class = FastaRecord if slots else Record
+    decode = get_decoder(mode)
+    gt, space, empty = literals(mode, '>', ' ', '')
     if line is None:
         line = handle.readline()
 
     while line:
         data = {}
 
-        line = to_str(line.strip())
-        if not line.startswith('>'):
+        line = decode(line.strip())
+        if not line.startswith(gt):
             raise IOError("Bad FASTA format: no '>' at beginning of line")
 
         if parse_description:  # Try to grab the name and optional description
             try:
-                data['name'], data['description'] = line[1:].split(' ', 1)
+                data['name'], data['description'] = line[1:].split(space, 1)
             except ValueError:  # No optional description
                 data['name'] = line[1:]
-                data['description'] = ''
+                data['description'] = empty
         else:
             data['name'] = line[1:]
-            data['description'] = ''
+            data['description'] = empty
 
         data['name'] = data['name'].strip()
         data['description'] = data['description'].strip()
 
         # Collect sequence lines into a list
         sequenceList = []
-        line = to_str(handle.readline())
-        while line and not line.startswith('>'):
+        line = decode(handle.readline())
+        while line and not line.startswith(gt):
             sequenceList.append(line.strip())
-            line = to_str(handle.readline())
+            line = decode(handle.readline())
+
+        data['sequence'] = empty.join(sequenceList)
+        yield record_class(**data)
+
+
+def _fasta_record(line, parse_description, sequence, space, empty,
+                  record_class):
+    """
+    Build a record from a stripped FASTA header line and its sequence.
+    """
+    if parse_description:  # Try to grab the name and optional description
+        try:
+            name, description = line[1:].split(space, 1)
+        except ValueError:  # No optional description
+            name, description = line[1:], empty
+    else:
+        name, description = line[1:], empty
+
+    return record_class(name=name.strip(), description=description.strip(),
+                        sequence=sequence)
+
+
+def _join_sequence_lines(span, spaces, newline, empty):
+    """
+    Join a span of sequence lines into a single string, stripping each
+    line like fasta_iter does. Spans without any whitespace besides
+    newlines are handled with a single replace() call.
+    """
+    try:
+        simple = span.isascii() and \
+            not any(space in span for space in spaces)
+    except AttributeError:  # No isascii() before Python 3.7
+        simple = False
+    if simple:
+        return span.replace(newline, empty)
+    return empty.join(line.strip() for line in span.split(newline))
+
+
+def fasta_block_iter(handle, parse_description=False,
+                     bufsize=DEFAULT_BLOCK_SIZE, mode='text', slots=False):
+    """
+    Iterator over the given FASTA file handle returning records, like
+    fasta_iter. The input is read and decoded in blocks of roughly
+    'bufsize' bytes; each block is scanned for '>' header lines and the
+    sequence between them has its newlines removed in one pass. Long
+    sequences are collected block by block and joined once.
+    """
+    record_class = FastaRecord if slots else Record
+    decode = get_decoder(mode)
+    spaces = _LINE_SPACES[mode]
+    gt, newline, header_start, space, empty = \
+        literals(mode, '>', '\n', '\n>', ' ', '')
+    header = None
+    pieces = []
+    for block in iter_line_blocks(handle, bufsize, decode):
+        pos = 0
+        end = len(block)
+        if header is None:
+            # The first line is stripped before looking for the '>'
+            eol = block.find(newline)
+            pos = end if eol == -1 else eol + 1
+            header = block[:pos].strip()
+            if not header.startswith(gt):
+                raise IOError("Bad FASTA format: no '>' at beginning of line")
+
+        while pos < end:
+            if block.startswith(gt, pos):
+                yield _fasta_record(header, parse_description,
+                                    empty.join(pieces), space, empty,
+                                    record_class)
+                eol = block.find(newline, pos)
+                nextpos = end if eol == -1 else eol + 1
+                header = block[pos:nextpos].strip()
+                pieces = []
+            else:
+                eol = block.find(header_start, pos)
+                nextpos = end if eol == -1 else eol + 1
+                pieces.append(_join_sequence_lines(block[pos:nextpos], spaces,
+                                                   newline, empty))
+            pos = nextpos
+
+    if header is not None:
+        yield _fasta_record(header, parse_description, empty.join(pieces),
+                            space, empty, record_class)
 
-        data['sequence'] = ''.join(sequenceList)
-        yield Record(**data)
+
+def _fasta_block_events(handle, bufsize, mode):
+    """
+    Iterator over the given FASTA file handle read in blocks like
+    fasta_block_iter, returning (True, header) for each stripped header
+    line and (False, sequence) for each piece of sequence that follows
+    it, with newlines and whitespace removed.
+    """
+    decode = get_decoder(mode)
+    spaces = _LINE_SPACES[mode]
+    gt, newline, header_start, empty = literals(mode, '>', '\n', '\n>', '')
+    started = False
+    for block in iter_line_blocks(handle, bufsize, decode):
+        pos = 0
+        end = len(block)
+        if not started:
+            # The first line is stripped before looking for the '>'
+            eol = block.find(newline)
+            pos = end if eol == -1 else eol + 1
+            header = block[:pos].strip()
+            if not header.startswith(gt):
+                raise IOError("Bad FASTA format: no '>' at beginning of line")
+            started = True
+            yield True, header
+
+        while pos < end:
+            if block.startswith(gt, pos):
+                eol = block.find(newline, pos)
+                nextpos = end if eol == -1 else eol + 1
+                yield True, block[pos:nextpos].strip()
+            else:
+                eol = block.find(header_start, pos)
+                nextpos = end if eol == -1 else eol + 1
+                piece = _join_sequence_lines(block[pos:nextpos], spaces,
+                                             newline, empty)
+                if piece:
+                    yield False, piece
+            pos = nextpos
+
+
+class _SequencePieces(object):
+
+    """
+    Iterator over the pieces of the sequence of one record, taken from
+    the events of _fasta_block_events. It stops at the next header line,
+    which is kept in 'header' (None at the end of the file).
+    """
+
+    def __init__(self, events):
+        self._events = events
+        self._done = False
+        self.header = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self._done:
+            for is_header, value in self._events:
+                if is_header:
+                    self.header = value
+                    break
+                return value
+            self._done = True
+        raise StopIteration
+
+    next = __next__
+
+
+def fasta_stream_iter(handle, parse_description=False,
+                      bufsize=DEFAULT_BLOCK_SIZE, mode='text', slots=False):
+    """
+    Iterator over the given FASTA file handle returning records whose
+    'sequence' is an iterator over pieces of the sequence, read as the
+    iterator is used, so that a sequence is never held in memory whole.
+    Each sequence must be used before moving on to the next record;
+    whatever is left of it is skipped then. Used to build databases of
+    very long sequences.
+    """
+    record_class = FastaRecord if slots else Record
+    space, empty = literals(mode, ' ', '')
+    events = _fasta_block_events(handle, bufsize, mode)
+    header = next(events, (True, None))[1]
+    while header is not None:
+        pieces = _SequencePieces(events)
+        yield _fasta_record(header, parse_description, pieces, space, empty,
+                            record_class)
+        for _ in pieces:
+            pass
+        header = pieces.header
@@ -1,9 +1,16 @@
 # Copyright (c) 2016, The Regents of the University of California.
 
 from __future__ import absolute_import
+from itertools import islice
 from . import DBConstants
-from .screedRecord import Record
-from .utils import to_str
+from .screedRecord import Record, FastqRecord
+from .utils import get_decoder, literals, iter_line_blocks
+from .utils import DEFAULT_BLOCK_SIZE
+
+try:
+    from itertools import izip as zip
+except ImportError:
+    pass
 
 FieldTypes = (('name', DBConstants._INDEXED_TEXT_KEY),
               ('annotations', DBConstants._STANDARD_TEXT),
@@ -11,54 +18,218 @@ FieldTypes = (('name', DBConstants._INDEXED_TEXT_KEY),
               ('quality', DBConstants._STANDARD_TEXT))
 
 
-def fastq_iter(handle, line=None, parse_description=False):
+def fastq_iter(handle, line=None, parse_description=False, mode='text',
+               slots=False):
     """
     Iterator over the given FASTQ file handle returning records. handle
-    is a handle to a file opened for reading
+    is a handle to a file opened for reading. In 'bytes' mode the input
+    is not decoded and record fields are bytes. With slots=True, the
+    records are compact FastqRecord objects instead of Records.
     """
+    record_class = FastqRecord if slots else Record
+    decode = get_decoder(mode)
+    at, plus, hashmark, space, empty = literals(mode, '@', '+', '#', ' ', '')
     if line is None:
         line = handle.readline()
-    line = to_str(line.strip())
+    line = decode(line.strip())
     while line:
         data = {}
 
-        if line and not line.startswith('@'):
+        if line and not line.startswith(at):
             raise IOError("Bad FASTQ format: no '@' at beginning of line")
 
         # Try to grab the name and (optional) annotations
         if parse_description:
             try:
-                data['name'], data['annotations'] = line[1:].split(' ', 1)
+                data['name'], data['annotations'] = line[1:].split(space, 1)
             except ValueError:  # No optional annotations
                 data['name'] = line[1:]
-                data['annotations'] = ''
+                data['annotations'] = empty
                 pass
         else:
             data['name'] = line[1:]
-            data['annotations'] = ''
+            data['annotations'] = empty
 
         # Extract the sequence lines
         sequence = []
-        line = to_str(handle.readline().strip())
-        while line and not line.startswith('+') and not line.startswith('#'):
+        line = decode(handle.readline().strip())
+        while line and not line.startswith(plus) and \
+                not line.startswith(hashmark):
             sequence.append(line)
-            line = to_str(handle.readline().strip())
+            line = decode(handle.readline().strip())
 
-        data['sequence'] = ''.join(sequence)
+        data['sequence'] = empty.join(sequence)
 
         # Extract the quality lines
         quality = []
-        line = to_str(handle.readline().strip())
+        line = decode(handle.readline().strip())
         seqlen = len(data['sequence'])
         aclen = 0
-        while not line == '' and aclen < seqlen:
+        while line and aclen < seqlen:
             quality.append(line)
             aclen += len(line)
-            line = to_str(handle.readline().strip())
+            line = decode(handle.readline().strip())
 
-        data['quality'] = ''.join(quality)
+        data['quality'] = empty.join(quality)
         if len(data['sequence']) != len(data['quality']):
             raise IOError('sequence and quality strings must be '
                           'of equal length')
 
-        yield Record(**data)
+        yield record_class(**data)
+
+
+def _fastq_name(line, parse_description, space, empty):
+    """
+    Split a FASTQ header line into its name and annotations.
+    """
+    if parse_description:
+        try:
+            name, annotations = line[1:].split(space, 1)
+        except ValueError:  # No optional annotations
+            name, annotations = line[1:], empty
+        return name, annotations
+    return line[1:], empty
+
+
+def _fastq_record_at(lines, i, final, parse_description, lits,
+                     record_class):
+    """
+    Parse the (possibly multi-line) FASTQ record starting at lines[i],
+    following the same rules as fastq_iter. Returns the record and the
+    index of the line after it, or None if the record continues past
+    the end of 'lines' and more input is available.
+    """
+    separators, space, empty = lits[2:5]
+    n = len(lines)
+    name, annotations = _fastq_name(lines[i].strip(), parse_description,
+                                    space, empty)
+
+    # Extract the sequence lines
+    sequence = []
+    j = i + 1
+    while True:
+        if j >= n:
+            if not final:
+                return None
+            break
+        line = lines[j].strip()
+        if not line or line[:1] in separators:
+            break
+        sequence.append(line)
+        j += 1
+    sequence = empty.join(sequence)
+    j += 1  # Skip the '+' line
+
+    # Extract the quality lines
+    quality = []
+    seqlen = len(sequence)
+    aclen = 0
+    while aclen < seqlen:
+        if j >= n:
+            if not final:
+                return None
+            break
+        line = lines[j].strip()
+        if not line:
+            break
+        quality.append(line)
+        aclen += len(line)
+        j += 1
+    quality = empty.join(quality)
+
+    if seqlen != len(quality):
+        raise IOError('sequence and quality strings must be '
+                      'of equal length')
+
+    return record_class(name=name, annotations=annotations,
+                        sequence=sequence, quality=quality), j
+
+
+def _refill_lines(lines, i, blocks, newline):
+    """
+    Drop the consumed lines[:i] and append the lines of the next block.
+    Returns the new lines, the new index into them and whether the end
+    of the input was reached.
+    """
+    block = next(blocks, None)
+    if block is None:
+        return lines, i, True
+    new_lines = block.split(newline)
+    if block.endswith(newline):
+        new_lines.pop()
+    return lines[i:] + new_lines, 0, False
+
+
+def _fastq_fields(name, annotations, sequence, quality):
+    return name, annotations, sequence, quality
+
+
+def fastq_block_iter(handle, parse_description=False,
+                     bufsize=DEFAULT_BLOCK_SIZE, mode='text', slots=False):
+    """
+    Iterator over the given FASTQ file handle returning records, like
+    fastq_iter. The input is read and decoded in blocks of roughly
+    'bufsize' bytes and split into lines in bulk, instead of one
+    readline() call per line; records spanning a block edge are
+    carried over to the next block.
+    """
+    record_class = FastqRecord if slots else Record
+    for name, annotations, sequence, quality in \
+            _fastq_block_fields(handle, parse_description, bufsize, mode):
+        yield record_class(name=name, annotations=annotations,
+                           sequence=sequence, quality=quality)
+
+
+def _fastq_block_fields(handle, parse_description, bufsize, mode):
+    """
+    Iterator over the given FASTQ file handle read in blocks like
+    fastq_block_iter, returning the (name, annotations, sequence,
+    quality) fields of each record as a tuple.
+    """
+    blocks = iter_line_blocks(handle, bufsize, get_decoder(mode))
+    lits = literals(mode, '\n', '@', '+#', ' ', '')
+    newline, at, separators, space, empty = lits
+    lines = []
+    i = 0
+    final = False
+    while True:
+        if not final and i + 3 >= len(lines):
+            # Too few lines left for a whole record, read the next block
+            lines, i, final = _refill_lines(lines, i, blocks, newline)
+            continue
+
+        # Fast path for runs of the common four-line record
+        it = islice(lines, i, None)
+        for line, sequence, plus, quality in zip(it, it, it, it):
+            line = line.strip()
+            sequence = sequence.strip()
+            plus = plus.strip()
+            quality = quality.strip()
+            if not line.startswith(at) or not sequence or \
+                    len(quality) != len(sequence) or \
+                    sequence[:1] in separators or \
+                    plus[:1] not in separators:
+                break
+            name, annotations = _fastq_name(line, parse_description,
+                                            space, empty)
+            yield name, annotations, sequence, quality
+            i += 4
+
+        if i >= len(lines):
+            if final:
+                break
+            continue
+        line = lines[i].strip()
+        if not line:  # Blank line or end of file, like fastq_iter
+            break
+        if not line.startswith(at):
+            raise IOError("Bad FASTQ format: no '@' at beginning of line")
+
+        result = _fastq_record_at(lines, i, final, parse_description, lits,
+                                  _fastq_fields)
+        if result is None:  # Record continues in the next block
+            lines, i, final = _refill_lines(lines, i, blocks, newline)
+            continue
+
+        fields, i = result
+        yield fields
@@ -2,7 +2,7 @@
 
 from __future__ import absolute_import
 from . import DBConstants
-from .utils import to_str
+from .utils import get_decoder
 
 FieldTypes = (('hava', DBConstants._INDEXED_TEXT_KEY),
               ('quarzk', DBConstants._STANDARD_TEXT),
@@ -12,20 +12,22 @@ FieldTypes = (('hava', DBConstants._INDEXED_TEXT_KEY),
               ('marshoon', DBConstants._STANDARD_TEXT))
 
 
-def hava_iter(handle):
+def hava_iter(handle, mode='text'):
     """
     Iterator over a 'hava' sequence file, returning records. handle
-    is a handle to a file opened for reading
+    is a handle to a file opened for reading. In 'bytes' mode the input
+    is not decoded and record fields are bytes.
     """
+    decode = get_decoder(mode)
     data = {}
-    line = to_str(handle.readline().strip())
+    line = decode(handle.readline().strip())
     while line:
         data['hava'] = line
-        data['quarzk'] = to_str(handle.readline().strip())
-        data['muchalo'] = to_str(handle.readline().strip())
-        data['fakours'] = to_str(handle.readline().strip())
-        data['selimizicka'] = to_str(handle.readline().strip())
-        data['marshoon'] = to_str(handle.readline().strip())
+        data['quarzk'] = decode(handle.readline().strip())
+        data['muchalo'] = decode(handle.readline().strip())
+        data['fakours'] = decode(handle.readline().strip())
+        data['selimizicka'] = decode(handle.readline().strip())
+        data['marshoon'] = decode(handle.readline().strip())
 
-        line = to_str(handle.readline().strip())
+        line = decode(handle.readline().strip())
         yield data
@@ -0,0 +1,295 @@
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+Parsers that work directly over a memory-mapped, uncompressed FASTA or
+FASTQ file. Parsing only finds where each record's fields are in the
+file; the fields are read from the mapping the first time they are used,
+so code that only looks at names or lengths never copies the sequences.
+"""
+
+from __future__ import absolute_import
+
+import abc
+import mmap
+
+from .fasta import _LINE_SPACES, _fasta_record, _join_sequence_lines
+from .fastq import _fastq_name, fastq_block_iter
+from .screedRecord import FastaRecord, FastqRecord, Record
+from .utils import DEFAULT_BLOCK_SIZE, get_decoder, literals
+
+_AT = b'@'[0]
+_PLUS = b'+'[0]
+
+_CR = b'\r'[0]
+_SPACES = frozenset(b' \t\r\n\x0b\x0c')
+
+# First characters of a line that cannot start a FASTQ sequence in the
+# four-line fast path: separators and whitespace (i.e. an empty line)
+_NOT_SEQUENCE = frozenset(b'+#') | _SPACES
+
+
+def _crlf_lines(buffer, sequence_end, quality_end):
+    """
+    Returns true if the sequence and quality lines ending at the given
+    newline offsets both end with a single '\r', so that their lengths
+    still match once stripped.
+    """
+    return buffer[sequence_end - 1] == _CR and \
+        buffer[quality_end - 1] == _CR and \
+        buffer[sequence_end - 2] not in _SPACES and \
+        buffer[quality_end - 2] not in _SPACES
+
+
+def map_file(handle):
+    """
+    Returns a read-only memory map of the whole of the given file.
+    """
+    return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class _MappedRecord(Record):
+
+    """
+    Base class for records whose fields are read from a memory-mapped
+    file on first use. Fields are kept in the record once read; anything
+    that needs all fields (iteration, keys(), repr(), slicing, deleting a
+    field) reads them all. The mapping stays open as long as records
+    that still need it exist. Subclasses read the fields with _load().
+    """
+
+    _fields = ()
+
+    def __init__(self, buffer, offsets, options):
+        self.d = {}
+        self._buffer = buffer
+        self._offsets = offsets
+        self._options = options
+
+    def __getattr__(self, name):
+        if name in ('d', '_buffer'):  # Not set yet, e.g. while unpickling
+            raise AttributeError(name)
+        try:
+            return self.d[name]
+        except KeyError:
+            pass
+        if self._buffer is not None and name in self._fields:
+            self._load(name)
+            return self.d[name]
+        raise AttributeError(name)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            self._load_all()
+            return Record.__getitem__(self, idx)
+        try:
+            return self.d[idx]
+        except KeyError:
+            if self._buffer is not None and idx in self._fields:
+                self._load(idx)
+                return self.d[idx]
+            raise
+
+    def __delitem__(self, key):
+        self._load_all()
+        Record.__delitem__(self, key)
+
+    def __iter__(self):
+        self._load_all()
+        return Record.__iter__(self)
+
+    def keys(self):
+        self._load_all()
+        return Record.keys(self)
+
+    def __repr__(self):
+        self._load_all()
+        return Record.__repr__(self)
+
+    def __reduce__(self):
+        self._load_all()
+        return (Record, (), None, None, iter(self.d.items()))
+
+    def _load_all(self):
+        if self._buffer is not None:
+            for name in self._fields:
+                if name not in self.d:
+                    self._load(name)
+            self._buffer = None
+            # Same field order as the Records of the other parsers
+            fields = [(name, self.d[name]) for name in self._fields]
+            fields.extend((name, value) for name, value in self.d.items()
+                          if name not in self._fields)
+            self.d = dict(fields)
+
+    @abc.abstractmethod
+    def _load(self, name):
+        """
+        Reads the field 'name', and any other fields read along with it,
+        into the record.
+        """
+
+
+class MappedFastaRecord(_MappedRecord):
+
+    """
+    FASTA record read lazily from a memory-mapped file. 'offsets' is the
+    (start, end) of the header line and of the sequence lines.
+    """
+
+    _fields = ('name', 'sequence', 'description')
+
+    def _load(self, name):
+        header_start, header_end, start, end = self._offsets
+        decode, parse_description, spaces, newline, space, empty = \
+            self._options
+        if name == 'sequence':
+            span = decode(self._buffer[start:end])
+            value = _join_sequence_lines(span, spaces, newline, empty)
+            self.d.setdefault('sequence', value)
+        else:
+            header = decode(self._buffer[header_start:header_end]).strip()
+            record = _fasta_record(header, parse_description, empty, space,
+                                   empty, dict)
+            self.d.setdefault('name', record['name'])
+            self.d.setdefault('description', record['description'])
+
+
+class MappedFastqRecord(_MappedRecord):
+
+    """
+    FASTQ record read lazily from a memory-mapped file. 'offsets' are
+    the starts of its four lines and the end of the quality line.
+    """
+
+    _fields = ('name', 'sequence', 'annotations', 'quality')
+
+    def __len__(self):
+        if 'sequence' in self.d or self._buffer is None:
+            return len(self.sequence)
+        start, end = self._offsets[1], self._offsets[2] - 1
+        # Leave out trailing whitespace, e.g. the '\r' of '\r\n'
+        while end > start and self._buffer[end - 1:end].isspace():
+            end -= 1
+        return end - start
+
+    def _load(self, name):
+        header, sequence, plus, quality, end = self._offsets
+        decode, parse_description, spaces, newline, space, empty = \
+            self._options
+        buffer = self._buffer
+        if name == 'sequence':
+            value = decode(buffer[sequence:plus - 1]).strip()
+        elif name == 'quality':
+            value = decode(buffer[quality:end]).strip()
+        else:
+            line = decode(buffer[header:sequence - 1]).strip()
+            names = _fastq_name(line, parse_description, space, empty)
+            self.d.setdefault('name', names[0])
+            self.d.setdefault('annotations', names[1])
+            return
+        self.d.setdefault(name, value)
+
+
+def _options(mode, parse_description):
+    """
+    Returns the per-file settings shared by all the records of a file.
+    """
+    return (get_decoder(mode), parse_description, _LINE_SPACES[mode]) + \
+        literals(mode, '\n', ' ', '')
+
+
+def _slotted(record, record_class):
+    """
+    Returns the mapped 'record' as a 'record_class' object, with all its
+    fields read.
+    """
+    return record_class(**dict((name, record[name])
+                               for name in record._fields))
+
+
+def fasta_mmap_iter(handle, parse_description=False,
+                    bufsize=DEFAULT_BLOCK_SIZE, mode='text', slots=False):
+    """
+    Iterator over the records of the given uncompressed FASTA file,
+    which must be a regular file opened in binary mode. The file is
+    memory-mapped and the records are MappedFastaRecord objects, which
+    behave like Records but read their fields from the mapping on first
+    use. With slots=True they are read at once into FastaRecord objects
+    instead. 'bufsize' is taken for compatibility with the 'block'
+    engine, and has no use since the whole file is mapped.
+    """
+    options = _options(mode, parse_description)
+    buffer = map_file(handle)
+    size = len(buffer)
+    find = buffer.find
+
+    # The first line is stripped before looking for the '>'
+    eol = find(b'\n')
+    header_end = size if eol == -1 else eol
+    header_start = header_end - len(buffer[:header_end].lstrip())
+    if not buffer[header_start:header_start + 1] == b'>':
+        raise IOError("Bad FASTA format: no '>' at beginning of line")
+
+    while header_start < size:
+        start = min(header_end + 1, size)
+        next_header = find(b'\n>', header_end)
+        end = size if next_header == -1 else next_header + 1
+        record = MappedFastaRecord(buffer,
+                                   (header_start, header_end, start, end),
+                                   options)
+        yield _slotted(record, FastaRecord) if slots else record
+        header_start = end
+        eol = find(b'\n', header_start)
+        header_end = size if eol == -1 else eol
+
+
+def fastq_mmap_iter(handle, parse_description=False,
+                    bufsize=DEFAULT_BLOCK_SIZE, mode='text', slots=False):
+    """
+    Iterator over the records of the given uncompressed FASTQ file,
+    which must be a regular file opened in binary mode. The file is
+    memory-mapped and four-line records are returned as
+    MappedFastqRecord objects, which behave like Records but read their
+    fields from the mapping on first use. From the first record that is
+    not a plain four-line record on, the file is parsed by
+    fastq_block_iter instead, in blocks of 'bufsize' bytes. With
+    slots=True all records are FastqRecord objects, with their fields
+    read at once.
+    """
+    options = _options(mode, parse_description)
+    buffer = map_file(handle)
+    size = len(buffer)
+    find = buffer.find
+
+    pos = 0
+    while pos < size:
+        sequence = find(b'\n', pos) + 1
+        plus = find(b'\n', sequence) + 1
+        quality = find(b'\n', plus) + 1
+        if not quality:
+            break
+        end = find(b'\n', quality)
+        if end == -1:
+            end = size
+
+        # The layout checks of fastq_block_iter's fast path, done on the
+        # line lengths; anything else is left to fastq_block_iter
+        if buffer[pos] != _AT or buffer[plus] != _PLUS or \
+                plus - sequence != end + 1 - quality or \
+                buffer[sequence] in _NOT_SEQUENCE:
+            break
+        if (buffer[plus - 2] in _SPACES or buffer[end - 1] in _SPACES) and \
+                not _crlf_lines(buffer, plus - 1, end):
+            break
+
+        record = MappedFastqRecord(buffer,
+                                   (pos, sequence, plus, quality, end),
+                                   options)
+        yield _slotted(record, FastqRecord) if slots else record
+        pos = end + 1
+
+    if pos < size:
+        buffer.seek(pos)
+        for record in fastq_block_iter(buffer, parse_description, bufsize,
+                                       mode=mode, slots=slots):
+            yield record
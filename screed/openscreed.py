@@ -6,8 +6,12 @@ from __future__ import absolute_import
 import os
 import io
 import sys
-import gzip
 import bz2file
+from itertools import groupby, islice
+try:
+    from inspect import getgeneratorstate, GEN_CREATED
+except ImportError:  # No getgeneratorstate() before Python 3.2
+    getgeneratorstate = None
 try:
     from collections.abc import MutableMapping
 except ImportError:
@@ -21,9 +25,52 @@ except ImportError:
 
 from . import DBConstants
 from . import screedRecord
-from .fastq import fastq_iter
-from .fasta import fasta_iter
-from .utils import to_str
+from .batch import iter_batches, scan_batches, DEFAULT_BATCH_SIZE
+from .cache import RecordCache, record_size
+from .dna import reverse_complement_iupac
+from .parallel import parallel_iter
+from .streams import open_compressed, open_bgzf, is_bgzf
+from .streams import prefetch, DEFAULT_PREFETCH_DEPTH
+from .fastq import fastq_iter, fastq_block_iter
+from .fasta import fasta_iter, fasta_block_iter, fasta_stream_iter
+from .mapped import fasta_mmap_iter, fastq_mmap_iter
+from .utils import to_str, check_mode, DEFAULT_BLOCK_SIZE
+
+
+# Parsing engines selectable through Open's 'engine' argument, by the
+# first character of the file
+_ENGINES = {
+    'line': {'>': fasta_iter, '@': fastq_iter},
+    'block': {'>': fasta_block_iter, '@': fastq_block_iter},
+    'mmap': {'>': fasta_mmap_iter, '@': fastq_mmap_iter},
+    'stream': {'>': fasta_stream_iter, '@': fastq_block_iter},
+}
+
+
+# Parser options that Open.batches() can pass on to scan_batches()
+_BATCH_OPTIONS = frozenset(('parse_description', 'bufsize', 'mode', 'slots'))
+
+
+# What ScreedDB.iter_many() does with keys that are not in the database
+_MISSING_POLICIES = ('skip', 'none', 'raise')
+
+# Strands of the intervals of ScreedDB.fetch_regions(), '.' being BED's
+# for intervals without one
+_STRANDS = ('+', '-', '.')
+
+
+def _bed_intervals(filename):
+    """
+    Iterator over the (name, start, end, strand) intervals of a BED file.
+    The strand is '+' for lines with less than six columns.
+    """
+    with io.open(filename, 'r') as bed:
+        for line in bed:
+            if not line.strip() or line.startswith(('#', 'track', 'browser')):
+                continue
+            columns = line.rstrip('\r\n').split('\t')
+            strand = columns[5] if len(columns) > 5 else '+'
+            yield columns[0], columns[1], columns[2], strand
 
 
 def _normalize_filename(filename):
@@ -36,6 +83,8 @@ def _normalize_filename(filename):
 class Open(object):
     def __init__(self, filename, *args, **kwargs):
         self.sequencefile = None
+        self.compression = None
+        self._batch_source = None
         self.iter_fn = self.open_reader(filename, *args, **kwargs)
         if self.iter_fn:
             self.__name__ = self.iter_fn.__name__
@@ -45,11 +94,57 @@ class Open(object):
         Make a best-effort guess as to how to parse the given sequence file.
 
         Handles '-' as shortcut for stdin.
-        Deals with .gz, FASTA, and FASTQ records.
-        """
+        Deals with .gz, .bz2, .zst, .xz and .lz4 compressed FASTA and
+        FASTQ records; zstd and lz4 need the optional zstandard and lz4
+        modules. Compressed input is decompressed as a stream, so it can
+        come from a pipe.
+
+        The 'engine' keyword selects the parser: 'line' (the default)
+        reads one line at a time, 'block' reads the input in large
+        blocks (see 'bufsize') and is faster on big files. 'mmap'
+        memory-maps regular uncompressed files and returns records that
+        read their fields from the mapping on first use; other input is
+        parsed by the 'block' engine. 'stream' returns FASTA records
+        whose sequence is an iterator over pieces of it, to be used
+        before moving on to the next record (FASTQ is parsed by the
+        'block' engine); it is meant for building databases of very long
+        sequences without holding them in memory. With
+        mode='bytes' the input is not decoded and record fields are
+        bytes instead of str. With slots=True records are compact
+        FastaRecord/FastqRecord objects (with the 'mmap' engine, their
+        fields are then read from the mapping at once).
+
+        With 'workers' set, an uncompressed file is split into chunks
+        parsed in that many processes; records come out in file order
+        unless ordered=False. Input that cannot be split (compressed or
+        streamed data) is parsed serially.
+
+        With 'prefetch' set, the input is read and decompressed ahead in
+        a background thread while records are parsed: prefetch=True
+        keeps up to 4 buffers of 'prefetch_size' bytes (default 1 MiB)
+        queued, and an integer sets the number of buffers instead.
+
+        BGZF (bgzip) input is decompressed in 'threads' threads (default:
+        one per CPU).
+        """
+        engine = kwargs.pop('engine', 'line')
+        workers = kwargs.pop('workers', None)
+        ordered = kwargs.pop('ordered', True)
+        prefetch_depth = kwargs.pop('prefetch', False)
+        prefetch_size = kwargs.pop('prefetch_size', DEFAULT_BLOCK_SIZE)
+        threads = kwargs.pop('threads', None)
+        if prefetch_depth is True:
+            prefetch_depth = DEFAULT_PREFETCH_DEPTH
+        if engine not in _ENGINES:
+            raise ValueError("unknown parsing engine '%s'" % engine)
+        check_mode(kwargs.get('mode', 'text'))
+
         magic_dict = {
             b"\x1f\x8b\x08": "gz",
             b"\x42\x5a\x68": "bz2",
+            b"\x28\xb5\x2f\xfd": "zstd",
+            b"\xfd\x37\x7a\x58\x5a\x00": "xz",
+            b"\x04\x22\x4d\x18": "lz4",
             # "\x50\x4b\x03\x04": "zip"
         }  # Inspired by http://stackoverflow.com/a/13044946/1585509
         filename = _normalize_filename(filename)
@@ -61,21 +156,19 @@ class Open(object):
             if file_start.startswith(magic):
                 compression = ftype
                 break
-        if compression is 'bz2':
+        if compression == 'bz2':
             sequencefile = bz2file.BZ2File(filename=bufferedfile)
             peek = sequencefile.peek(1)
-        elif compression is 'gz':
-            if not bufferedfile.seekable():
-                bufferedfile.close()
-                raise ValueError("gziped data not streamable, pipe through zcat \
-                                first")
-            peek = gzip.GzipFile(filename=filename).read(1)
-            sequencefile = gzip.GzipFile(filename=filename)
+        elif compression == 'gz' and is_bgzf(file_start):
+            sequencefile = open_bgzf(bufferedfile, threads)
+            peek = sequencefile.peek(1)
+        elif compression is not None:
+            sequencefile = open_compressed(bufferedfile, compression)
+            peek = sequencefile.peek(1)
         else:
             peek = bufferedfile.peek(1)
             sequencefile = bufferedfile
 
-        iter_fn = None
         try:
             first_char = peek[0]
         except IndexError as err:
@@ -86,15 +179,28 @@ class Open(object):
         except TypeError:
             pass
 
-        if first_char == '>':
-            iter_fn = fasta_iter
-        elif first_char == '@':
-            iter_fn = fastq_iter
-
+        if engine == 'mmap' and (compression is not None or
+                                 not os.path.isfile(filename)):
+            engine = 'block'  # Only regular, uncompressed files are mapped
+        iter_fn = _ENGINES[engine].get(first_char)
         if iter_fn is None:
             raise ValueError("unknown file format for '%s'" % filename)
 
         self.sequencefile = sequencefile
+        self.compression = compression
+        if workers is not None and compression is None and \
+                os.path.isfile(filename):
+            if args:
+                raise TypeError("parser options must be given as keyword "
+                                "arguments when using 'workers'")
+            return parallel_iter(filename, first_char, workers, ordered,
+                                 **kwargs)
+        if prefetch_depth and engine != 'mmap':
+            sequencefile = prefetch(sequencefile, prefetch_depth,
+                                    prefetch_size)
+            self.sequencefile = sequencefile
+        if not args and _BATCH_OPTIONS.issuperset(kwargs):
+            self._batch_source = (sequencefile, first_char, kwargs)
         return iter_fn(sequencefile, *args, **kwargs)
 
     def __enter__(self):
@@ -108,6 +214,28 @@ class Open(object):
             return self.iter_fn
         return iter(())
 
+    def batches(self, n=DEFAULT_BATCH_SIZE):
+        """
+        Iterator over the records in columnar RecordBatch objects of up
+        to 'n' records each. Unless records were already read, or
+        'workers' is set, the file is scanned straight into the batch
+        buffers (see scan_batches) instead of going through records;
+        either way, use the batches or the records of an Open object,
+        not both.
+        """
+        if self._batch_source is not None and self._unstarted():
+            handle, first_char, kwargs = self._batch_source
+            return scan_batches(handle, first_char, n, **kwargs)
+        return iter_batches(self, n)
+
+    def _unstarted(self):
+        """
+        Returns True if no record has been read from the parser yet.
+        """
+        if getgeneratorstate is None:
+            return False
+        return getgeneratorstate(self.iter_fn) == GEN_CREATED
+
     def close(self):
         if self.sequencefile is not None:
             self.sequencefile.close()
@@ -118,9 +246,23 @@ class ScreedDB(MutableMapping):
     """
     Core on-disk dictionary interface for reading screed databases. Accepts a
     path string to a screed database
+
+    Records looked up by key can be kept in an LRU cache of at most
+    'cache_records' records and 'cache_bytes' characters of field values;
+    the cache is off unless one of them is given. Records are sized by the
+    stored lengths of their fields, and only those that fit in the cache
+    are read whole, sliceable fields included, and kept; larger records
+    are returned lazily, as without the cache. The same record object is
+    returned for each hit, so it should not be modified.
     """
 
-    def __init__(self, filepath):
+    # Number of rows read at a time when iterating over the database
+    fetch_size = 1000
+
+    # Number of keys looked up with a single query by iter_many()
+    lookup_size = 500
+
+    def __init__(self, filepath, cache_records=None, cache_bytes=None):
         try:
             sqlite3
         except NameError:
@@ -129,6 +271,9 @@ class ScreedDB(MutableMapping):
 
         self._filepath = filepath
         self._db = None
+        self._cache = None
+        if cache_records is not None or cache_bytes is not None:
+            self._cache = RecordCache(cache_records, cache_bytes)
         if not self._filepath.endswith(DBConstants.fileExtension):
             self._filepath += DBConstants.fileExtension
 
@@ -136,38 +281,40 @@ class ScreedDB(MutableMapping):
             raise ValueError('No such file: %s' % self._filepath)
 
         self._db = sqlite3.connect(self._filepath)
+        screedRecord._register_functions(self._db)
         cursor = self._db.cursor()
 
         # Make sure the database is a prepared screed database
         query = "SELECT name FROM sqlite_master WHERE type='table' "\
                 "ORDER BY name"
-        res = cursor.execute(query)
-        try:
-            dictionary_table, = res.fetchone()
-            admin_table, = res.fetchone()
-
-            if dictionary_table != DBConstants._DICT_TABLE:
-                raise TypeError
-            if admin_table != DBConstants._SCREEDADMIN:
-                raise TypeError
-
-        except TypeError:
+        tables = set([name for name, in cursor.execute(query)])
+        if DBConstants._DICT_TABLE not in tables or \
+                DBConstants._SCREEDADMIN not in tables:
             self._db.close()
             raise TypeError("Database %s is not a proper screed database"
                             % self._filepath)
 
-        nothing = res.fetchone()
-        if nothing is not None:
-            self._db.close()
-            raise TypeError("Database %s has too many tables." % filename)
-
         # Store the fields of the admin table in a tuple
         query = "SELECT %s, %s FROM %s" % \
             (DBConstants._FIELDNAME,
              DBConstants._ROLENAME,
              DBConstants._SCREEDADMIN)
         res = cursor.execute(query)
-        self.fields = tuple([(str(field), role) for field, role in res])
+        fields = [(str(field), role) for field, role in res]
+        admin = (DBConstants._LENGTH_ROLE, DBConstants._FORMAT_VERSION_ROLE)
+        self.fields = tuple([(field, role) for field, role in fields
+                             if role not in admin])
+
+        # Version of the layout of the database
+        self.format_version = 1
+        for field, role in fields:
+            if role == DBConstants._FORMAT_VERSION_ROLE:
+                self.format_version = int(field)
+        if self.format_version not in DBConstants._FORMAT_VERSIONS:
+            self._db.close()
+            raise TypeError("Database %s has format version %d, which this "
+                            "version of screed cannot read"
+                            % (self._filepath, self.format_version))
 
         # Indexed text column for querying, search fields to find
         self._queryBy = self.fields[1][0]
@@ -175,6 +322,85 @@ class ScreedDB(MutableMapping):
             if role == DBConstants._INDEXED_TEXT_KEY:
                 self._queryBy = fieldname
 
+        # Fields retrieved with the record, and sliceable fields retrieved
+        # lazily by _screed_attr objects of the class for how they are
+        # stored
+        sliceable = screedRecord._SLICEABLE_ATTRS
+        self._fullFields = tuple([fieldname for fieldname, role in self.fields
+                                  if role not in sliceable])
+        self._sliceableFields = tuple([
+            fieldname for fieldname, role in self.fields
+            if role in sliceable])
+        self._attrClasses = tuple([
+            sliceable[role] for fieldname, role in self.fields
+            if role in sliceable])
+
+        # Tables holding each field: the dictionary table, or in version 2
+        # databases a table of its own for data fields
+        self._tables = dict((fieldname, DBConstants._DICT_TABLE)
+                            for fieldname, role in self.fields)
+        if self.format_version >= 2:
+            for fieldname, role in self.fields:
+                table = fieldname + DBConstants._DATA_TABLE_SUFFIX
+                if table in tables:
+                    self._tables[fieldname] = table
+        self._sliceableTables = tuple([self._tables[fieldname] for fieldname
+                                       in self._sliceableFields])
+        self._sliceableColumns = tuple([
+            attrClass._column(fieldname, table) for fieldname, attrClass, table
+            in zip(self._sliceableFields, self._attrClasses,
+                   self._sliceableTables)])
+
+        # Besides the dictionary and admin tables, only the chunk tables of
+        # chunked fields and the tables of data fields are expected
+        tables -= set([DBConstants._DICT_TABLE, DBConstants._SCREEDADMIN])
+        tables -= set([fieldname + DBConstants._CHUNK_TABLE_SUFFIX
+                       for fieldname, role in self.fields
+                       if role == DBConstants._SLICEABLE_CHUNKED])
+        tables -= set(self._tables.values())
+        if tables:
+            self._db.close()
+            raise TypeError("Database %s has too many tables."
+                            % self._filepath)
+
+        # Columns holding the lengths of the sliceable fields, in databases
+        # created with them
+        self._storedLengths = set([field for field, role in fields
+                                   if role == DBConstants._LENGTH_ROLE])
+        self._lengthFields = tuple([
+            fieldname + DBConstants._LENGTH_SUFFIX
+            for fieldname in self._sliceableFields])
+        if not self._storedLengths.issuperset(self._lengthFields):
+            self._lengthFields = ()
+        self._rowFields = self._fullFields + self._lengthFields
+        self._rowColumns = tuple([
+            screedRecord._field_column(fieldname, self._tables[fieldname])
+            for fieldname in self._fullFields]) + self._lengthFields
+
+        # Tables the rows are read from, with or without the sliceable
+        # fields
+        rowTables = [self._tables[fieldname] for fieldname in self._fullFields]
+        self._rowFrom = screedRecord._join_tables(rowTables)
+        self._fullFrom = screedRecord._join_tables(
+            rowTables + list(self._sliceableTables))
+        self._keyColumn = screedRecord._field_column(self._queryBy)
+        self._idColumn = screedRecord._field_column(DBConstants._PRIMARY_KEY)
+
+        # Queries are built once; sqlite3 keeps them prepared
+        select = 'SELECT %s FROM %s WHERE %%s=?' % \
+            (','.join(self._rowColumns), self._rowFrom)
+        self._byKeyQuery = select % self._keyColumn
+        self._byKeyFullQuery = 'SELECT %s FROM %s WHERE %s=?' % \
+            (','.join(self._rowColumns + self._sliceableColumns),
+             self._fullFrom, self._keyColumn)
+        self._byIndexQuery = select % self._idColumn
+        self._sliceableByIdQuery = 'SELECT %s FROM %s WHERE %s IN (%%s)' % \
+            (','.join((self._idColumn,) + self._sliceableColumns),
+             screedRecord._join_tables(self._sliceableTables),
+             self._idColumn)
+        self._containsQuery = 'SELECT 1 FROM %s WHERE %s=?' % \
+            (DBConstants._DICT_TABLE, self._queryBy)
+
         # Sqlite PRAGMA settings for speed
         cursor.execute("PRAGMA cache_size=2000")
 
@@ -197,21 +423,80 @@ class ScreedDB(MutableMapping):
             self._db.close()
             self._db = None
 
+    def _recordFromRow(self, row):
+        """
+        Builds a record from a row of the '_rowFields' columns, optionally
+        followed by the sliceable fields
+        """
+        return screedRecord._recordFromRow(self._db, self._fullFields,
+                                           self._sliceableFields, row,
+                                           self._lengthFields,
+                                           self._attrClasses,
+                                           self._sliceableTables)
+
     def __getitem__(self, key):
         """
         Retrieves from database the record with the key 'key'
         """
-        cursor = self._db.cursor()
         key = str(key)  # So lazy retrieval objectes are evaluated
-        query = 'SELECT %s FROM %s WHERE %s=?' % (self._queryBy,
-                                                  DBConstants._DICT_TABLE,
-                                                  self._queryBy)
-        res = cursor.execute(query, (key,))
-        if res.fetchone() is None:
+        query = self._byKeyQuery
+        if self._cache is not None:
+            record = self._cache.get(key)
+            if record is not None:
+                return record
+            if not self._lengthFields:  # No lengths to size records by
+                query = self._byKeyFullQuery
+
+        row = self._db.execute(query, (key,)).fetchone()
+        if row is None:
             raise KeyError("Key %s not found" % key)
-        return screedRecord._buildRecord(self.fields, self._db,
-                                         key,
-                                         self._queryBy)
+        record = self._recordFromRow(row)
+        if self._cache is not None:
+            self._cacheRecords([record])
+        return record
+
+    def _cacheRecords(self, records):
+        """
+        Puts those of 'records' that fit in the cache into it. Records
+        read without their sliceable fields are sized by the stored
+        lengths of the fields, and the sliceable fields of those that fit
+        are then read, so that a record too large to be cached is never
+        read whole.
+        """
+        cache = self._cache
+        records = [record for record in records
+                   if cache.fits(record_size(record))]
+        if self._lengthFields and self._sliceableFields:
+            byId = dict((record[DBConstants._PRIMARY_KEY] + 1, record)
+                        for record in records)
+            ids = list(byId)
+            for i in range(0, len(ids), self.lookup_size):
+                chunk = ids[i:i + self.lookup_size]
+                query = self._sliceableByIdQuery % ','.join('?' * len(chunk))
+                for row in self._db.execute(query, chunk):
+                    record = byId[row[0]]
+                    for fieldname, value in zip(self._sliceableFields,
+                                                row[1:]):
+                        attr = record[fieldname]
+                        attr._value = attr._decode(value)
+        for record in records:
+            cache.put(record[self._queryBy], record)
+
+    def cache_info(self):
+        """
+        Returns the hits, misses, size and limits of the record cache as
+        a CacheInfo, or None if the cache is off
+        """
+        if self._cache is None:
+            return None
+        return self._cache.info()
+
+    def cache_clear(self):
+        """
+        Empties the record cache and resets its statistics
+        """
+        if self._cache is not None:
+            self._cache.clear()
 
     def values(self):
         """
@@ -226,21 +511,198 @@ class ScreedDB(MutableMapping):
         """
         return list(self.iteritems())
 
+    def get_many(self, keys, missing='skip'):
+        """
+        Retrieves the records with the given keys, in the same order, as
+        a list. See iter_many() for 'missing'.
+        """
+        return list(self.iter_many(keys, missing))
+
+    def iter_many(self, keys, missing='skip'):
+        """
+        Iterator over the records with the keys from the iterable 'keys',
+        in the same order. Keys are looked up 'lookup_size' at a time
+        with a single query each, so 'keys' can be a stream too large to
+        hold in memory. Keys that are not in the database are left out
+        with missing='skip', give None with missing='none' and raise
+        KeyError with missing='raise'. Only keys missing from the record
+        cache, if there is one, are looked up.
+        """
+        if missing not in _MISSING_POLICIES:
+            raise ValueError("unknown missing key policy '%s', must be "
+                             "one of: %s" %
+                             (missing, ', '.join(_MISSING_POLICIES)))
+
+        cache = self._cache
+        fields, tables = self._rowColumns, self._rowFrom
+        if cache is not None and not self._lengthFields:
+            fields += self._sliceableColumns
+            tables = self._fullFrom
+        keyColumn = self._rowFields.index(self._queryBy)
+        keys = iter(keys)
+        while True:
+            chunk = [str(key) for key in islice(keys, self.lookup_size)]
+            if not chunk:
+                break
+
+            # Records found in the cache, and rows read for the others
+            records = {}
+            if cache is not None:
+                for key in set(chunk):
+                    record = cache.get(key)
+                    if record is not None:
+                        records[key] = record
+            wanted = [key for key in set(chunk) if key not in records]
+
+            if wanted:
+                query = 'SELECT %s FROM %s WHERE %s IN (%s)' % \
+                    (','.join(fields), tables, self._keyColumn,
+                     ','.join('?' * len(wanted)))
+                found = dict((row[keyColumn], self._recordFromRow(row))
+                             for row in self._db.execute(query, wanted))
+                if cache is not None:
+                    self._cacheRecords(found.values())
+                records.update(found)
+
+            for key in chunk:
+                record = records.get(key)
+                if record is not None:
+                    yield record
+                elif missing == 'raise':
+                    raise KeyError("Key %s not found" % key)
+                elif missing == 'none':
+                    yield None
+
+    def fetch_regions(self, intervals, field='sequence'):
+        """
+        Returns a list with the region of 'field' of each of the given
+        intervals, in the same order. 'intervals' is an iterable of
+        (name, start, end) or (name, start, end, strand) tuples, with
+        0-based, end-exclusive coordinates as in BED, or the name of a
+        BED file. The strand is '+', '-' or '.' (none, read as '+');
+        regions on the '-' strand are reverse complemented. KeyError is
+        raised for names or a field that are not in the database, and
+        ValueError for other strands and intervals that don't lie within
+        their record.
+
+        Regions are read sorted by record and offset, and overlapping
+        regions of a record are read with a single slice.
+        """
+        if field not in [fieldname for fieldname, role in self.fields]:
+            raise KeyError("No such field: %s" % field)
+        if isinstance(intervals, str):
+            intervals = _bed_intervals(intervals)
+
+        requests = []
+        for interval in intervals:
+            name, start, end = interval[:3]
+            strand = interval[3] if len(interval) > 3 else '+'
+            start, end = int(start), int(end)
+            if not 0 <= start <= end:
+                raise ValueError("bad interval %s:%d-%d" % (name, start, end))
+            if strand not in _STRANDS:
+                raise ValueError("bad strand '%s' for interval %s:%d-%d, "
+                                 "must be one of: %s" %
+                                 (strand, name, start, end,
+                                  ', '.join(_STRANDS)))
+            requests.append((str(name), start, end, strand))
+
+        rowids = self._rowids(set([request[0] for request in requests]))
+        lengths = self._fieldLengths(field, set(rowids.values()))
+        for name, start, end, strand in requests:
+            if end > lengths[rowids[name]]:
+                raise ValueError("interval %s:%d-%d runs past the end of "
+                                 "%s, of length %d" %
+                                 (name, start, end, name,
+                                  lengths[rowids[name]]))
+        order = sorted(range(len(requests)),
+                       key=lambda i: (rowids[requests[i][0]],
+                                      requests[i][1]))
+
+        attrClass = screedRecord._screed_attr
+        if field in self._sliceableFields:
+            attrClass = self._attrClasses[self._sliceableFields.index(field)]
+        table = self._tables.get(field, DBConstants._DICT_TABLE)
+
+        results = [None] * len(requests)
+        for rowid, members in groupby(order,
+                                      key=lambda i: rowids[requests[i][0]]):
+            # Overlapping and adjacent regions are merged into spans
+            spans = []
+            for i in members:
+                start, end = requests[i][1:3]
+                if spans and start <= spans[-1][1]:
+                    spans[-1][1] = max(spans[-1][1], end)
+                    spans[-1][2].append(i)
+                else:
+                    spans.append([start, end, [i]])
+
+            attr = attrClass(self._db, field, rowid, DBConstants._PRIMARY_KEY,
+                             table)
+            if attrClass is screedRecord._screed_attr and len(spans) > 1:
+                str(attr)  # substr() reads all of it anyway; keep it once
+            for spanStart, spanEnd, members in spans:
+                data = attr[spanStart:spanEnd]
+                for i in members:
+                    name, start, end, strand = requests[i]
+                    region = data[start - spanStart:end - spanStart]
+                    if strand == '-':
+                        region = reverse_complement_iupac(region)
+                    results[i] = region
+        return results
+
+    def _fieldLengths(self, field, rowids):
+        """
+        Returns a dictionary mapping each of the given primary keys to the
+        length of 'field' in its record, read from the stored length
+        column if there is one
+        """
+        table = self._tables[field]
+        column = field + DBConstants._LENGTH_SUFFIX
+        if column in self._storedLengths:
+            table = DBConstants._DICT_TABLE
+        else:
+            column = 'length(%s)' % screedRecord._field_column(field, table)
+        lengths = {}
+        rowids = list(rowids)
+        for i in range(0, len(rowids), self.lookup_size):
+            chunk = rowids[i:i + self.lookup_size]
+            query = 'SELECT %s, %s FROM %s WHERE %s IN (%s)' % \
+                (self._idColumn, column, screedRecord._join_tables([table]),
+                 self._idColumn, ','.join('?' * len(chunk)))
+            lengths.update(self._db.execute(query, chunk))
+        return lengths
+
+    def _rowids(self, keys):
+        """
+        Returns a dictionary mapping each of the given keys to the primary
+        key of its record. Raises KeyError if a key is not found.
+        """
+        rowids = {}
+        keys = iter(keys)
+        while True:
+            chunk = list(islice(keys, self.lookup_size))
+            if not chunk:
+                break
+            query = 'SELECT %s, %s FROM %s WHERE %s IN (%s)' % \
+                (self._queryBy, DBConstants._PRIMARY_KEY,
+                 DBConstants._DICT_TABLE, self._queryBy,
+                 ','.join('?' * len(chunk)))
+            rowids.update(self._db.execute(query, chunk))
+            for key in chunk:
+                if key not in rowids:
+                    raise KeyError("Key %s not found" % key)
+        return rowids
+
     def loadRecordByIndex(self, index):
         """
         Retrieves record from database at the given index
         """
-        cursor = self._db.cursor()
         index = int(index) + 1  # Hack to make indexing start at 0
-        query = 'SELECT %s FROM %s WHERE %s=?' % (DBConstants._PRIMARY_KEY,
-                                                  DBConstants._DICT_TABLE,
-                                                  DBConstants._PRIMARY_KEY)
-        res = cursor.execute(query, (index,))
-        if res.fetchone() is None:
+        row = self._db.execute(self._byIndexQuery, (index,)).fetchone()
+        if row is None:
             raise KeyError("Index %d not found" % index)
-        return screedRecord._buildRecord(self.fields, self._db,
-                                         index,
-                                         DBConstants._PRIMARY_KEY)
+        return self._recordFromRow(row)
 
     def __len__(self):
         """
@@ -261,14 +723,31 @@ class ScreedDB(MutableMapping):
         return "<%s, '%s'>" % (self.__class__.__name__,
                                self._filepath)
 
-    def itervalues(self):
+    def itervalues(self, lazy=True):
         """
-        Iterator over records in the database
+        Iterator over records in the database, in order. The records are
+        read in a single scan of the table, 'fetch_size' rows at a time.
+        With lazy=False sliceable fields (e.g. FASTA sequences) are read
+        in the same scan instead of one by one when used, which is what
+        a full dump of the database needs.
         """
-        for index in range(1, self.__len__() + 1):
-            yield screedRecord._buildRecord(self.fields, self._db,
-                                            index,
-                                            DBConstants._PRIMARY_KEY)
+        fields, tables = self._rowColumns, self._rowFrom
+        if not lazy:
+            fields += self._sliceableColumns
+            tables = self._fullFrom
+        query = 'SELECT %s FROM %s ORDER BY %s' % \
+            (','.join(fields), tables, self._idColumn)
+        cursor = self._db.cursor()
+        cursor.execute(query)
+        try:
+            while True:
+                rows = cursor.fetchmany(self.fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._recordFromRow(row)
+        finally:
+            cursor.close()
 
     def iterkeys(self):
         """
@@ -283,11 +762,41 @@ class ScreedDB(MutableMapping):
     def __iter__(self):
         return self.iterkeys()
 
-    def iteritems(self):
+    def lengths(self, field='sequence'):
+        """
+        Iterator over the lengths of the given field of the records, in
+        order. Databases store the lengths of sliceable fields, so these
+        are read without reading the field itself.
+        """
+        names = [fieldname for fieldname, role in self.fields]
+        if field not in names:
+            raise KeyError("No such field: %s" % field)
+        lengthField = field + DBConstants._LENGTH_SUFFIX
+        tables = DBConstants._DICT_TABLE
+        if lengthField not in self._storedLengths:
+            lengthField = 'length(%s)' % \
+                screedRecord._field_column(field, self._tables[field])
+            tables = screedRecord._join_tables([self._tables[field]])
+
+        query = 'SELECT %s FROM %s ORDER BY %s' % \
+            (lengthField, tables, self._idColumn)
+        cursor = self._db.cursor()
+        cursor.execute(query)
+        try:
+            while True:
+                rows = cursor.fetchmany(self.fetch_size)
+                if not rows:
+                    break
+                for length, in rows:
+                    yield length
+        finally:
+            cursor.close()
+
+    def iteritems(self, lazy=True):
         """
         Iterator returning a (index, record) pairs
         """
-        for v in self.itervalues():
+        for v in self.itervalues(lazy):
             yield v[DBConstants._PRIMARY_KEY], v
 
     def has_key(self, key):
@@ -306,10 +815,7 @@ class ScreedDB(MutableMapping):
         """
         Returns true if given key exists in database, false otherwise
         """
-        cursor = self._db.cursor()
-        query = 'SELECT %s FROM %s WHERE %s = ?' % \
-                (self._queryBy, DBConstants._DICT_TABLE, self._queryBy)
-        if cursor.execute(query, (key,)).fetchone() is None:
+        if self._db.execute(self._containsQuery, (key,)).fetchone() is None:
             return False
         return True
 
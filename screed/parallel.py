@@ -0,0 +1,273 @@
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+Parallel parsing of a single FASTA/FASTQ file.
+
+The file is split into byte ranges, each range is moved to the start of
+the first record in it, and the ranges are parsed by the block engine
+in a pool of worker processes.
+"""
+
+from __future__ import absolute_import
+
+import io
+import multiprocessing
+import os
+import time
+from collections import deque
+from operator import attrgetter
+
+try:
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+except ImportError:
+    pass
+
+from .fasta import fasta_block_iter
+from .fastq import fastq_block_iter
+from .screedRecord import Record, FastaRecord, FastqRecord
+
+# Default (maximum) amount of the file parsed by one task
+DEFAULT_CHUNK_SIZE = 16 << 20
+_MIN_CHUNK_SIZE = 1 << 16
+
+# Amount read at a time, and how many lines to check, when looking for
+# the start of a record
+_RESYNC_WINDOW = 1 << 16
+_RESYNC_MAX_LINES = 1000
+
+_BLOCK_ENGINES = {'>': fasta_block_iter, '@': fastq_block_iter}
+
+# Records are sent back from the workers as tuples of these fields, which
+# pickle several times faster than record objects
+_FIELDS = {'>': ('name', 'description', 'sequence'),
+           '@': ('name', 'annotations', 'sequence', 'quality')}
+
+
+def _is_fastq_record(lines):
+    """
+    Returns true if 'lines' (at least four of them, the first starting
+    with '@') look like a four-line FASTQ record followed by another
+    record or by the end of the file. A quality line starting with '@'
+    fails this because it is followed by a header and a sequence line,
+    not by a '+' line.
+    """
+    if not lines[2].startswith(b'+'):
+        return False
+    if len(lines[1].strip()) != len(lines[3].strip()):
+        return False
+    return len(lines) == 4 or lines[4].startswith(b'@')
+
+
+def _find_fasta_start(handle, offset):
+    """
+    Returns the offset of the first line starting with '>' at or after
+    'offset', or the file size if there is none.
+    """
+    # 'data' starts one byte early, so that a line starting right at
+    # 'offset' is found after a newline
+    position = offset - 1
+    handle.seek(position)
+    data = handle.read(_RESYNC_WINDOW)
+    while True:
+        found = data.find(b'\n>')
+        if found != -1:
+            return position + found + 1
+        chunk = handle.read(_RESYNC_WINDOW)
+        if not chunk:
+            return position + len(data)
+        position += len(data) - 1
+        data = data[-1:] + chunk
+
+
+def _find_fastq_start(handle, offset):
+    """
+    Returns the offset of the first four-line FASTQ record starting at
+    or after 'offset', or the file size if there is none.
+    """
+    position = offset - 1
+    handle.seek(position)
+    data = b''
+    eof = False
+    start = 0
+    for _ in range(_RESYNC_MAX_LINES):
+        # Make sure 'data' holds the next line and the five after it
+        while not eof and data.count(b'\n', start) < 6:
+            chunk = handle.read(_RESYNC_WINDOW)
+            eof = not chunk
+            data += chunk
+
+        eol = data.find(b'\n', start)
+        if eol == -1 or eol + 1 == len(data):
+            return position + len(data)
+        start = eol + 1
+
+        if data.startswith(b'@', start):
+            end = start
+            for _ in range(5):
+                end = data.find(b'\n', end) + 1
+                if end == 0:
+                    end = len(data)
+                    break
+            lines = data[start:end].split(b'\n')
+            if lines[-1] == b'':
+                lines.pop()
+            if len(lines) >= 4 and _is_fastq_record(lines):
+                return position + start
+
+    raise ValueError("cannot find a FASTQ record start after byte %d; "
+                     "parallel parsing needs four-line FASTQ" % offset)
+
+
+def find_record_start(handle, offset, first_char):
+    """
+    Returns the offset of the first record starting at or after 'offset'
+    in the given seekable binary file, or the file size if there is none.
+    'first_char' is '>' for FASTA and '@' for FASTQ. FASTQ files must have
+    four-line records; ValueError is raised if no record start can be
+    recognized.
+    """
+    if offset == 0:
+        return 0
+    if first_char == '>':
+        return _find_fasta_start(handle, offset)
+    return _find_fastq_start(handle, offset)
+
+
+def _parse_range(filename, start, end, first_char, kwargs, fields=None,
+                 transform=None):
+    """
+    Parse the records starting in [start, end) of the given file, returning
+    a list of tuples of their 'fields' (by default the _FIELDS of the
+    format), passed through transform() if given, and the time it took.
+    """
+    began = time.time()
+    with io.open(filename, 'rb') as handle:
+        begin = find_record_start(handle, start, first_char)
+        stop = find_record_start(handle, end, first_char)
+        if stop <= begin:
+            return [], time.time() - began
+        handle.seek(begin)
+        data = handle.read(stop - begin)
+
+    iter_fn = _BLOCK_ENGINES[first_char]
+    getter = attrgetter(*(fields or _FIELDS[first_char]))
+    rows = [getter(record)
+            for record in iter_fn(io.BytesIO(data), slots=True, **kwargs)]
+    if transform is not None:
+        rows = [transform(row) for row in rows]
+    return rows, time.time() - began
+
+
+def _fasta_records(rows, record_class):
+    for name, description, sequence in rows:
+        yield record_class(name=name, description=description,
+                           sequence=sequence)
+
+
+def _fastq_records(rows, record_class):
+    for name, annotations, sequence, quality in rows:
+        yield record_class(name=name, annotations=annotations,
+                           sequence=sequence, quality=quality)
+
+
+_BUILDERS = {'>': (_fasta_records, FastaRecord),
+             '@': (_fastq_records, FastqRecord)}
+
+
+def _byte_ranges(size, chunk_size):
+    """
+    Split [0, size) into consecutive ranges of 'chunk_size' bytes.
+    """
+    return [(start, min(start + chunk_size, size))
+            for start in range(0, size, chunk_size)]
+
+
+def _run(filename, first_char, workers, ordered, chunk_size, kwargs,
+         fields=None, transform=None):
+    """
+    Iterator over the (rows, seconds) results of _parse_range() for the
+    chunks of the given file, parsed in a pool of 'workers' processes.
+    """
+    try:
+        ProcessPoolExecutor
+    except NameError:
+        raise Exception("error: concurrent.futures is needed for this " +
+                        "functionality, but is not installed.")
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    size = os.path.getsize(filename)
+    if chunk_size is None:
+        chunk_size = min(DEFAULT_CHUNK_SIZE, -(-size // workers))
+        chunk_size = max(chunk_size, _MIN_CHUNK_SIZE)
+    tasks = iter(_byte_ranges(size, chunk_size))
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+
+    def submit():
+        task = next(tasks, None)
+        if task is not None:
+            start, end = task
+            pending.append(executor.submit(_parse_range, filename, start, end,
+                                           first_char, kwargs, fields,
+                                           transform))
+
+    try:
+        # Keep a bounded number of chunks in flight
+        for _ in range(2 * workers):
+            submit()
+
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = done.pop()
+                pending.remove(future)
+            result = future.result()
+            submit()
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def parallel_iter(filename, first_char, workers=None, ordered=True,
+                  chunk_size=None, **kwargs):
+    """
+    Iterator over the records of an uncompressed FASTA ('>') or FASTQ
+    ('@') file, parsed by 'workers' processes (default: one per CPU).
+    Records come out in file order, or in whatever order the chunks
+    finish if 'ordered' is false. Other arguments are passed on to the
+    block parsers.
+    """
+    build, record_class = _BUILDERS[first_char]
+    if not kwargs.pop('slots', False):
+        record_class = Record
+
+    for rows, seconds in _run(filename, first_char, workers, ordered,
+                              chunk_size, kwargs):
+        for record in build(rows, record_class):
+            yield record
+
+
+def parallel_rows(filename, first_char, fields, workers=None,
+                  chunk_size=None, transform=None, **kwargs):
+    """
+    Iterator over the records of an uncompressed FASTA ('>') or FASTQ
+    ('@') file as lists of tuples of the given fields, one list per chunk
+    of the file, in file order. The records are parsed and the tuples
+    made, and passed through transform() if given (which must be
+    picklable), by 'workers' processes (default: one per CPU). With a
+    'timings' dictionary, the time the workers spent on the chunks is
+    added to its 'workers' entry. Other arguments are passed on to the
+    block parsers.
+    """
+    timings = kwargs.pop('timings', None)
+    for rows, seconds in _run(filename, first_char, workers, True,
+                              chunk_size, kwargs, tuple(fields), transform):
+        if timings is not None:
+            timings['workers'] = timings.get('workers', 0) + seconds
+        yield rows
@@ -17,6 +17,9 @@ much faster for databases with many, many sequences.
 Unlike the normal seqdb, screed will load the entire sequence record
 into memory on request, so it's not good for large sequences.
 
+ScreedSequenceDB passes 'cache_records' and 'cache_bytes' on to ScreedDB,
+so that records requested again and again are kept in an LRU cache.
+
 All screed records are guaranteed to have an 'index', a 'name', and a
 'sequence' attribute; anything else is specific to the database writer
 you use.  The raw screed record (which contains any other information)
@@ -67,9 +70,12 @@ class ScreedSequenceDB(SequenceDB):
     """SequenceDB implementation based on screed; retrieve seqs by name."""
     itemClass = ScreedSequence
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, cache_records=None, cache_bytes=None):
         self.filepath = filepath
-        self.seqInfoDict = _ScreedSeqInfoDict_ByName(filepath)
+        self.cache_records = cache_records
+        self.cache_bytes = cache_bytes
+        self.seqInfoDict = _ScreedSeqInfoDict_ByName(filepath, cache_records,
+                                                     cache_bytes)
         SequenceDB.__init__(self)
 
     def _set_seqtype(self):
@@ -80,7 +86,8 @@ class ScreedSequenceDB(SequenceDB):
 
     # override inherited __reduce__/__getstate__/__setstate__ from SequenceDB.
     def __reduce__(self):
-        return (ScreedSequenceDB, (self.filepath,))
+        return (ScreedSequenceDB, (self.filepath, self.cache_records,
+                                   self.cache_bytes))
 
 
 class ScreedSequenceDB_ByIndex(SequenceDB):
@@ -118,8 +125,8 @@ class _ScreedSeqInfoDict_ByName(object, UserDict.DictMixin):
 
     """seqInfoDict implementation that uses names to retrieve records."""
 
-    def __init__(self, filepath):
-        self.sdb = ScreedDB(filepath)
+    def __init__(self, filepath, cache_records=None, cache_bytes=None):
+        self.sdb = ScreedDB(filepath, cache_records, cache_bytes)
 
     def __getitem__(self, k):
         v = self.sdb[k]
@@ -129,12 +136,10 @@ class _ScreedSeqInfoDict_ByName(object, UserDict.DictMixin):
         return self.sdb.keys()
 
     def itervalues(self):
-        i = 0
-        max_index = len(self.sdb)
-        while i < max_index:
-            v = self.sdb.loadRecordByIndex(i)
+        # Lazy records, so that lengths come from the stored length
+        # column and no sequence is read
+        for v in self.sdb.itervalues():
             yield _ScreedSequenceInfo(v.name, v)
-            i += 1
 
     def iteritems(self):
         for v in self.itervalues():
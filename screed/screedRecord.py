@@ -4,16 +4,31 @@ from __future__ import absolute_import
 from functools import total_ordering
 import types
 from . import DBConstants
+from . import twobit
+from .utils import to_str
 import gzip
 import bz2
 from io import BytesIO
+try:
+    import sqlite3
+except ImportError:
+    pass
 
 try:
-    from collections import MutableMapping
+    from collections.abc import MutableMapping
 except ImportError:
     import UserDict
     MutableMapping = UserDict.DictMixin
 
+# group_concat() takes an ORDER BY from SQLite 3.44 on; before that the
+# order in which it concatenates values is arbitrary, and the chunks of
+# chunked fields are joined in order by the screed_chunks() function
+# registered by _register_functions() instead
+try:
+    _ORDERED_GROUP_CONCAT = sqlite3.sqlite_version_info >= (3, 44, 0)
+except NameError:
+    _ORDERED_GROUP_CONCAT = False
+
 
 class Record(MutableMapping):
     """
@@ -37,6 +52,8 @@ class Record(MutableMapping):
         self.d[name] = value
 
     def __getattr__(self, name):
+        if name == 'd':  # Not set yet, e.g. while unpickling
+            raise AttributeError(name)
         try:
             return self.d[name]
         except KeyError:
@@ -67,6 +84,109 @@ class Record(MutableMapping):
         return repr(self.d)
 
 
+class _SlottedRecord(MutableMapping):
+    """
+    Base class for compact records with a fixed set of fields, kept in
+    __slots__ instead of a dict. Supports the same attribute access,
+    mapping access, slicing and len() as Record.
+    """
+    __slots__ = ()
+
+    def __setitem__(self, name, value):
+        if name not in self.__slots__:
+            raise KeyError("%s has no field '%s'" %
+                           (self.__class__.__name__, name))
+        setattr(self, name, value)
+
+    def __len__(self):
+        return len(self.sequence)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            trimmed = self.__class__.__new__(self.__class__)
+            for key in self:
+                setattr(trimmed, key, getattr(self, key))
+            trimmed.sequence = self.sequence[idx]
+            if hasattr(self, 'quality'):
+                trimmed.quality = self.quality[idx]
+            return trimmed
+        if idx in self.__slots__:
+            try:
+                return getattr(self, idx)
+            except AttributeError:
+                pass
+        raise KeyError(idx)
+
+    def __delitem__(self, key):
+        if key in self.__slots__:
+            try:
+                delattr(self, key)
+                return
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __iter__(self):
+        return (key for key in self.__slots__ if hasattr(self, key))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class FastaRecord(_SlottedRecord):
+    """
+    Compact record with the fields of a FASTA record.
+    """
+    __slots__ = ('name', 'description', 'sequence')
+
+    def __init__(self, name=None, sequence=None, description=None):
+        if name is not None:
+            self.name = name
+        if description is not None:
+            self.description = description
+        if sequence is not None:
+            self.sequence = sequence
+
+
+class FastqRecord(_SlottedRecord):
+    """
+    Compact record with the fields of a FASTQ record.
+    """
+    __slots__ = ('name', 'annotations', 'sequence', 'quality')
+
+    def __init__(self, name=None, sequence=None, annotations=None,
+                 quality=None):
+        if name is not None:
+            self.name = name
+        if annotations is not None:
+            self.annotations = annotations
+        if sequence is not None:
+            self.sequence = sequence
+        if quality is not None:
+            self.quality = quality
+
+
+def _field_column(fieldName, table=DBConstants._DICT_TABLE):
+    """
+    Returns the SQL expression selecting the given field, kept in 'table',
+    in queries on the tables joined by _join_tables()
+    """
+    return '%s.%s' % (table, fieldName)
+
+
+def _join_tables(tables):
+    """
+    Returns the FROM clause of a query on the dictionary table and the
+    given tables of fields, which are joined to it by record id
+    """
+    clause = DBConstants._DICT_TABLE
+    for table in sorted(set(tables) - set([DBConstants._DICT_TABLE])):
+        clause += ' LEFT JOIN %s ON %s.%s = %s.%s' % \
+            (table, table, DBConstants._PRIMARY_KEY, DBConstants._DICT_TABLE,
+             DBConstants._PRIMARY_KEY)
+    return clause
+
+
 @total_ordering
 class _screed_attr(object):
 
@@ -74,7 +194,8 @@ class _screed_attr(object):
     Sliceable database object that supports lazy retrieval
     """
 
-    def __init__(self, dbObj, attrName, rowName, queryBy):
+    def __init__(self, dbObj, attrName, rowName, queryBy,
+                 table=DBConstants._DICT_TABLE):
         """
         Initializes database object with specific record retrieval
         information
@@ -82,11 +203,15 @@ class _screed_attr(object):
         attrName = name of attr in db
         rowName = index/name of row
         queryBy = by name or index
+        table = table holding the attr, keyed by record id
         """
         self._dbObj = dbObj
         self._attrName = attrName
         self._rowName = rowName
         self._queryBy = queryBy
+        self._table = table
+        self._value = None
+        self._length = None  # Stored length, if the database has one
 
     def __getitem__(self, sliceObj):
         """
@@ -97,24 +222,62 @@ class _screed_attr(object):
             raise TypeError('__getitem__ argument must be of slice type')
         if not sliceObj.start <= sliceObj.stop:  # String reverse in future?
             raise ValueError('start must be less than stop in slice object')
-        length = sliceObj.stop - sliceObj.start
+        if self._value is not None and sliceObj.start >= 0:
+            return self._value[sliceObj.start:sliceObj.stop]
+        return self._slice(sliceObj.start, sliceObj.stop - sliceObj.start)
 
+    def _slice(self, start, length):
+        """
+        Retrieves 'length' characters from 'start' on from the database
+        """
         query = 'SELECT substr(%s, %d, %d) FROM %s WHERE %s = ?' \
-                % (self._attrName, sliceObj.start + 1, length,
-                   DBConstants._DICT_TABLE,
-                   self._queryBy)
+                % (self._column(self._attrName, self._table), start + 1,
+                   length, _join_tables([self._table]),
+                   _field_column(self._queryBy))
         cur = self._dbObj.cursor()
-        result = cur.execute(query, (str(self._rowName),))
+        result = cur.execute(query, (self._rowName,))
         try:
             subStr, = result.fetchone()
         except TypeError:
             raise KeyError("Key %s not found" % self._rowName)
-        return str(subStr)
+        return self._decode(subStr)
+
+    def _rowid(self):
+        """
+        Returns the primary key of the row holding the attribute
+        """
+        if self._queryBy == DBConstants._PRIMARY_KEY:
+            return self._rowName
+        query = 'SELECT %s FROM %s WHERE %s = ?' \
+                % (DBConstants._PRIMARY_KEY, DBConstants._DICT_TABLE,
+                   self._queryBy)
+        row = self._dbObj.execute(query, (self._rowName,)).fetchone()
+        if row is None:
+            raise KeyError("Key %s not found" % self._rowName)
+        return row[0]
+
+    @staticmethod
+    def _column(attrName, table=DBConstants._DICT_TABLE):
+        """
+        Returns the SQL expression selecting the stored value of the
+        attribute, kept in 'table', as read by _decode()
+        """
+        return _field_column(attrName, table)
+
+    @staticmethod
+    def _decode(value):
+        """
+        Returns the string for a value read from the database
+        """
+        return str(value)
 
     def __len__(self):
         """
-        Returns the length of the string
+        Returns the length of the string, without retrieving it if the
+        database stores its length
         """
+        if self._length is not None:
+            return self._length
         return len(self.__str__())
 
     def __repr__(self):
@@ -140,57 +303,228 @@ class _screed_attr(object):
 
     def __str__(self):
         """
-        Returns the full attribute as a string
+        Returns the full attribute as a string. It is retrieved once and
+        kept for later use.
         """
+        if self._value is not None:
+            return self._value
         query = 'SELECT %s FROM %s WHERE %s = ?' \
-                % (self._attrName, DBConstants._DICT_TABLE, self._queryBy)
+                % (self._column(self._attrName, self._table),
+                   _join_tables([self._table]), _field_column(self._queryBy))
         cur = self._dbObj.cursor()
-        result = cur.execute(query, (str(self._rowName),))
+        result = cur.execute(query, (self._rowName,))
         try:
             record, = result.fetchone()
         except TypeError:
             raise KeyError("Key %s not found" % self._rowName)
-        return str(record)
+        self._value = self._decode(record)
+        return self._value
 
 
-def _buildRecord(fieldTuple, dbObj, rowName, queryBy):
+class _screed_blob_attr(_screed_attr):
+
     """
-    Constructs a dict-like object with record attribute names as keys and
-    _screed_attr objects as values
+    Sliceable attribute stored as a UTF-8 BLOB. Slices are read with
+    incremental blob I/O where sqlite3 supports it (Python 3.11+), which
+    only reads the pages the slice is on; offsets are in bytes, which is
+    the same as characters for sequences. The blob handle is kept open
+    for further slices, so that sqlite only finds its pages once.
     """
 
-    # Separate the lazy and full retrieval objects
-    kvResult = []
-    fullRetrievals = []
-    for fieldname, role in fieldTuple:
-        if role == DBConstants._SLICEABLE_TEXT:
-            kvResult.append((fieldname, _screed_attr(dbObj,
-                                                     fieldname,
-                                                     rowName,
-                                                     queryBy)))
-        else:
-            fullRetrievals.append(fieldname)
+    _blob = None
 
-    # Retrieve the full text fields from the db
-    subs = ','.join(fullRetrievals)
-    query = 'SELECT %s FROM %s WHERE %s=?' % \
-            (subs, DBConstants._DICT_TABLE, queryBy)
-    cur = dbObj.cursor()
-    res = cur.execute(query, (rowName,))
+    @staticmethod
+    def _decode(value):
+        return to_str(bytes(value))
+
+    def _slice(self, start, length):
+        if start < 0:  # Left to substr(), which counts from the end
+            return _screed_attr._slice(self, start, length)
+        return self._decode(self._read(start, length))
+
+    def _read(self, offset, size):
+        """
+        Returns 'size' bytes of the stored value from 'offset' on
+        """
+        try:
+            blobopen = self._dbObj.blobopen
+        except AttributeError:  # No incremental blob I/O in this sqlite3
+            query = 'SELECT substr(%s, %d, %d) FROM %s WHERE %s = ?' \
+                    % (self._column(self._attrName, self._table),
+                       offset + 1, size, _join_tables([self._table]),
+                       _field_column(self._queryBy))
+            row = self._dbObj.execute(query, (self._rowName,)).fetchone()
+            if row is None:
+                raise KeyError("Key %s not found" % self._rowName)
+            return bytes(row[0])
+
+        if self._blob is None:
+            self._blob = blobopen(self._table, self._attrName,
+                                  self._rowid(), readonly=True)
+        self._blob.seek(min(offset, len(self._blob)))
+        return self._blob.read(size)
+
+
+class _screed_2bit_attr(_screed_blob_attr):
+
+    """
+    Sliceable attribute stored 2-bit packed (see the twobit module).
+    Slices read the header and runs of the value once, then only the
+    packed bytes they cover.
+    """
+
+    _header = None
+
+    @staticmethod
+    def _decode(value):
+        return twobit.decode(bytes(value))
 
-    # Add the full text fields to the result tuple list
-    data = tuple([str(r) for r in res.fetchone()])
-    kvResult.extend(zip(fullRetrievals, data))
+    def _slice(self, start, length):
+        if start < 0:  # substr() semantics, on the decoded value
+            row = self._dbObj.execute('SELECT substr(?, ?, ?)',
+                                      (self.__str__(), start + 1,
+                                       length)).fetchone()
+            return row[0]
+
+        if self._header is None:
+            self._header = twobit.read_header(self._read)
+        end = min(start + length, self._header.length)
+        start = min(start, end)
+        first, last = start // 4, (end + 3) // 4
+        packed = self._read(self._header.offset + first, last - first)
+        return twobit.decode_region(self._header, packed, first * 4, start,
+                                    end)
+
+
+class _screed_chunked_attr(_screed_attr):
+
+    """
+    Sliceable attribute stored in pieces in a table of its own, keyed by
+    record id and start offset. Slices read only the pieces they overlap.
+    """
+
+    @staticmethod
+    def _column(attrName, table=None):
+        record, start, data = DBConstants._CHUNK_COLUMNS
+        chunks = attrName + DBConstants._CHUNK_TABLE_SUFFIX
+        rowid = _field_column(DBConstants._PRIMARY_KEY)
+        if not _ORDERED_GROUP_CONCAT:
+            return "screed_chunks('%s', %s)" % (chunks, rowid)
+        return "(SELECT group_concat(%s, '' ORDER BY %s) FROM %s " \
+            "WHERE %s = %s)" % (data, start, chunks, record, rowid)
+
+    @staticmethod
+    def _decode(value):
+        if value is None:  # No chunks
+            return ''
+        return str(value)
+
+    def _slice(self, start, length):
+        if start < 0:  # Left to substr(), which counts from the end
+            return _screed_attr._slice(self, start, length)
+
+        # The chunks from the last one starting at or before 'start' to the
+        # last one starting before the end of the slice
+        record, offset, data = DBConstants._CHUNK_COLUMNS
+        table = self._attrName + DBConstants._CHUNK_TABLE_SUFFIX
+        query = 'SELECT %s, %s FROM %s WHERE %s = ?1 AND %s < ?3 AND ' \
+                '%s >= (SELECT coalesce(max(%s), 0) FROM %s ' \
+                'WHERE %s = ?1 AND %s <= ?2) ORDER BY %s' \
+                % (offset, data, table, record, offset, offset, offset,
+                   table, record, offset, offset)
+        rows = self._dbObj.execute(
+            query, (self._rowid(), start, start + length)).fetchall()
+        if not rows:
+            return ''
+        first = rows[0][0]
+        value = ''.join([str(chunk) for offset, chunk in rows])
+        return value[start - first:start - first + length]
+
+
+# Attribute classes of the storage roles of sliceable fields
+_SLICEABLE_ATTRS = {
+    DBConstants._SLICEABLE_TEXT: _screed_attr,
+    DBConstants._SLICEABLE_BLOB: _screed_blob_attr,
+    DBConstants._SLICEABLE_CHUNKED: _screed_chunked_attr,
+    DBConstants._SLICEABLE_2BIT: _screed_2bit_attr,
+}
+
+
+def _register_functions(dbObj):
+    """
+    Registers the SQL functions used by the queries of the attribute
+    objects on the database handle 'dbObj'
+    """
+    record, start, data = DBConstants._CHUNK_COLUMNS
+
+    def chunks(table, rowid):
+        # The value of a chunked field, from its chunks in offset order
+        query = 'SELECT %s FROM %s WHERE %s = ? ORDER BY %s' % \
+            (data, table, record, start)
+        values = [str(chunk) for chunk, in dbObj.execute(query, (rowid,))]
+        if not values:
+            return None
+        return ''.join(values)
+
+    dbObj.create_function('screed_chunks', 2, chunks)
+
+
+def _recordFromRow(dbObj, fullFields, sliceableFields, row, lengthFields=(),
+                   attrClasses=None, tables=None):
+    """
+    Constructs a record from a row holding the values of 'fullFields',
+    which include the primary key, then those of 'lengthFields', the
+    lengths of the sliceable fields, if given. Sliceable fields become
+    _screed_attr objects (or objects of the matching 'attrClasses') that
+    retrieve their value by primary key when used, from the dictionary
+    table or the matching 'tables', unless the row goes on with the
+    values of 'sliceableFields' as well.
+    """
+    nfull = len(fullFields)
+    data = [str(r) for r in row[:nfull]]
+    lengths = row[nfull:nfull + len(lengthFields)]
+    preloaded = row[nfull + len(lengthFields):]
+    rowid = int(row[fullFields.index(DBConstants._PRIMARY_KEY)])
+    kvResult = []
+    if attrClasses is None:
+        attrClasses = [_screed_attr] * len(sliceableFields)
+    if tables is None:
+        tables = [DBConstants._DICT_TABLE] * len(sliceableFields)
+    for i, fieldname in enumerate(sliceableFields):
+        attr = attrClasses[i](dbObj, fieldname, rowid,
+                              DBConstants._PRIMARY_KEY, tables[i])
+        if lengths:
+            attr._length = lengths[i]
+        if preloaded:
+            attr._value = attr._decode(preloaded[i])
+        kvResult.append((fieldname, attr))
+    kvResult.extend(zip(fullFields, data))
 
     # Hack to make indexing start at 0
-    hackedResult = []
-    for key, value in kvResult:
-        if key == DBConstants._PRIMARY_KEY:
-            hackedResult.append((key, int(value) - 1))
-        else:
-            hackedResult.append((key, value))
+    result = dict(kvResult)
+    result[DBConstants._PRIMARY_KEY] = rowid - 1
+    return Record(**result)
 
-    return Record(**dict(hackedResult))
+
+def _buildRecord(fieldTuple, dbObj, rowName, queryBy):
+    """
+    Constructs a dict-like object with record attribute names as keys and
+    _screed_attr objects as values
+    """
+    fullFields = [fieldname for fieldname, role in fieldTuple
+                  if role not in _SLICEABLE_ATTRS]
+    sliceableFields = [fieldname for fieldname, role in fieldTuple
+                       if role in _SLICEABLE_ATTRS]
+    attrClasses = [_SLICEABLE_ATTRS[role] for fieldname, role in fieldTuple
+                   if role in _SLICEABLE_ATTRS]
+
+    query = 'SELECT %s FROM %s WHERE %s=?' % \
+            (','.join(fullFields), DBConstants._DICT_TABLE, queryBy)
+    row = dbObj.execute(query, (rowName,)).fetchone()
+    if row is None:
+        raise KeyError("Key %s not found" % rowName)
+    return _recordFromRow(dbObj, fullFields, sliceableFields, row,
+                          attrClasses=attrClasses)
 
 
 def write_fastx(record, fileobj):
@@ -203,6 +537,11 @@ def write_fastx(record, fileobj):
                    'handle with mode "wb" or an instance of "BytesIO"')
         raise AttributeError(message)
 
+    if isinstance(record.name, bytes):
+        # Records parsed in 'bytes' mode are written out as they are
+        _write_fastx_bytes(record, fileobj)
+        return
+
     defline = record.name
     if hasattr(record, 'description'):
         defline += ' ' + record.description
@@ -220,6 +559,21 @@ def write_fastx(record, fileobj):
     fileobj.write(recstr.encode('utf-8'))
 
 
+def _write_fastx_bytes(record, fileobj):
+    """Write a record whose fields are bytes, without any re-encoding."""
+    defline = record.name
+    if hasattr(record, 'description'):
+        defline += b' ' + record.description
+
+    if hasattr(record, 'quality'):
+        recstr = b''.join((b'@', defline, b'\n', record.sequence, b'\n+\n',
+                           record.quality, b'\n'))
+    else:
+        recstr = b''.join((b'>', defline, b'\n', record.sequence, b'\n'))
+
+    fileobj.write(recstr)
+
+
 def write_fastx_pair(read1, read2, fileobj):
     """Write a pair of sequence records to 'fileobj' in FASTA/FASTQ format."""
     if hasattr(read1, 'quality'):
@@ -0,0 +1,456 @@
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+File-like wrappers used by screed.open around the raw or compressed input.
+"""
+
+from __future__ import absolute_import
+
+import io
+import multiprocessing
+import struct
+import threading
+import zlib
+from collections import deque
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    pass
+
+try:
+    import lzma
+except ImportError:
+    pass
+
+try:
+    import zstandard
+except ImportError:
+    pass
+
+try:
+    import lz4.frame
+except ImportError:
+    pass
+
+from .utils import DEFAULT_BLOCK_SIZE
+
+# Default number of buffers read ahead by a PrefetchReader
+DEFAULT_PREFETCH_DEPTH = 4
+
+# How often a blocked reader thread checks whether it has been closed
+_POLL_INTERVAL = 0.1
+
+# How long closing a PrefetchReader waits for its thread to stop
+_CLOSE_TIMEOUT = 1.0
+
+# Amount of compressed data read at a time by the decompressing readers
+_COMPRESSED_CHUNK_SIZE = 1 << 16
+
+
+# gzip header: ID1, ID2, CM, FLG, MTIME, XFL, OS, XLEN (with FLG.FEXTRA)
+_GZIP_HEADER = struct.Struct('<4BI2BH')
+_GZIP_FEXTRA = 4
+
+# BGZF blocks handed to a thread at a time
+_BGZF_BLOCKS_PER_TASK = 16
+
+
+def _member_ended(decompressor):
+    try:
+        return decompressor.eof
+    except AttributeError:  # No 'eof' before Python 3.3
+        return bool(decompressor.unused_data)
+
+
+class DecompressingReader(io.RawIOBase):
+
+    """
+    Decompresses data read sequentially from 'fileobj', which does not
+    need to be seekable (e.g. a pipe or stdin). 'new_decompressor' is
+    called to make a decompressor for each member (or frame) of the
+    input; it must return an object like zlib.decompressobj() with
+    decompress(), 'eof' and 'unused_data'. Concatenated members are
+    decompressed one after the other, and zero padding after a member
+    is skipped. Closing the reader closes 'fileobj'.
+    """
+
+    def __init__(self, fileobj, new_decompressor):
+        io.RawIOBase.__init__(self)
+        self._fileobj = fileobj
+        self._new_decompressor = new_decompressor
+        self._decompressor = new_decompressor()
+        self._in_member = False
+        self._pending = memoryview(b'')
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def _decompress(self):
+        """
+        Decompress the next piece of input into self._pending.
+        """
+        if _member_ended(self._decompressor):
+            data = self._decompressor.unused_data or b''
+            self._decompressor = self._new_decompressor()
+            self._in_member = False
+        else:
+            data = b''
+
+        if not self._in_member:
+            data = data.lstrip(b'\x00')
+            while not data:
+                data = self._fileobj.read(_COMPRESSED_CHUNK_SIZE)
+                if not data:
+                    self._eof = True
+                    return
+                data = data.lstrip(b'\x00')
+            self._in_member = True
+        else:
+            data = self._fileobj.read(_COMPRESSED_CHUNK_SIZE)
+            if not data:
+                raise EOFError("Compressed file ended before the "
+                               "end-of-stream marker was reached")
+
+        self._pending = memoryview(self._decompressor.decompress(data))
+
+    def readinto(self, b):
+        while not self._pending:
+            if self._eof:
+                return 0
+            self._decompress()
+
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._fileobj.close()
+        io.RawIOBase.close(self)
+
+
+def _gzip_decompressor():
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+def _xz_decompressor():
+    try:
+        lzma
+    except NameError:
+        raise Exception("error: lzma is needed for this " +
+                        "functionality, but is not installed.")
+    return lzma.LZMADecompressor()
+
+
+def _zstd_decompressor():
+    try:
+        zstandard
+    except NameError:
+        raise Exception("error: zstandard is needed for this " +
+                        "functionality, but is not installed.")
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def _lz4_decompressor():
+    try:
+        lz4
+    except NameError:
+        raise Exception("error: lz4 is needed for this " +
+                        "functionality, but is not installed.")
+    return lz4.frame.LZ4FrameDecompressor()
+
+
+# Decompressors for the formats read by open_compressed
+_DECOMPRESSORS = {
+    'gz': _gzip_decompressor,
+    'xz': _xz_decompressor,
+    'zstd': _zstd_decompressor,
+    'lz4': _lz4_decompressor,
+}
+
+
+class GzipReader(DecompressingReader):
+
+    """
+    Decompresses gzip data read sequentially from 'fileobj', handling
+    concatenated members and zero padding like gzip.GzipFile does.
+    """
+
+    def __init__(self, fileobj):
+        DecompressingReader.__init__(self, fileobj, _gzip_decompressor)
+
+
+def open_compressed(fileobj, compression, buffer_size=io.DEFAULT_BUFFER_SIZE):
+    """
+    Returns a buffered binary file with the decompressed contents of
+    'fileobj', which may be a non-seekable stream. 'compression' is one
+    of 'gz', 'xz', 'zstd' or 'lz4'; the modules for the last two are
+    optional.
+    """
+    new_decompressor = _DECOMPRESSORS[compression]
+    return io.BufferedReader(DecompressingReader(fileobj, new_decompressor),
+                             buffer_size=buffer_size)
+
+
+def open_gzip(fileobj, buffer_size=io.DEFAULT_BUFFER_SIZE):
+    """
+    Returns a buffered binary file with the decompressed contents of the
+    gzip data in 'fileobj', which may be a non-seekable stream.
+    """
+    return io.BufferedReader(GzipReader(fileobj), buffer_size=buffer_size)
+
+
+def _bgzf_block_size(header, extra):
+    """
+    Returns the total size of the BGZF block with the given gzip header
+    and extra field, or None if they are not those of a BGZF block.
+    """
+    id1, id2, cm, flg = _GZIP_HEADER.unpack(header)[:4]
+    if (id1, id2, cm) != (0x1f, 0x8b, 8) or not flg & _GZIP_FEXTRA:
+        return None
+    position = 0
+    while position + 4 <= len(extra):
+        si1, si2, slen = struct.unpack_from('<BBH', extra, position)
+        if (si1, si2, slen) == (66, 67, 2):  # 'BC' subfield with BSIZE
+            bsize, = struct.unpack_from('<H', extra, position + 4)
+            return bsize + 1
+        position += 4 + slen
+    return None
+
+
+def is_bgzf(data):
+    """
+    Returns true if 'data' starts with the header of a BGZF block, the
+    blocked gzip format written by bgzip.
+    """
+    if len(data) < _GZIP_HEADER.size:
+        return False
+    xlen = _GZIP_HEADER.unpack(data[:_GZIP_HEADER.size])[-1]
+    extra = data[_GZIP_HEADER.size:_GZIP_HEADER.size + xlen]
+    if len(extra) < xlen:
+        return False
+    return _bgzf_block_size(data[:_GZIP_HEADER.size], extra) is not None
+
+
+def _inflate_blocks(blocks):
+    return b''.join([zlib.decompress(block, 16 + zlib.MAX_WBITS)
+                     for block in blocks])
+
+
+class BgzfReader(io.RawIOBase):
+
+    """
+    Decompresses BGZF data read sequentially from 'fileobj'. BGZF files
+    are series of independent gzip members, so groups of blocks are
+    decompressed in a pool of 'threads' threads (default: one per CPU)
+    while the results are returned in order. zlib releases the GIL while
+    it decompresses. Closing the reader closes 'fileobj'.
+    """
+
+    def __init__(self, fileobj, threads=None):
+        try:
+            ThreadPoolExecutor
+        except NameError:
+            raise Exception("error: concurrent.futures is needed for this " +
+                            "functionality, but is not installed.")
+
+        io.RawIOBase.__init__(self)
+        if threads is None:
+            threads = multiprocessing.cpu_count()
+        self._fileobj = fileobj
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+        self._window = 2 * threads
+        self._tasks = deque()
+        self._input_done = False
+        self._chunk = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def _read_block(self):
+        header = self._fileobj.read(_GZIP_HEADER.size)
+        if not header:
+            return None
+        if len(header) < _GZIP_HEADER.size:
+            raise EOFError("Compressed file ended before the "
+                           "end-of-stream marker was reached")
+        fields = _GZIP_HEADER.unpack(header)
+        flg, xlen = fields[3], fields[-1]
+        if not flg & _GZIP_FEXTRA:
+            raise IOError("not a BGZF block")
+        extra = self._fileobj.read(xlen)
+        if len(extra) < xlen:
+            raise EOFError("Compressed file ended before the "
+                           "end-of-stream marker was reached")
+
+        size = _bgzf_block_size(header, extra)
+        if size is None:
+            raise IOError("not a BGZF block")
+        rest = size - len(header) - len(extra)
+        body = self._fileobj.read(rest)
+        if len(body) < rest:
+            raise EOFError("Compressed file ended before the "
+                           "end-of-stream marker was reached")
+        return header + extra + body
+
+    def _submit(self):
+        """
+        Keep the thread pool busy with groups of blocks.
+        """
+        while not self._input_done and len(self._tasks) < self._window:
+            blocks = []
+            while len(blocks) < _BGZF_BLOCKS_PER_TASK:
+                block = self._read_block()
+                if block is None:
+                    self._input_done = True
+                    break
+                blocks.append(block)
+            if blocks:
+                self._tasks.append(self._executor.submit(_inflate_blocks,
+                                                         blocks))
+
+    def readinto(self, b):
+        while not self._chunk:
+            self._submit()
+            if not self._tasks:
+                return 0
+            task = self._tasks.popleft()
+            self._submit()
+            self._chunk = memoryview(task.result())
+
+        n = min(len(b), len(self._chunk))
+        b[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            for task in self._tasks:
+                task.cancel()
+            self._executor.shutdown(wait=True)
+            self._fileobj.close()
+        io.RawIOBase.close(self)
+
+
+def open_bgzf(fileobj, threads=None, buffer_size=io.DEFAULT_BUFFER_SIZE):
+    """
+    Returns a buffered binary file with the decompressed contents of the
+    BGZF data in 'fileobj', decompressed by 'threads' threads. With one
+    thread, or without concurrent.futures, the data is decompressed as
+    plain gzip in the reading thread.
+    """
+    try:
+        ThreadPoolExecutor
+    except NameError:
+        threads = 1
+    if threads == 1:
+        return open_gzip(fileobj, buffer_size)
+    return io.BufferedReader(BgzfReader(fileobj, threads),
+                             buffer_size=buffer_size)
+
+
+class PrefetchReader(io.RawIOBase):
+
+    """
+    Reads 'fileobj' ahead in a background thread, 'buffer_size' bytes at
+    a time, keeping up to 'depth' buffers in a queue. Decompressors
+    release the GIL while they work, so decompression in the thread
+    overlaps with parsing in the consumer. Errors raised by 'fileobj'
+    are raised again by read() once the buffers before them are used up.
+    Closing the reader stops the thread and closes 'fileobj'. A thread
+    blocked reading an idle pipe can't be stopped: close() doesn't wait
+    for it, and it closes 'fileobj' itself once its read returns.
+    """
+
+    def __init__(self, fileobj, depth=DEFAULT_PREFETCH_DEPTH,
+                 buffer_size=DEFAULT_BLOCK_SIZE):
+        if depth < 1:
+            raise ValueError("prefetch depth must be at least 1")
+        if buffer_size < 1:
+            raise ValueError("prefetch buffer size must be at least 1")
+        io.RawIOBase.__init__(self)
+        self._fileobj = fileobj
+        self._buffer_size = buffer_size
+        self._queue = queue.Queue(maxsize=depth)
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._running = True
+        self._close_on_exit = False
+        self._chunk = memoryview(b'')
+        self._eof = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stopped:
+            try:
+                self._queue.put(item, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def _run(self):
+        try:
+            while not self._stopped:
+                data = self._fileobj.read(self._buffer_size)
+                self._put(data)
+                if not data:
+                    break
+        except Exception as err:
+            self._put(err)
+        finally:
+            with self._lock:
+                self._running = False
+                if self._close_on_exit:
+                    self._fileobj.close()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._chunk:
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if isinstance(item, Exception):
+                self._eof = True
+                raise item
+            if not item:
+                self._eof = True
+                return 0
+            self._chunk = memoryview(item)
+
+        n = min(len(b), len(self._chunk))
+        b[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stopped = True
+            self._thread.join(_CLOSE_TIMEOUT)
+            with self._lock:
+                if self._running:  # Blocked in read(); it closes 'fileobj'
+                    self._close_on_exit = True
+                else:
+                    self._fileobj.close()
+        io.RawIOBase.close(self)
+
+
+def prefetch(fileobj, depth=DEFAULT_PREFETCH_DEPTH,
+             buffer_size=DEFAULT_BLOCK_SIZE):
+    """
+    Wrap 'fileobj' in a PrefetchReader, returning a buffered binary file
+    that supports readline() and peek() like io.open(..., 'rb').
+    """
+    return io.BufferedReader(PrefetchReader(fileobj, depth, buffer_size),
+                             buffer_size=buffer_size)
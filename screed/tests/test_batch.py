@@ -0,0 +1,134 @@
+from __future__ import absolute_import
+from array import array
+from io import BytesIO
+
+import pytest
+
+import screed
+from screed.batch import RecordBatch, iter_batches, scan_batches
+from screed.batch import _INDEX_TYPECODE
+from . import screed_tst_utils as utils
+
+
+def test_batches_fastq():
+    filename = utils.get_test_data('test.fastq')
+    with screed.open(filename) as f:
+        records = list(f)
+
+    batches = list(screed.open(filename, mode='bytes').batches(n=50))
+    assert [len(b) for b in batches] == [50, 50, 25]
+
+    i = 0
+    for batch in batches:
+        assert len(batch.offsets) == len(batch.lengths) == len(batch)
+        assert len(batch.sequences) == sum(batch.lengths)
+        assert len(batch.qualities) == len(batch.sequences)
+        for j in range(len(batch)):
+            record = records[i]
+            assert batch.names[j].decode('utf-8') == record.name
+            assert batch.sequence(j).decode('utf-8') == record.sequence
+            assert batch.quality(j).decode('utf-8') == record.quality
+            i += 1
+    assert i == len(records)
+
+
+def test_batches_fasta():
+    filename = utils.get_test_data('test.fa')
+    with screed.open(filename) as f:
+        records = list(f)
+
+    batch, = list(screed.open(filename).batches())
+    assert batch.names == [r.name for r in records]
+    assert batch.qualities is None
+    assert batch.offsets[0] == 0
+    assert batch.offsets[1] == batch.lengths[0]
+    for j, record in enumerate(records):
+        assert batch.sequence(j) == record.sequence.encode('utf-8')
+
+    with pytest.raises(AttributeError):
+        batch.quality(0)
+
+
+def test_batches_empty():
+    filename = utils.get_test_data('empty.fa')
+    assert list(screed.open(filename).batches()) == []
+
+
+def _batch_fields(batch):
+    return (batch.names, bytes(batch.sequences), list(batch.offsets),
+            list(batch.lengths), batch.qualities)
+
+
+@pytest.mark.parametrize('filename,first_char',
+                         [('test.fa', '>'), ('test.fastq', '@')])
+@pytest.mark.parametrize('mode', ['text', 'bytes'])
+@pytest.mark.parametrize('parse_description', [False, True])
+def test_scan_batches_matches_records(filename, first_char, mode,
+                                      parse_description):
+    filename = utils.get_test_data(filename)
+    with screed.open(filename, mode=mode,
+                     parse_description=parse_description) as records:
+        expected = [_batch_fields(b) for b in iter_batches(records, 40)]
+
+    # small block sizes force records to span block edges
+    for bufsize in (7, 100, 4096):
+        with open(filename, 'rb') as fp:
+            batches = scan_batches(fp, first_char, 40, parse_description,
+                                   bufsize, mode)
+            assert [_batch_fields(b) for b in batches] == expected, bufsize
+
+
+def test_scan_batches_multiline_fastq():
+    s = (b"@1 FOO\nACTG\nAC\n+\nAAAA\nAA\n"
+         b"@2\nAC\nGG\n+2\nAA\nA\nA\n"
+         b"@3\nACGT\n+\nAAAA")
+
+    for bufsize in (1, 3, 1000):
+        batch, = list(scan_batches(BytesIO(s), '@', bufsize=bufsize))
+        assert batch.names == ['1 FOO', '2', '3']
+        assert batch.sequences == b'ACTGACACGGACGT'
+        assert batch.qualities == b'AAAAAAAAAAAAAA'
+        assert list(batch.offsets) == [0, 6, 10]
+        assert list(batch.lengths) == [6, 4, 4]
+
+
+def test_scan_batches_unknown_format():
+    with pytest.raises(ValueError):
+        scan_batches(BytesIO(b'ACGT\n'), 'A')
+
+
+def test_batches_after_records():
+    # Once records were read the batches continue from the next record
+    filename = utils.get_test_data('test.fastq')
+    f = screed.open(filename, engine='block')
+    first = next(iter(f))
+    batch, = list(f.batches())
+    assert len(batch) == 124
+    assert batch.names[0] != first.name
+    f.close()
+
+
+def test_batch_to_numpy():
+    numpy = pytest.importorskip('numpy')
+
+    filename = utils.get_test_data('test.fastq')
+    batch = next(screed.open(filename, mode='bytes').batches(n=10))
+    arrays = batch.to_numpy()
+
+    assert arrays.sequences.dtype == numpy.uint8
+    assert list(arrays.lengths) == list(batch.lengths)
+    assert arrays.sequence(3).tobytes() == batch.sequence(3)
+
+
+@pytest.mark.parametrize('typecode', ['i', 'l', _INDEX_TYPECODE])
+def test_batch_to_numpy_typecodes(typecode):
+    numpy = pytest.importorskip('numpy')
+
+    records = RecordBatch(['a', 'b'], b'ACGTTT', array(typecode, [0, 4]),
+                          array(typecode, [4, 2]))
+    arrays = records.to_numpy()
+    assert arrays.offsets.dtype == numpy.dtype(typecode)
+    assert arrays.offsets.itemsize == array(typecode).itemsize
+    assert list(arrays.offsets) == [0, 4]
+    assert list(arrays.lengths) == [4, 2]
+    assert arrays.sequence(1).tobytes() == b'TT'
@@ -0,0 +1,64 @@
+import pytest
+
+from screed import Record
+from screed.cache import RecordCache, record_size
+
+
+def _record(name, sequence):
+    return Record(name=name, sequence=sequence, id=0)
+
+
+def test_lru_eviction():
+    cache = RecordCache(max_records=2)
+    a, b, c = [_record(name, 'ACGT') for name in 'abc']
+    cache.put('a', a)
+    cache.put('b', b)
+    assert cache.get('a') is a  # 'b' is now the least recently used
+    cache.put('c', c)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is a
+    assert cache.get('c') is c
+    assert cache.info()[:3] == (3, 1, 2)
+
+
+def test_byte_budget():
+    cache = RecordCache(max_bytes=25)
+    small = _record('a', 'ACGT')
+    assert record_size(small) == 5
+    cache.put('a', small)
+    cache.put('b', _record('b', 'A' * 10))
+    assert cache.info().bytes == 16
+
+    cache.put('c', _record('c', 'A' * 10))  # Evicts 'a'
+    assert cache.get('a') is None
+    assert len(cache) == 2
+    assert cache.info().bytes == 22
+
+    assert cache.fits(25) and not cache.fits(26)
+    cache.put('huge', _record('huge', 'A' * 100))  # Never kept
+    assert cache.get('huge') is None
+    assert len(cache) == 2
+
+
+def test_replace_and_clear():
+    cache = RecordCache()
+    cache.put('a', _record('a', 'ACGT'))
+    cache.put('a', _record('a', 'AC'))
+    assert cache.info().bytes == 3
+    cache.get('a')
+
+    cache.clear()
+    assert cache.info() == (0, 0, 0, 0, None, None)
+
+
+def test_fits_no_records():
+    cache = RecordCache(max_records=0)
+    assert not cache.fits(0)
+
+
+def test_bad_limits():
+    with pytest.raises(ValueError):
+        RecordCache(max_records=-1)
+    with pytest.raises(ValueError):
+        RecordCache(max_bytes=-1)
@@ -1,8 +1,12 @@
 import os
 import shutil
+import sqlite3
+
+import pytest
 
 import screed
 from screed.DBConstants import fileExtension
+from screed.cache import record_size
 from . import screed_tst_utils as utils
 
 
@@ -74,3 +78,741 @@ def test_wrongdb():
     except TypeError:
         os.unlink(blah)
         pass
+
+
+def test_create_db_bytes_records():
+    _testfq = utils.get_temp_filename('test.fastq')
+    shutil.copy(utils.get_test_data('test.fastq'), _testfq)
+
+    with screed.open(_testfq, parse_description=True, mode='bytes') as f:
+        screed.create_db(_testfq, screed.fastq.FieldTypes, f)
+    db = screed.ScreedDB(_testfq)
+
+    with screed.open(_testfq, parse_description=True) as f:
+        for record in f:
+            stored = db[record.name]
+            assert stored.name == record.name
+            assert stored.sequence == record.sequence
+            assert stored.quality == record.quality
+    assert len(db) == 125
+
+    db.close()
+    os.unlink(_testfq + fileExtension)
+
+
+def _count_queries(db):
+    if not hasattr(db._db, 'set_trace_callback'):
+        pytest.skip("sqlite3 does not support tracing before Python 3.3")
+    queries = []
+    db._db.set_trace_callback(queries.append)
+    return queries
+
+
+def test_lookup_single_query():
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    screed.make_db(_testfa)
+    db = screed.ScreedDB(_testfa)
+
+    queries = _count_queries(db)
+    record = db['ENSMICT00000012722']
+    assert len(queries) == 1
+    assert record.id == 0
+    assert db.loadRecordByIndex(0).name == record.name
+    assert len(queries) == 2
+
+    # Sliceable fields are retrieved once, by primary key
+    sequence = str(record.sequence)
+    assert len(queries) == 3
+    assert str(record.sequence) == sequence
+    assert record.sequence[5:10] == sequence[5:10]
+    assert len(record.sequence) == len(sequence)
+    assert len(queries) == 3
+
+    db.close()
+    os.unlink(_testfa + fileExtension)
+
+
+def test_itervalues_single_scan():
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    screed.make_db(_testfa)
+    db = screed.ScreedDB(_testfa)
+    db.fetch_size = 5
+    expected = [db.loadRecordByIndex(i) for i in range(len(db))]
+    sequences = [str(record.sequence) for record in expected]
+
+    queries = _count_queries(db)
+    records = list(db.itervalues(lazy=False))
+    assert len(queries) == 1
+    assert [r.id for r in records] == list(range(len(db)))
+    assert [r.name for r in records] == [r.name for r in expected]
+    assert [str(r.sequence) for r in records] == sequences
+    assert len(queries) == 1
+
+    records = list(db.itervalues())
+    assert str(records[-1].sequence) == sequences[-1]
+    assert len(queries) == 3
+
+    db.close()
+    os.unlink(_testfa + fileExtension)
+
+
+def test_get_many():
+    _testfq = utils.get_temp_filename('test.fastq')
+    shutil.copy(utils.get_test_data('test.fastq'), _testfq)
+    screed.make_db(_testfq)
+    db = screed.ScreedDB(_testfq)
+    db.lookup_size = 7
+
+    keys = db.keys()[::-3] + ['missing'] + db.keys()[:2]
+    records = db.get_many(keys)
+    assert [r.name for r in records] == keys[:-3] + keys[-2:]
+    for record in records:
+        assert record == db[record.name]
+
+    records = db.get_many(keys, missing='none')
+    assert records[-3] is None
+    assert [r.name for r in records if r is not None] == \
+        keys[:-3] + keys[-2:]
+
+    with pytest.raises(KeyError):
+        db.get_many(keys, missing='raise')
+    with pytest.raises(ValueError):
+        db.get_many(keys, missing='ignore')
+
+    stream = db.iter_many(key for key in keys)
+    assert next(stream).name == keys[0]
+    assert db.get_many([]) == []
+
+    db.close()
+    os.unlink(_testfq + fileExtension)
+
+
+def test_record_cache():
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    screed.make_db(_testfa)
+    db = screed.ScreedDB(_testfa, cache_records=2)
+    uncached = screed.ScreedDB(_testfa)
+    keys = db.keys()
+
+    first = db[keys[0]]
+    assert db[keys[0]] is first
+    assert first == uncached[keys[0]]
+    db[keys[1]]
+    db[keys[2]]  # Evicts keys[0]
+    assert db[keys[0]] is not first
+
+    info = db.cache_info()
+    assert (info.hits, info.misses, info.records) == (1, 4, 2)
+    assert info.bytes > 0
+
+    records = db.get_many([keys[0], keys[3], keys[0]])
+    assert records[0] is records[2]
+    assert db.cache_info().hits == 2
+
+    db.cache_clear()
+    assert db.cache_info()[:4] == (0, 0, 0, 0)
+    assert uncached.cache_info() is None
+
+    db.close()
+    uncached.close()
+    os.unlink(_testfa + fileExtension)
+
+
+@pytest.mark.parametrize('storage', ['text', 'chunked', '2bit'])
+def test_record_cache_large_records(storage):
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    screed.make_db(_testfa, storage=storage, chunk_size=100)
+    uncached = screed.ScreedDB(_testfa)
+    sizes = dict((record.name, record_size(record))
+                 for record in uncached.itervalues())
+    small = min(sizes, key=sizes.get)
+    large = max(sizes, key=sizes.get)
+    db = screed.ScreedDB(_testfa, cache_bytes=sizes[small])
+
+    # Records larger than the cache are sized by their stored lengths and
+    # not read whole, or kept
+    statements = []
+    db._db.set_trace_callback(statements.append)
+    for record in [db[large]] + db.get_many([large]):
+        assert record.sequence._value is None
+        assert len(record.sequence) == len(uncached[large].sequence)
+    db._db.set_trace_callback(None)
+    assert not [q for q in statements
+                if 'sequence' in q.replace('sequence_length', '')]
+    assert db.cache_info().records == 0
+
+    # Those that fit are read whole and kept
+    record = db[small]
+    assert record.sequence._value is not None
+    assert db.get_many([small])[0] is record
+    assert record == uncached[small]
+    assert db.cache_info()[:3] == (1, 3, 1)
+
+    db.close()
+    uncached.close()
+    os.unlink(_testfa + fileExtension)
+
+
+def test_stored_lengths():
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    screed.make_db(_testfa)
+    db = screed.ScreedDB(_testfa)
+    expected = [len(record.sequence) for record in screed.open(_testfa)]
+    assert 'sequence_length' not in [field for field, role in db.fields]
+
+    queries = _count_queries(db)
+    record = db.loadRecordByIndex(3)
+    assert len(record.sequence) == expected[3]
+    assert list(db.lengths()) == expected
+    assert len(queries) == 2
+    assert 'sequence_length' not in record.keys()
+
+    with pytest.raises(KeyError):
+        list(db.lengths('sequence_length'))
+    db.close()
+
+    # Databases without stored lengths still work
+    con = sqlite3.connect(_testfa + fileExtension)
+    con.execute("DELETE FROM SCREEDADMIN WHERE FIELDNAME='sequence_length'")
+    con.commit()
+    con.close()
+    db = screed.ScreedDB(_testfa)
+    assert len(db.loadRecordByIndex(3).sequence) == expected[3]
+    assert list(db.lengths()) == expected
+
+    db.close()
+    os.unlink(_testfa + fileExtension)
+
+
+def test_lengths_fastq():
+    _testfq = utils.get_temp_filename('test.fastq')
+    shutil.copy(utils.get_test_data('test.fastq'), _testfq)
+    screed.make_db(_testfq)
+    db = screed.ScreedDB(_testfq)
+    assert list(db.lengths()) == \
+        [len(record.sequence) for record in screed.open(_testfq)]
+    assert list(db.lengths('quality')) == list(db.lengths())
+
+    db.close()
+    os.unlink(_testfq + fileExtension)
+
+
+def test_blob_storage():
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    screed.make_db(_testfa, storage='blob')
+    db = screed.ScreedDB(_testfa)
+    assert dict(db.fields)['sequence'] == 'SLICEABLEBLOBATTR'
+
+    for expected in screed.open(_testfa, parse_description=True):
+        sequence = db[expected.name].sequence
+        length = len(expected.sequence)
+        for start, stop in ((0, 10), (5, 50), (length - 5, length + 10),
+                            (length + 3, length + 10)):
+            assert sequence[start:stop] == expected.sequence[start:stop]
+            # Without incremental blob I/O
+            assert screed.screedRecord._screed_attr._slice(
+                sequence, start, stop - start) == \
+                expected.sequence[start:stop]
+        assert str(sequence) == expected.sequence
+        assert isinstance(str(sequence), str)
+
+    with pytest.raises(ValueError):
+        screed.make_db(_testfa, storage='zip')
+
+    db.close()
+    os.unlink(_testfa + fileExtension)
+
+
+def test_chunked_storage():
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    screed.make_db(_testfa, storage='chunked', chunk_size=10)
+    db = screed.ScreedDB(_testfa)
+
+    for expected in screed.open(_testfa, parse_description=True):
+        record = db[expected.name]
+        length = len(expected.sequence)
+        for start, stop in ((0, 10), (5, 50), (9, 11), (10, 20), (3, 3),
+                            (length - 5, length + 10),
+                            (length + 3, length + 10)):
+            assert record.sequence[start:stop] == \
+                expected.sequence[start:stop]
+        assert str(record.sequence) == expected.sequence
+        assert len(record.sequence) == length
+    assert [str(r.sequence) for r in db.itervalues(lazy=False)] == \
+        [r.sequence for r in screed.open(_testfa)]
+
+    # 402 bp in chunks of 10 bp
+    con = sqlite3.connect(_testfa + fileExtension)
+    assert con.execute('SELECT count(*) FROM sequence_CHUNKS WHERE '
+                       'record = 1').fetchone()[0] == 41
+    con.close()
+
+    db.close()
+    os.unlink(_testfa + fileExtension)
+
+
+@pytest.mark.parametrize('ordered', [False, True])
+def test_chunked_storage_order(monkeypatch, ordered):
+    if ordered and sqlite3.sqlite_version_info < (3, 44, 0):
+        pytest.skip('group_concat() has no ORDER BY before SQLite 3.44')
+    monkeypatch.setattr(screed.screedRecord, '_ORDERED_GROUP_CONCAT',
+                        ordered)
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    screed.make_db(_testfa, storage='chunked', chunk_size=10)
+
+    # Chunks stored without an index, in reverse order, are scanned in
+    # reverse order
+    con = sqlite3.connect(_testfa + fileExtension)
+    con.execute('ALTER TABLE sequence_CHUNKS RENAME TO chunks')
+    con.execute('CREATE TABLE sequence_CHUNKS (record, start, data)')
+    con.execute('INSERT INTO sequence_CHUNKS SELECT * FROM chunks '
+                'ORDER BY record, start DESC')
+    con.execute('DROP TABLE chunks')
+    con.commit()
+    con.close()
+
+    db = screed.ScreedDB(_testfa)
+    expected = [r.sequence for r in screed.open(_testfa)]
+    assert [str(r.sequence) for r in db.itervalues(lazy=False)] == expected
+    assert [str(r.sequence) for r in db.itervalues()] == expected
+    assert [r.sequence[5:25] for r in db.itervalues()] == \
+        [sequence[5:25] for sequence in expected]
+    db.close()
+    os.unlink(_testfa + fileExtension)
+
+
+def test_2bit_storage():
+    _testfa = utils.get_temp_filename('masked.fa')
+    sequences = {'masked': 'ACGTnnnnACGTNNNNRYacgtACGTAAAAccgg' * 5,
+                 'plain': 'ACGT' * 100 + 'AC',
+                 'empty': ''}
+    with open(_testfa, 'w') as fp:
+        for name in sorted(sequences):
+            fp.write('>%s\n%s\n' % (name, sequences[name]))
+    screed.make_db(_testfa, storage='2bit')
+    db = screed.ScreedDB(_testfa)
+
+    for name, sequence in sequences.items():
+        record = db[name]
+        length = len(sequence)
+        for start, stop in ((0, 10), (5, 50), (3, 3), (4, 8), (17, 19),
+                            (length - 5, length + 10),
+                            (length + 3, length + 10)):
+            assert record.sequence[start:stop] == sequence[start:stop]
+        assert str(record.sequence) == sequence
+        assert len(record.sequence) == length
+    assert sorted(db.lengths()) == sorted(len(s) for s in sequences.values())
+    assert db.fetch_regions([('masked', 2, 10, '-')]) == ['GTnnnnAC']
+
+    # Four bases a byte
+    con = sqlite3.connect(_testfa + fileExtension)
+    assert con.execute("SELECT length(sequence) FROM DICTIONARY_TABLE "
+                       "WHERE name = 'plain'").fetchone()[0] == 12 + 101
+    con.close()
+
+    db.close()
+    os.unlink(_testfa + fileExtension)
+
+
+def test_format_version_2():
+    _testfq = utils.get_temp_filename('test.fastq')
+    shutil.copy(utils.get_test_data('test.fastq'), _testfq)
+    screed.make_db(_testfq)
+    db = screed.ScreedDB(_testfq)
+    assert db.format_version == 1
+    expected = [dict(record) for record in db.itervalues()]
+    db.close()
+
+    screed.make_db(_testfq, format_version=2)
+    db = screed.ScreedDB(_testfq)
+    assert db.format_version == 2
+    assert [dict(record) for record in db.itervalues()] == expected
+    assert [dict(record) for record in db.get_many(db.keys())] == expected
+    assert dict(db[expected[3]['name']]) == expected[3]
+    assert dict(db.loadRecordByIndex(3)) == expected[3]
+    assert [field for field, role in db.fields] == \
+        ['id', 'name', 'annotations', 'sequence', 'quality']
+    assert list(db.lengths()) == \
+        [len(record['sequence']) for record in expected]
+
+    # Names and annotations only, in the dictionary table
+    con = sqlite3.connect(_testfq + fileExtension)
+    columns = [row[1] for row in
+               con.execute('PRAGMA table_info(DICTIONARY_TABLE)')]
+    assert columns == ['id', 'name', 'annotations', 'sequence_length',
+                       'quality_length']
+    assert con.execute('SELECT quality FROM quality_DATA WHERE id = 4') \
+        .fetchone()[0] == expected[3]['quality']
+    con.close()
+
+    db.close()
+    os.unlink(_testfq + fileExtension)
+
+
+def test_format_version_unknown():
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    with pytest.raises(ValueError):
+        screed.make_db(_testfa, format_version=3)
+
+    screed.make_db(_testfa)
+    con = sqlite3.connect(_testfa + fileExtension)
+    con.execute("INSERT INTO SCREEDADMIN (FIELDNAME, ROLE) "
+                "VALUES ('3', 'FORMATVERSION')")
+    con.commit()
+    con.close()
+    with pytest.raises(TypeError):
+        screed.ScreedDB(_testfa)
+    os.unlink(_testfa + fileExtension)
+
+
+@pytest.mark.parametrize('filename', ['test.fa', 'test.fastq',
+                                      'test.fastq.gz'])
+@pytest.mark.parametrize('storage,format_version', [('text', 1),
+                                                    ('2bit', 1),
+                                                    ('blob', 2)])
+def test_make_db_workers(filename, storage, format_version):
+    _testfile = utils.get_temp_filename(filename)
+    shutil.copy(utils.get_test_data(filename), _testfile)
+    screed.make_db(_testfile, storage=storage, format_version=format_version)
+    db = screed.ScreedDB(_testfile)
+    expected = [dict((key, str(value)) for key, value in record.items())
+                for record in db.itervalues()]
+    db.close()
+
+    timings = screed.make_db(_testfile, storage=storage,
+                             format_version=format_version, workers=2)
+    db = screed.ScreedDB(_testfile)
+    assert [dict((key, str(value)) for key, value in record.items())
+            for record in db.itervalues()] == expected
+    assert list(db.lengths()) == \
+        [len(record['sequence']) for record in expected]
+    db.close()
+    assert timings['total'] >= timings['insert']
+    assert ('workers' in timings) == (not filename.endswith('.gz'))
+    os.unlink(_testfile + fileExtension)
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_create_db_seqfile(workers):
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    with screed.open(_testfa, parse_description=True) as f:
+        expected = [(record.name, record.sequence) for record in f]
+
+    timings = screed.create_db(_testfa, screed.fasta.FieldTypes, None,
+                               workers=workers, seqfile=_testfa)
+    assert ('workers' in timings) == (workers is not None)
+    db = screed.ScreedDB(_testfa)
+    assert [(record.name, str(record.sequence))
+            for record in db.itervalues()] == expected
+    db.close()
+    os.unlink(_testfa + fileExtension)
+
+
+def test_create_db_records_or_file():
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    fields = screed.fasta.FieldTypes
+
+    # A file name is not an iterator of records, and is given on its own
+    with pytest.raises(TypeError):
+        screed.create_db(_testfa, fields, _testfa, workers=2)
+    with pytest.raises(TypeError):
+        screed.create_db(_testfa, fields, _testfa)
+    with pytest.raises(TypeError):
+        screed.create_db(_testfa, fields, None)
+    with screed.open(_testfa) as f:
+        with pytest.raises(TypeError):
+            screed.create_db(_testfa, fields, f, seqfile=_testfa)
+        with pytest.raises(TypeError):
+            screed.create_db(_testfa, fields, None, seqfile=f)
+        with pytest.raises(ValueError):
+            screed.create_db(_testfa, fields, f, workers=2)
+    assert not os.path.exists(_testfa + fileExtension)
+
+
+def test_create_db_workers_chunked():
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    fields = (('name', 'TEXTKEYATTR'), ('description', 'STANDARDATTR'),
+              ('sequence', 'SLICEABLECHUNKEDATTR'))
+    with pytest.raises(ValueError):
+        screed.create_db(_testfa, fields, None, storage='chunked',
+                         workers=2, seqfile=_testfa)
+
+    # make_db falls back to parsing serially
+    timings = screed.make_db(_testfa, storage='chunked', workers=2)
+    assert 'workers' not in timings
+    with screed.open(_testfa) as f:
+        expected = [record.sequence for record in f]
+    db = screed.ScreedDB(_testfa)
+    assert [str(record.sequence) for record in db.itervalues()] == expected
+    db.close()
+    os.unlink(_testfa + fileExtension)
+
+
+@pytest.mark.parametrize('profile', [None, 'fast'])
+def test_make_db_profiles(profile):
+    _testfq = utils.get_temp_filename('test.fastq')
+    shutil.copy(utils.get_test_data('test.fastq'), _testfq)
+    screed.make_db(_testfq, profile=profile)
+    db = screed.ScreedDB(_testfq)
+    with screed.open(_testfq) as f:
+        assert [record.quality for record in db.itervalues()] == \
+            [record.quality for record in f]
+    db.close()
+
+    con = sqlite3.connect(_testfq + fileExtension)
+    page_size = con.execute('PRAGMA page_size').fetchone()[0]
+    if profile is not None:
+        assert page_size == \
+            screed.createscreed.BUILD_PROFILES[profile]['page_size']
+    con.close()
+    os.unlink(_testfq + fileExtension)
+
+
+def test_make_db_pragmas():
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    screed.make_db(_testfa, profile='fast', pragmas={'page_size': 8192})
+    con = sqlite3.connect(_testfa + fileExtension)
+    assert con.execute('PRAGMA page_size').fetchone()[0] == 8192
+    con.close()
+
+    for profile, pragmas in (('fastest', None),
+                             (None, {'user_version': 3}),
+                             (None, {'cache_size': '1; DROP TABLE x'})):
+        with pytest.raises(ValueError):
+            screed.make_db(_testfa, profile=profile, pragmas=pragmas)
+    os.unlink(_testfa + fileExtension)
+
+
+_DUPLICATES = '>a\nACGT\n>b\nAC\n>a\nGG\n>a_2\nTT\n>a\nCC\n'
+
+
+@pytest.mark.parametrize('storage,format_version,workers', [
+    ('text', 1, None), ('chunked', 1, None), ('2bit', 2, None),
+    ('text', 2, 1)])
+@pytest.mark.parametrize('policy,expected', [
+    ('skip', [('a', 'ACGT'), ('b', 'AC'), ('a_2', 'TT')]),
+    ('keep-first', [('a', 'ACGT'), ('b', 'AC'), ('a_2', 'TT')]),
+    ('rename', [('a', 'ACGT'), ('b', 'AC'), ('a_2', 'GG'),
+                ('a_2_2', 'TT'), ('a_3', 'CC')]),
+])
+def test_make_db_duplicates(storage, format_version, workers, policy,
+                            expected):
+    _testfa = utils.get_temp_filename('duplicates.fa')
+    with open(_testfa, 'w') as f:
+        f.write(_DUPLICATES)
+    timings = screed.make_db(_testfa, storage=storage,
+                             format_version=format_version, workers=workers,
+                             duplicates=policy)
+    assert 'duplicates' in timings
+    db = screed.ScreedDB(_testfa)
+    assert [(record.name, str(record.sequence))
+            for record in db.itervalues()] == expected
+    assert len(db) == len(expected)
+    assert str(db.loadRecordByIndex(len(expected) - 1).sequence) == \
+        expected[-1][1]
+    db.close()
+    os.unlink(_testfa + fileExtension)
+
+
+@pytest.mark.parametrize('policy', ['error', 'report'])
+def test_make_db_duplicates_fail(policy):
+    _testfa = utils.get_temp_filename('duplicates.fa')
+    with open(_testfa, 'w') as f:
+        f.write(_DUPLICATES)
+    with pytest.raises(ValueError):
+        screed.make_db(_testfa, duplicates=policy)
+    assert not os.path.exists(_testfa + fileExtension)
+
+    with pytest.raises(ValueError):
+        screed.make_db(_testfa, duplicates='first')
+
+    # Without a policy, the index can't be created
+    with pytest.raises(sqlite3.IntegrityError):
+        screed.make_db(_testfa)
+    os.unlink(_testfa + fileExtension)
+
+
+@pytest.mark.parametrize('storage,format_version,workers', [
+    ('text', 1, None), ('chunked', 1, None), ('2bit', 2, None),
+    ('blob', 2, 1)])
+def test_make_db_append(storage, format_version, workers):
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    with screed.open(_testfa, parse_description=True) as f:
+        records = [(record.name, record.description, record.sequence)
+                   for record in f]
+    lanes = [utils.get_temp_filename('lane%d.fa' % i) for i in range(2)]
+    for lane, lane_records in zip(lanes, (records[:3], records[3:])):
+        with open(lane, 'w') as f:
+            for record in lane_records:
+                f.write('>%s %s\n%s\n' % record)
+
+    screed.make_db(lanes[0], storage=storage, format_version=format_version)
+    timings = screed.make_db(lanes[1], storage=storage,
+                             format_version=format_version, workers=workers,
+                             append=lanes[0])
+    assert 'index' not in timings
+    db = screed.ScreedDB(lanes[0])
+    assert len(db) == len(records)
+    assert [(record.name, record.description, str(record.sequence))
+            for record in db.itervalues()] == records
+    assert str(db.loadRecordByIndex(len(records) - 1).sequence) == \
+        records[-1][2]
+    assert list(db.lengths()) == [len(record[2]) for record in records]
+    db.close()
+    os.unlink(lanes[0] + fileExtension)
+
+
+@pytest.mark.parametrize('pragmas,synchronous', [(None, 'FULL'),
+                                                 ({'synchronous': 'OFF'},
+                                                  'OFF')])
+def test_make_db_append_synchronous(monkeypatch, pragmas, synchronous):
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    screed.make_db(_testfa, pragmas={'synchronous': 'OFF'})
+    fields = screed.fasta.FieldTypes
+
+    # The settings the build applies to its connection
+    settings = []
+    connect = sqlite3.connect
+
+    def traced_connect(*args, **kwargs):
+        con = connect(*args, **kwargs)
+        con.set_trace_callback(settings.append)
+        return con
+    monkeypatch.setattr(screed.createscreed.sqlite3, 'connect',
+                        traced_connect)
+
+    records = [{'name': 'extra', 'description': '', 'sequence': 'ACGT'}]
+    screed.create_db(_testfa, fields, iter(records), pragmas=pragmas,
+                     append=True)
+    assert [q for q in settings if q.startswith('PRAGMA synchronous')] == \
+        ['PRAGMA synchronous=%s' % synchronous]
+    os.unlink(_testfa + fileExtension)
+
+
+@pytest.mark.parametrize('storage', ['text', '2bit'])
+@pytest.mark.parametrize('workers', [None, 2])
+def test_make_db_append_without_lengths(storage, workers):
+    if sqlite3.sqlite_version_info < (3, 35, 0):
+        pytest.skip("needs ALTER TABLE DROP COLUMN")
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    with screed.open(_testfa, parse_description=True) as f:
+        records = [(record.name, record.description, record.sequence)
+                   for record in f]
+    lanes = [utils.get_temp_filename('lane%d.fa' % i) for i in range(2)]
+    for lane, lane_records in zip(lanes, (records[:3], records[3:])):
+        with open(lane, 'w') as f:
+            for record in lane_records:
+                f.write('>%s %s\n%s\n' % record)
+
+    # A database built before the lengths of sequences were stored
+    screed.make_db(lanes[0], storage=storage)
+    con = sqlite3.connect(lanes[0] + fileExtension)
+    con.execute("DELETE FROM SCREEDADMIN WHERE ROLE = 'LENGTHATTR'")
+    con.execute('ALTER TABLE DICTIONARY_TABLE DROP COLUMN sequence_length')
+    con.commit()
+    con.close()
+
+    screed.make_db(lanes[1], storage=storage, workers=workers,
+                   append=lanes[0])
+    db = screed.ScreedDB(lanes[0])
+    assert [(record.name, record.description, str(record.sequence))
+            for record in db.itervalues()] == records
+    if storage == 'text':  # Lengths of 2-bit sequences need them stored
+        assert list(db.lengths()) == [len(record[2]) for record in records]
+    db.close()
+    os.unlink(lanes[0] + fileExtension)
+
+
+def test_make_db_append_fails():
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    _testfq = utils.get_temp_filename('test.fastq')
+    shutil.copy(utils.get_test_data('test.fastq'), _testfq)
+    screed.make_db(_testfa)
+    db = screed.ScreedDB(_testfa)
+    expected = list(db.keys())
+    db.close()
+
+    # Other fields or storage
+    for filename, storage, format_version in ((_testfq, 'text', 1),
+                                              (_testfa, 'blob', 1),
+                                              (_testfa, 'text', 2)):
+        with pytest.raises(ValueError):
+            screed.make_db(filename, storage=storage,
+                           format_version=format_version, append=_testfa)
+    with pytest.raises(ValueError):
+        screed.make_db(_testfa, append=_testfa,
+                       pragmas={'journal_mode': 'OFF'})
+    with pytest.raises(ValueError):
+        screed.make_db(_testfa, append=utils.get_temp_filename('none.fa'))
+
+    # Duplicate names leave the database as it was
+    with pytest.raises(sqlite3.IntegrityError):
+        screed.make_db(_testfa, append=_testfa)
+    with pytest.raises(ValueError):
+        screed.make_db(_testfa, append=_testfa, duplicates='error')
+    db = screed.ScreedDB(_testfa)
+    assert list(db.keys()) == expected
+    db.close()
+
+    screed.make_db(_testfa, append=_testfa, duplicates='rename')
+    db = screed.ScreedDB(_testfa)
+    assert list(db.keys()) == expected + [key + '_2' for key in expected]
+    db.close()
+    os.unlink(_testfa + fileExtension)
+
+
+def test_fetch_regions():
+    _testfa = utils.get_temp_filename('test.fa')
+    shutil.copy(utils.get_test_data('test.fa'), _testfa)
+    screed.make_db(_testfa)
+    db = screed.ScreedDB(_testfa)
+    sequences = dict((r.name, r.sequence)
+                     for r in screed.open(_testfa, parse_description=True))
+    first, second = db.keys()[:2]
+
+    intervals = [(second, 10, 20, '+'), (first, 5, 30), (first, 20, 40, '-'),
+                 (first, 0, 0, '+'), (second, 80, 90, '-'),
+                 (first, 3, 6, '.')]
+    regions = db.fetch_regions(intervals)
+    assert regions == [sequences[second][10:20], sequences[first][5:30],
+                       screed.dna.rc(sequences[first][20:40]), '',
+                       screed.dna.rc(sequences[second][80:90]),
+                       sequences[first][3:6]]
+
+    bed = utils.get_temp_filename('regions.bed')
+    with open(bed, 'w') as fp:
+        fp.write('track name=test\n')
+        fp.write('%s\t20\t40\tr1\t0\t-\n' % first)
+        fp.write('%s\t10\t20\n' % second)
+    assert db.fetch_regions(bed) == [regions[2], regions[0]]
+
+    with pytest.raises(KeyError):
+        db.fetch_regions([('missing', 0, 10)])
+    with pytest.raises(ValueError):
+        db.fetch_regions([(first, 10, 5)])
+    with pytest.raises(ValueError):
+        db.fetch_regions([(first, 0, 2, 'x')])
+    with pytest.raises(ValueError):  # Past the end of the record
+        db.fetch_regions([(second, 85, 95, '-')])
+    with pytest.raises(KeyError):
+        db.fetch_regions([(first, 0, 2)], field='quality')
+
+    db.close()
+    os.unlink(_testfa + fileExtension)
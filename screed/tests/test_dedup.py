@@ -0,0 +1,68 @@
+import pytest
+
+from screed import dedup
+
+
+def test_key_set():
+    keys = ['read%d' % i for i in range(200000)]
+    stored = {}
+    keyset = dedup.KeySet(stored.get, size=16)
+    for i, key in enumerate(keys, 1):
+        assert keyset.find(key) is None
+        keyset.add(key, i)
+        if i % 1000 == 0:
+            # The keys added so far are looked up instead
+            stored.update((j, keys[j - 1]) for j in range(i - 999, i + 1))
+            keyset.flushed()
+    assert len(keyset) == len(keys)
+    assert keyset.find('read12345') == 12346
+    assert keyset.find('read200000') is None
+
+
+def test_key_set_collisions():
+    # Keys with the same hash are told apart by their stored key
+    class Key(str):
+        def __hash__(self):
+            return 42
+
+    keyset = dedup.KeySet({1: Key('a'), 2: Key('b')}.get)
+    keyset.add(Key('a'), 1)
+    keyset.add(Key('b'), 2)
+    keyset.flushed()
+    assert keyset.find(Key('b')) == 2
+    assert keyset.find(Key('c')) is None
+
+
+def test_key_set_bytes():
+    keyset = dedup.KeySet({1: u'read1'}.get)
+    keyset.add(b'read1', 1)
+    keyset.flushed()
+    assert keyset.find(b'read1') == 1
+
+
+@pytest.mark.parametrize('policy,expected,duplicates', [
+    ('skip', ['a', 'b', 'a_2'], ['a', 'a']),
+    ('keep-first', ['a', 'b', 'a_2'], ['a', 'a']),
+    # The second 'a' took the name 'a_2' first
+    ('rename', ['a', 'b', 'a_2', 'a_2_2', 'a_3'], ['a', 'a_2', 'a']),
+])
+def test_duplicate_filter(policy, expected, duplicates):
+    checker = dedup.DuplicateFilter(policy, {}.get)
+    kept = [checker.check(key) for key in ['a', 'b', 'a', 'a_2', 'a']]
+    assert [key for key in kept if key is not None] == expected
+    assert checker.duplicates == duplicates
+    assert checker.last_id == len(expected)
+
+
+def test_duplicate_filter_fails():
+    checker = dedup.DuplicateFilter('error', {}.get)
+    checker.check('a')
+    with pytest.raises(ValueError):
+        checker.check('a')
+
+    checker = dedup.DuplicateFilter('report', {}.get)
+    for key in ['a', 'b', 'a', 'b']:
+        checker.check(key)
+    with pytest.raises(ValueError) as excinfo:
+        checker.finish()
+    assert '2 records' in str(excinfo.value)
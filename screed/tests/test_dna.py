@@ -26,3 +26,8 @@ class Test_dna(object):
         dna = "ATCCG"
         reverse_complement = "CGGAT"
         assert screed.dna.reverse_complement(dna) == reverse_complement
+
+    def test_reverse_complement_iupac(args):
+        assert screed.dna.reverse_complement_iupac("ATCCG") == "CGGAT"
+        assert screed.dna.reverse_complement_iupac("acgtNRYk") == \
+            "mRYNacgt"
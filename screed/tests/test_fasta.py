@@ -109,6 +109,46 @@ class Test_fasta(object):
             assert entry == self.db[entry.name]
 
 
+class Test_fasta_blob(Test_fasta):
+
+    def setup(self):
+        self._testfa = utils.get_temp_filename('test.fa')
+        shutil.copy(utils.get_test_data('test.fa'), self._testfa)
+
+        screed.make_db(self._testfa, storage='blob')
+        self.db = screed.ScreedDB(self._testfa)
+
+
+class Test_fasta_chunked(Test_fasta):
+
+    def setup(self):
+        self._testfa = utils.get_temp_filename('test.fa')
+        shutil.copy(utils.get_test_data('test.fa'), self._testfa)
+
+        screed.make_db(self._testfa, storage='chunked', chunk_size=7)
+        self.db = screed.ScreedDB(self._testfa)
+
+
+class Test_fasta_2bit(Test_fasta):
+
+    def setup(self):
+        self._testfa = utils.get_temp_filename('test.fa')
+        shutil.copy(utils.get_test_data('test.fa'), self._testfa)
+
+        screed.make_db(self._testfa, storage='2bit')
+        self.db = screed.ScreedDB(self._testfa)
+
+
+class Test_fasta_v2(Test_fasta):
+
+    def setup(self):
+        self._testfa = utils.get_temp_filename('test.fa')
+        shutil.copy(utils.get_test_data('test.fa'), self._testfa)
+
+        screed.make_db(self._testfa, storage='blob', format_version=2)
+        self.db = screed.ScreedDB(self._testfa)
+
+
 class Test_fasta_whitespace(object):
 
     def setup(self):
@@ -179,3 +219,82 @@ def test_fasta_slicing():
 
         assert trimmed['sequence'] == record['sequence'][s]
         assert trimmed.sequence == record.sequence[s]
+
+
+def test_block_iter_matches_line_iter():
+    for name in ('test.fa', 'test-whitespace.fa'):
+        filename = utils.get_test_data(name)
+        with open(filename, 'rb') as fp:
+            expected = list(screed.fasta.fasta_iter(fp,
+                                                    parse_description=True))
+
+        # small block sizes force sequences to span block edges
+        for bufsize in (1, 7, 100, 4096):
+            with open(filename, 'rb') as fp:
+                records = list(screed.fasta.fasta_block_iter(
+                    fp, parse_description=True, bufsize=bufsize))
+            assert records == expected, (name, bufsize)
+
+
+def test_block_iter_whitespace():
+    s = ">1 FOO  \nAC GT \n\n  TT\r\n>2\nACGG"
+
+    expected = list(screed.fasta.fasta_iter(StringIO(s),
+                                            parse_description=True))
+    for bufsize in (1, 3, 1000):
+        records = list(screed.fasta.fasta_block_iter(
+            StringIO(s), parse_description=True, bufsize=bufsize))
+        assert records == expected
+    assert records[0].description == 'FOO'
+    assert [r.sequence for r in records] == ['AC GTTT', 'ACGG']
+
+
+def test_stream_iter_matches_line_iter():
+    for name in ('test.fa', 'test-whitespace.fa'):
+        filename = utils.get_test_data(name)
+        with open(filename, 'rb') as fp:
+            expected = list(screed.fasta.fasta_iter(fp,
+                                                    parse_description=True))
+
+        for bufsize in (1, 7, 100, 4096):
+            with open(filename, 'rb') as fp:
+                records = []
+                for record in screed.fasta.fasta_stream_iter(
+                        fp, parse_description=True, bufsize=bufsize):
+                    record['sequence'] = ''.join(record.sequence)
+                    records.append(record)
+            assert records == expected, (name, bufsize)
+
+
+def test_stream_iter_skips_unused_sequence():
+    s = ">1\nACGT\nAC\n>2 two\nGG\n"
+    stream = screed.fasta.fasta_stream_iter(StringIO(s), bufsize=3)
+    first = next(stream)
+    assert next(first.sequence) == 'ACGT'
+    second = next(stream)
+    assert second.name == '2 two'
+    assert list(second.sequence) == ['GG']
+    assert list(stream) == []
+
+    with screed.open(utils.get_test_data('test.fa'), engine='stream',
+                     parse_description=True) as records:
+        assert next(records).name == 'ENSMICT00000012722'
+
+
+def test_block_iter_bad_header():
+    s = StringIO("ACGT\n>1\nACGT\n")
+
+    try:
+        list(screed.fasta.fasta_block_iter(s))
+        assert 0, "should raise IOError"
+    except IOError as err:
+        assert "no '>' at beginning of line" in str(err)
+
+
+def test_open_block_engine():
+    filename = utils.get_test_data('test.fa.bz2')
+    with screed.open(filename, engine='block') as f:
+        records = list(f)
+    with screed.open(filename) as f:
+        assert records == list(f)
+    assert len(records) == 22
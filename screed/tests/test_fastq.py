@@ -126,6 +126,16 @@ class Test_fastq(object):
             assert entry == self.db[entry.name]
 
 
+class Test_fastq_v2(Test_fastq):
+
+    def setup(self):
+        self._testfq = utils.get_temp_filename('test.fastq')
+        shutil.copy(utils.get_test_data('test.fastq'), self._testfq)
+
+        screed.make_db(self._testfq, format_version=2)
+        self.db = screed.ScreedDB(self._testfq)
+
+
 def test_output_sans_desc():
     read = FakeRecord()
     read.name = 'foo'
@@ -198,3 +208,86 @@ def test_fastq_slicing():
 
         assert trimmed['quality'] == record['quality'][s]
         assert trimmed.quality == record.quality[s]
+
+
+def test_block_iter_matches_line_iter():
+    filename = utils.get_test_data('test.fastq')
+    with open(filename, 'rb') as fp:
+        expected = list(screed.fastq.fastq_iter(fp, parse_description=True))
+
+    # small block sizes force records to span block edges
+    for bufsize in (1, 7, 100, 4096):
+        with open(filename, 'rb') as fp:
+            records = list(screed.fastq.fastq_block_iter(
+                fp, parse_description=True, bufsize=bufsize))
+        assert records == expected, bufsize
+
+
+def test_block_iter_multiline():
+    s = ("@1 FOO\nACTG\nAC\n+\nAAAA\nAA\n"
+         "@2\nAC\nGG\n+2\nAA\nA\nA\n"
+         "@3\nACGT\n+\nAAAA")
+
+    expected = list(screed.fastq.fastq_iter(StringIO(s)))
+    for bufsize in (1, 3, 1000):
+        records = list(screed.fastq.fastq_block_iter(StringIO(s),
+                                                     bufsize=bufsize))
+        assert records == expected
+    assert [r.sequence for r in records] == ['ACTGAC', 'ACGG', 'ACGT']
+    assert [r.quality for r in records] == ['AAAAAA', 'AAAA', 'AAAA']
+
+
+def test_block_iter_bad_quality():
+    s = StringIO("@1\nACTG\n+\nAAAA\n@2\nACGG\n+\nAAA\n")
+
+    records = screed.fastq.fastq_block_iter(s, bufsize=4)
+    assert next(records).name == '1'
+    with pytest.raises(IOError) as e:
+        next(records)
+    assert 'sequence and quality strings must be' in str(e.value)
+
+
+def test_block_iter_bad_header():
+    s = StringIO("1\nACTG\n+\nAAAA\n")
+
+    with pytest.raises(IOError) as e:
+        list(screed.fastq.fastq_block_iter(s))
+    assert "no '@' at beginning of line" in str(e.value)
+
+
+def test_open_block_engine():
+    filename = utils.get_test_data('test.fastq.gz')
+    with screed.open(filename, engine='block') as f:
+        records = list(f)
+    with screed.open(filename) as f:
+        assert records == list(f)
+    assert len(records) == 125
+
+
+def test_output_bytes():
+    read = FakeRecord()
+    read.name = b'foo'
+    read.annotations = b''
+    read.sequence = b'ATCG'
+    read.quality = b'####'
+
+    fileobj = BytesIO()
+    write_fastx(read, fileobj)
+    assert fileobj.getvalue() == b'@foo\nATCG\n+\n####\n'
+
+
+def test_bytes_mode_roundtrip():
+    filename = utils.get_test_data('test.fastq')
+
+    text_out = BytesIO()
+    with screed.open(filename, parse_description=True) as f:
+        for record in f:
+            write_fastx(record, text_out)
+
+    bytes_out = BytesIO()
+    with screed.open(filename, parse_description=True, mode='bytes') as f:
+        for record in f:
+            assert isinstance(record.quality, bytes)
+            write_fastx(record, bytes_out)
+
+    assert bytes_out.getvalue() == text_out.getvalue()
@@ -0,0 +1,132 @@
+from __future__ import absolute_import
+import io
+import os
+import pickle
+import tempfile
+
+import pytest
+
+import screed
+from screed.mapped import MappedFastaRecord, MappedFastqRecord, _MappedRecord
+from screed.screedRecord import FastaRecord, FastqRecord, Record
+from . import screed_tst_utils as utils
+
+
+def _write_temp(data):
+    tempdir = tempfile.mkdtemp(prefix='screedtest_')
+    filename = os.path.join(tempdir, 'reads')
+    with io.open(filename, 'wb') as f:
+        f.write(data)
+    return filename
+
+
+@pytest.mark.parametrize('filename', ['test.fa', 'test.fastq',
+                                      'test-whitespace.fa'])
+@pytest.mark.parametrize('mode', ['text', 'bytes'])
+def test_mmap_matches_block(filename, mode):
+    filename = utils.get_test_data(filename)
+    for parse_description in (False, True):
+        with screed.open(filename, engine='block', mode=mode,
+                         parse_description=parse_description) as f:
+            expected = list(f)
+        with screed.open(filename, engine='mmap', mode=mode,
+                         parse_description=parse_description) as f:
+            records = list(f)
+        assert records == expected
+        assert [repr(r) for r in records] == [repr(r) for r in expected]
+
+
+def test_mmap_lazy_fastq():
+    filename = utils.get_test_data('test.fastq')
+    with screed.open(filename, engine='mmap') as f:
+        records = list(f)
+
+    record = records[0]
+    assert isinstance(record, MappedFastqRecord)
+    assert len(record) == 36
+    assert record.name == 'HWI-EAS_4_PE-FC20GCB:2:1:492:573/2'
+    assert 'sequence' not in record.d
+    assert record['sequence'] == 'ACAGCAAAATTGTGATTGAGGATGAAGAACTGCTGT'
+    assert 'quality' not in record.d
+
+
+def test_mmap_lazy_fasta():
+    filename = utils.get_test_data('test.fa')
+    with screed.open(filename, engine='mmap', parse_description=True) as f:
+        record = next(iter(f))
+
+    assert isinstance(record, MappedFastaRecord)
+    assert record.name == 'ENSMICT00000012722'
+    assert 'sequence' not in record.d
+    assert record.sequence.startswith('TGCAGAAAATATCAAGAGTCAGCAGAAAAAC')
+
+
+def test_mmap_set_and_pickle():
+    filename = utils.get_test_data('test.fastq')
+    with screed.open(filename, engine='mmap') as f:
+        record = next(iter(f))
+
+    record['sequence'] = 'ACGT'
+    record['extra'] = 1
+    assert record.sequence == 'ACGT'
+
+    copy = pickle.loads(pickle.dumps(record))
+    assert type(copy) is Record
+    assert copy == record
+    assert copy.extra == 1
+
+
+def test_mmap_multiline_fastq():
+    data = (b'@read1\nACGT\n+\nIIII\n'
+            b'@read2\nAC\nGT\n+\nII\nII\n'
+            b'@read3\nA\n+\nI\n')
+    with screed.open(_write_temp(data), engine='mmap') as f:
+        records = list(f)
+
+    assert [r.name for r in records] == ['read1', 'read2', 'read3']
+    assert records[1].sequence == 'ACGT'
+    assert isinstance(records[0], MappedFastqRecord)
+    assert type(records[1]) is Record
+
+
+def test_mmap_bad_fastq():
+    data = b'@read1\nACGT\n+\nIIII\n@read2\nACGT\n+\nIII\n'
+    with pytest.raises(IOError):
+        list(screed.open(_write_temp(data), engine='mmap'))
+
+
+def test_mmap_compressed_uses_block():
+    filename = utils.get_test_data('test.fastq.gz')
+    with screed.open(filename, engine='mmap') as f:
+        records = list(f)
+    assert len(records) == 125
+    assert type(records[0]) is Record
+
+
+@pytest.mark.parametrize('filename', ['test.fa', 'test.fastq',
+                                      'test.fastq.gz'])
+def test_mmap_slots_and_bufsize(filename):
+    filename = utils.get_test_data(filename)
+    with screed.open(filename, engine='block', slots=True) as f:
+        expected = list(f)
+    with screed.open(filename, engine='mmap', slots=True, bufsize=64) as f:
+        records = list(f)
+    assert records == expected
+    assert [type(r) for r in records] == [type(r) for r in expected]
+    assert type(records[0]) in (FastaRecord, FastqRecord)
+
+
+def test_mmap_slots_after_fallback():
+    data = (b'@read1\nACGT\n+\nIIII\n'
+            b'@read2\nAC\nGT\n+\nII\nII\n')
+    with screed.open(_write_temp(data), engine='mmap', slots=True,
+                     bufsize=8) as f:
+        records = list(f)
+
+    assert [type(r) for r in records] == [FastqRecord, FastqRecord]
+    assert records[1].sequence == 'ACGT'
+
+
+def test_mapped_record_is_abstract():
+    with pytest.raises(TypeError):
+        _MappedRecord(None, 0, 0)
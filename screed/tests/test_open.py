@@ -9,6 +9,8 @@ import os.path
 import sys
 import subprocess
 
+import pytest
+
 from . import screed_tst_utils as utils
 import screed
 import screed.openscreed
@@ -93,9 +95,67 @@ def test_gz_open_fastq():
     assert n > 0
 
 
+@pytest.mark.parametrize('extension,module', [('xz', 'lzma'),
+                                              ('zst', 'zstandard'),
+                                              ('lz4', 'lz4.frame')])
+def test_compressed_open(extension, module):
+    pytest.importorskip(module)
+    for name in ('test.fa', 'test.fastq'):
+        filename = utils.get_test_data(name)
+        with screed.open(filename) as f:
+            expected = list(f)
+        with screed.open(filename + '.' + extension) as f:
+            assert list(f) == expected
+
+
 def test_unknown_fileformat():
 
     try:
         screed.open(__file__)
     except ValueError as err:
         assert "unknown file format" in str(err)
+
+
+def test_open_unknown_engine():
+    filename = utils.get_test_data('test.fa')
+    with pytest.raises(ValueError) as e:
+        screed.open(filename, engine='foo')
+    assert "unknown parsing engine" in str(e.value)
+
+
+def test_open_bytes_mode():
+    for name in ('test.fa', 'test.fastq.gz'):
+        filename = utils.get_test_data(name)
+        for engine in ('line', 'block'):
+            with screed.open(filename, engine=engine, mode='bytes') as f:
+                records = list(f)
+            with screed.open(filename, engine=engine) as f:
+                expected = list(f)
+
+            assert len(records) == len(expected)
+            for record, text_record in zip(records, expected):
+                assert isinstance(record.name, bytes)
+                assert isinstance(record.sequence, bytes)
+                for key in text_record:
+                    assert record[key].decode('utf-8') == text_record[key]
+
+
+def test_open_unknown_mode():
+    filename = utils.get_test_data('test.fa')
+    with pytest.raises(ValueError) as e:
+        screed.open(filename, mode='foo')
+    assert "unknown mode" in str(e.value)
+
+
+def test_open_slots():
+    for name, record_class in (('test.fa', screed.FastaRecord),
+                               ('test.fastq', screed.FastqRecord)):
+        filename = utils.get_test_data(name)
+        for engine in ('line', 'block'):
+            with screed.open(filename, engine=engine, slots=True) as f:
+                records = list(f)
+            with screed.open(filename, engine=engine) as f:
+                expected = list(f)
+
+            assert all(isinstance(r, record_class) for r in records)
+            assert records == expected
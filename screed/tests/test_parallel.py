@@ -0,0 +1,92 @@
+from __future__ import absolute_import
+import io
+
+import pytest
+
+import screed
+from screed import parallel
+from . import screed_tst_utils as utils
+
+
+def _names(records):
+    return [record.name for record in records]
+
+
+@pytest.mark.parametrize('filename,first_char', [('test.fa', '>'),
+                                                 ('test.fastq', '@')])
+def test_parallel_matches_serial(filename, first_char):
+    filename = utils.get_test_data(filename)
+    with screed.open(filename) as f:
+        expected = list(f)
+
+    records = list(parallel.parallel_iter(filename, first_char, workers=2,
+                                          chunk_size=500))
+    assert records == expected
+
+
+def test_parallel_unordered():
+    filename = utils.get_test_data('test.fastq')
+    with screed.open(filename) as f:
+        expected = list(f)
+
+    records = list(parallel.parallel_iter(filename, '@', workers=2,
+                                          ordered=False, chunk_size=500))
+    assert sorted(_names(records)) == sorted(_names(expected))
+
+
+def test_parallel_rows():
+    filename = utils.get_test_data('test.fastq')
+    with screed.open(filename) as f:
+        expected = [(record.name, record.quality) for record in f]
+
+    timings = {}
+    batches = list(parallel.parallel_rows(filename, '@', ['name', 'quality'],
+                                          workers=2, chunk_size=500,
+                                          timings=timings))
+    assert len(batches) > 1
+    assert [row for rows in batches for row in rows] == expected
+    assert timings['workers'] > 0
+
+
+def test_open_workers():
+    filename = utils.get_test_data('test.fastq')
+    with screed.open(filename) as f:
+        expected = list(f)
+
+    with screed.open(filename, workers=2, mode='bytes') as f:
+        records = list(f)
+    assert [r.name.decode('utf-8') for r in records] == _names(expected)
+
+
+def test_open_workers_compressed_is_serial():
+    filename = utils.get_test_data('test.fastq.gz')
+    with screed.open(filename) as f:
+        expected = list(f)
+
+    with screed.open(filename, workers=2) as f:
+        assert list(f) == expected
+
+
+def test_find_record_start_fastq_quality_at():
+    data = (b'@read1\nACGT\n+\n@III\n'
+            b'@read2\nACGT\n+\nIIII\n')
+    handle = io.BytesIO(data)
+    # The quality line of read1 starts with '@' but is not a record start
+    assert parallel.find_record_start(handle, 1, '@') == data.index(b'@read2')
+    assert parallel.find_record_start(handle, 0, '@') == 0
+    assert parallel.find_record_start(handle, len(data) - 2, '@') == len(data)
+
+
+def test_find_record_start_fasta():
+    data = b'>a\nACGT\n>b\nGGGG\n'
+    handle = io.BytesIO(data)
+    assert parallel.find_record_start(handle, 1, '>') == data.index(b'>b')
+    assert parallel.find_record_start(handle, 8, '>') == 8
+    assert parallel.find_record_start(handle, 9, '>') == len(data)
+
+
+def test_find_record_start_multiline_fastq():
+    data = b''.join(b'@r%d\nACGT\nACGT\n+\nIIII\nIIII\n' % i
+                    for i in range(300))
+    with pytest.raises(ValueError):
+        parallel.find_record_start(io.BytesIO(data), 1, '@')
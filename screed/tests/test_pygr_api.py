@@ -9,6 +9,7 @@ from screed.pygr_api import ScreedSequenceDB, ScreedSequenceDB_ByIndex  # nopep8
 from pickle import dump, load  # nopep8
 from io import StringIO  # nopep8
 import os  # nopep8
+import re  # nopep8
 
 testfa = os.path.join(os.path.dirname(__file__), 'test.fa')
 
@@ -65,6 +66,23 @@ def test_seqinfodict_by_name():
     assert m == n, (m, n)
 
 
+def test_seqinfodict_by_name_lengths():
+    db1 = ScreedSequenceDB(testfa)
+    sd = db1.seqInfoDict
+
+    # the lengths come from the stored length column: no statement run
+    # while iterating reads the sequence column itself
+    statements = []
+    sd.sdb._db.set_trace_callback(statements.append)
+    lengths = sorted([(x.id, x.length) for x in sd.itervalues()])
+    sd.sdb._db.set_trace_callback(None)
+
+    assert [q for q in statements if re.search(r'\bsequence\b', q)] == []
+    expected = sorted([(r.name, len(str(r.sequence)))
+                       for r in sd.sdb.itervalues(lazy=False)])
+    assert lengths == expected
+
+
 def test_seqinfodict_by_index():
     db1 = ScreedSequenceDB_ByIndex(testfa)
     sd = db1.seqInfoDict
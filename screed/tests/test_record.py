@@ -1,5 +1,5 @@
 from __future__ import absolute_import, unicode_literals, print_function
-from screed import Record
+from screed import Record, FastaRecord, FastqRecord
 import pytest
 
 
@@ -32,3 +32,54 @@ def test_read_type_attributes():
     assert r.quality == 'good'
     assert r.name == '1234'
     assert r.annotations == 'ann'
+
+
+def test_slotted_record_access():
+    r = FastqRecord(name='1234', sequence='ACGT', annotations='ann',
+                    quality='good')
+    assert r.name == '1234'
+    assert r['sequence'] == 'ACGT'
+    assert r.annotations == 'ann'
+    assert r['quality'] == 'good'
+    assert len(r) == 4
+    assert sorted(r.keys()) == ['annotations', 'name', 'quality', 'sequence']
+    assert not hasattr(r, 'description')
+    assert not hasattr(r, '__dict__')
+
+    with pytest.raises(KeyError):
+        r['description']
+
+
+def test_slotted_record_quality_none():
+    r = FastqRecord(name='foo', sequence='ATGACG', quality=None)
+    assert not hasattr(r, 'quality')
+    assert 'quality' not in r
+
+
+def test_slotted_record_setitem():
+    r = FastaRecord(name='foo', sequence='ATGACG')
+    r['description'] = 'bar'
+    assert r.description == 'bar'
+
+    del r['description']
+    assert not hasattr(r, 'description')
+
+    with pytest.raises(KeyError):
+        r['quality'] = 'good'
+
+
+def test_slotted_record_slicing():
+    r = FastqRecord(name='foo', sequence='ATGACG', annotations='',
+                    quality='ABCDEF')
+    trimmed = r[1:4]
+    assert isinstance(trimmed, FastqRecord)
+    assert trimmed.name == 'foo'
+    assert trimmed.sequence == 'TGA'
+    assert trimmed.quality == 'BCD'
+    assert r.sequence == 'ATGACG'
+
+
+def test_slotted_record_equals_record():
+    fields = dict(name='foo', sequence='ATGACG', description='bar')
+    assert FastaRecord(**fields) == Record(**fields)
+    assert FastaRecord(**fields) != Record(name='foo', sequence='ATGACG')
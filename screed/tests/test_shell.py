@@ -96,6 +96,76 @@ class Test_fq_shell_module(test_fastq.Test_fastq):
         os.unlink(self._testfq + fileExtension)
 
 
+class Test_fq_shell_profile(test_fastq.Test_fastq):
+
+    """
+    Tests the 'db' command with a build profile and an overridden setting
+    """
+
+    def setup(self):
+        self._testfq = utils.get_temp_filename('test.fastq')
+        shutil.copy(utils.get_test_data('test.fastq'), self._testfq)
+
+        cmd = ['python', '-m', 'screed', 'db', self._testfq,
+               '--profile', 'fast', '--pragma', 'cache_size=-4096']
+        ret = subprocess.check_call(cmd, stdout=subprocess.PIPE)
+        assert ret == 0, ret
+        self.db = screed.ScreedDB(self._testfq)
+
+    def teardown(self):
+        os.unlink(self._testfq + fileExtension)
+
+
+class Test_fa_shell_duplicates(test_fasta.Test_fasta):
+
+    """
+    Tests the 'db' command checking for duplicate names as it inserts
+    """
+
+    def setup(self):
+        self._testfa = utils.get_temp_filename('test.fa')
+        shutil.copy(utils.get_test_data('test.fa'), self._testfa)
+
+        cmd = ['python', '-m', 'screed', 'db', self._testfa,
+               '--duplicates', 'error']
+        ret = subprocess.check_call(cmd, stdout=subprocess.PIPE)
+        assert ret == 0, ret
+        self.db = screed.ScreedDB(self._testfa)
+
+    def teardown(self):
+        os.unlink(self._testfa + fileExtension)
+
+
+class Test_fq_shell_append(test_fastq.Test_fastq):
+
+    """
+    Tests the 'db' command appending the records of a file to a database
+    """
+
+    def setup(self):
+        self._testfq = utils.get_temp_filename('test.fastq')
+        shutil.copy(utils.get_test_data('test.fastq'), self._testfq)
+        with open(self._testfq) as f:
+            lines = f.readlines()
+        lane = utils.get_temp_filename('lane.fastq')
+        with open(lane, 'w') as f:
+            f.writelines(lines[8:])
+        with open(self._testfq, 'w') as f:
+            f.writelines(lines[:8])
+
+        cmd = ['python', '-m', 'screed', 'db', self._testfq]
+        ret = subprocess.check_call(cmd, stdout=subprocess.PIPE)
+        assert ret == 0, ret
+        cmd = ['python', '-m', 'screed', 'db', lane, '--append',
+               self._testfq + fileExtension]
+        ret = subprocess.check_call(cmd, stdout=subprocess.PIPE)
+        assert ret == 0, ret
+        self.db = screed.ScreedDB(self._testfq)
+
+    def teardown(self):
+        os.unlink(self._testfq + fileExtension)
+
+
 class Test_convert_shell(test_fasta.Test_fasta):
 
     """
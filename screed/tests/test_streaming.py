@@ -10,8 +10,6 @@ import io
 import threading
 import subprocess
 
-import pytest
-
 import screed
 from . import screed_tst_utils as utils
 from . import test_fasta
@@ -67,24 +65,32 @@ def test_stream_fq():
     streamer(utils.get_test_data('test.fastq'))
 
 
-@pytest.mark.known_failing
 def test_stream_fa_gz():
     streamer(utils.get_test_data('test.fa.gz'))
 
 
-def test_stream_gz_fail():
-    try:
-        streamer(utils.get_test_data('test.fastq.gz'))
-        assert 0, "This should not work yet"
-    except ValueError as err:
-        print(str(err))
-
-
-@pytest.mark.known_failing
 def test_stream_fq_gz():
     streamer(utils.get_test_data('test.fastq.gz'))
 
 
+def test_stream_gz_stdin():
+    filename = utils.get_test_data('test.fastq.gz')
+    with screed.open(filename) as f:
+        expected = [read.name for read in f]
+
+    script = ("import screed\n"
+              "for read in screed.open('-'):\n"
+              "    print(read.name)\n")
+    with io.open(filename, 'rb') as ifile:
+        data = ifile.read()
+    topdir = os.path.dirname(os.path.dirname(os.path.abspath(screed.__file__)))
+    proc = subprocess.Popen([sys.executable, '-c', script], cwd=topdir,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    output, _ = proc.communicate(data)
+    assert proc.returncode == 0
+    assert output.decode('utf-8').split() == expected
+
+
 def test_stream_fa_bz2():
     streamer(utils.get_test_data('test.fa.bz2'))
 
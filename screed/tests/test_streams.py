@@ -0,0 +1,222 @@
+from __future__ import absolute_import
+import gzip
+import io
+import os
+import struct
+import tempfile
+import threading
+import zlib
+
+import pytest
+
+import screed
+from screed.streams import PrefetchReader, prefetch, open_gzip
+from screed.streams import BgzfReader, open_bgzf, is_bgzf, open_compressed
+from . import screed_tst_utils as utils
+
+
+class FailingFile(io.BytesIO):
+    def read(self, size=-1):
+        data = io.BytesIO.read(self, size)
+        if not data:
+            raise IOError("read failed")
+        return data
+
+
+@pytest.mark.parametrize('filename', ['test.fastq', 'test.fastq.gz',
+                                      'test.fastq.bz2', 'test.fa.gz'])
+@pytest.mark.parametrize('engine', ['line', 'block'])
+def test_open_prefetch(filename, engine):
+    filename = utils.get_test_data(filename)
+    with screed.open(filename) as f:
+        expected = list(f)
+
+    with screed.open(filename, engine=engine, prefetch=2,
+                     prefetch_size=100) as f:
+        assert list(f) == expected
+
+    with screed.open(filename, engine=engine, prefetch=True) as f:
+        assert list(f) == expected
+
+
+def test_prefetch_read():
+    data = b''.join(b'line %d\n' % i for i in range(1000))
+    stream = prefetch(io.BytesIO(data), depth=1, buffer_size=7)
+    assert stream.readline() == b'line 0\n'
+    assert stream.read(5) == b'line '
+    assert stream.read() == data[12:]
+    assert stream.read() == b''
+    stream.close()
+
+
+def test_prefetch_error():
+    stream = PrefetchReader(FailingFile(b'abc'), buffer_size=2)
+    assert stream.read(2) == b'ab'
+    assert stream.read(2) == b'c'
+    with pytest.raises(IOError):
+        stream.read(2)
+    stream.close()
+
+
+def test_prefetch_close_early():
+    fileobj = io.BytesIO(b'x' * 100000)
+    stream = PrefetchReader(fileobj, depth=1, buffer_size=10)
+    assert stream.read(3) == b'xxx'
+    stream.close()
+    assert stream.closed
+    assert fileobj.closed
+
+
+def test_prefetch_close_idle_pipe():
+    read_fd, write_fd = os.pipe()
+    fileobj = io.open(read_fd, 'rb', buffering=0)
+    stream = PrefetchReader(fileobj, depth=1, buffer_size=10)
+    os.write(write_fd, b'xxx')
+    assert stream.read(3) == b'xxx'
+
+    # The thread is blocked reading the pipe, whose writer is idle
+    closer = threading.Thread(target=stream.close)
+    closer.daemon = True
+    closer.start()
+    closer.join(10)
+    assert not closer.is_alive()
+    assert stream.closed
+
+    # Once the read returns, the thread closes the pipe
+    os.close(write_fd)
+    stream._thread.join(10)
+    assert fileobj.closed
+
+
+def test_prefetch_bad_depth():
+    with pytest.raises(ValueError):
+        PrefetchReader(io.BytesIO(b''), depth=0)
+
+
+def _gzip(data):
+    compressed = io.BytesIO()
+    with gzip.GzipFile(fileobj=compressed, mode='wb') as f:
+        f.write(data)
+    return compressed.getvalue()
+
+
+def test_gzip_members():
+    data = _gzip(b'first\n') + b'\x00' * 10 + _gzip(b'') + _gzip(b'second\n')
+    stream = open_gzip(io.BytesIO(data))
+    assert stream.peek(1).startswith(b'f')
+    assert stream.read() == b'first\nsecond\n'
+    assert stream.read() == b''
+
+
+def test_gzip_large():
+    data = b''.join(b'%d\n' % i for i in range(200000))
+    assert open_gzip(io.BytesIO(_gzip(data))).read() == data
+
+
+def test_gzip_truncated():
+    stream = open_gzip(io.BytesIO(_gzip(b'some data' * 100)[:-10]))
+    with pytest.raises(EOFError):
+        stream.read()
+
+
+def test_gzip_pipe():
+    data = b''.join(b'line %d\n' % i for i in range(10000))
+    compressed = _gzip(data)
+    read_fd, write_fd = os.pipe()
+
+    def writer():
+        with io.open(write_fd, 'wb') as f:
+            f.write(compressed)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    with open_gzip(io.open(read_fd, 'rb')) as stream:
+        assert stream.read() == data
+    thread.join()
+
+
+def _bgzf_block(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    header = struct.pack('<4BI2BH', 0x1f, 0x8b, 8, 4, 0, 0, 255, 6)
+    extra = struct.pack('<BBHH', 66, 67, 2, len(deflated) + 25)
+    trailer = struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data))
+    return header + extra + deflated + trailer
+
+
+def _bgzf(data, block_size=65280):
+    blocks = [_bgzf_block(data[i:i + block_size])
+              for i in range(0, len(data), block_size)]
+    return b''.join(blocks) + _bgzf_block(b'')
+
+
+def test_is_bgzf():
+    assert is_bgzf(_bgzf(b'data'))
+    assert not is_bgzf(_gzip(b'data'))
+    assert not is_bgzf(b'@read\n')
+
+
+def test_bgzf_read():
+    data = b''.join(b'line %d\n' % i for i in range(100000))
+    compressed = _bgzf(data, block_size=1000)
+    assert open_gzip(io.BytesIO(compressed)).read() == data
+    for threads in (1, 2, 3):
+        assert open_bgzf(io.BytesIO(compressed), threads).read() == data
+
+
+def test_bgzf_truncated():
+    compressed = _bgzf(b'some data' * 1000, block_size=100)
+    stream = open_bgzf(io.BytesIO(compressed[:-40]), threads=2)
+    with pytest.raises(EOFError):
+        stream.read()
+
+
+def test_bgzf_not_bgzf():
+    compressed = _bgzf(b'data') + _gzip(b'more data')
+    stream = open_bgzf(io.BytesIO(compressed), threads=2)
+    with pytest.raises(IOError):
+        stream.read()
+
+
+def test_bgzf_close_early():
+    fileobj = io.BytesIO(_bgzf(b'x' * 1000000, block_size=1000))
+    stream = BgzfReader(fileobj, threads=2)
+    assert stream.read(3) == b'xxx'
+    stream.close()
+    assert fileobj.closed
+
+
+@pytest.mark.parametrize('filename', ['test.fastq', 'test.fa'])
+def test_open_bgzf(filename):
+    filename = utils.get_test_data(filename)
+    with screed.open(filename) as f:
+        expected = list(f)
+    with io.open(filename, 'rb') as f:
+        compressed = _bgzf(f.read(), block_size=500)
+
+    tempdir = tempfile.mkdtemp(prefix='screedtest_')
+    bgzfname = os.path.join(tempdir, 'reads.gz')
+    with io.open(bgzfname, 'wb') as f:
+        f.write(compressed)
+
+    for threads in (None, 1, 2):
+        with screed.open(bgzfname, threads=threads) as f:
+            assert list(f) == expected
+    with screed.open(bgzfname, threads=2, engine='block') as f:
+        assert list(f) == expected
+
+
+def test_compressed_frames():
+    lzma = pytest.importorskip('lzma')
+    data = lzma.compress(b'first\n') + lzma.compress(b'second\n')
+    stream = open_compressed(io.BytesIO(data), 'xz')
+    assert stream.read() == b'first\nsecond\n'
+
+
+def test_compressed_zstd_frames():
+    zstandard = pytest.importorskip('zstandard')
+    compressor = zstandard.ZstdCompressor()
+    data = b''.join(b'%d\n' % i for i in range(100000))
+    compressed = (compressor.compress(data[:1000]) +
+                  compressor.compress(data[1000:]))
+    assert open_compressed(io.BytesIO(compressed), 'zstd').read() == data
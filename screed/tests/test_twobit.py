@@ -0,0 +1,51 @@
+import pytest
+
+from screed import twobit
+
+
+@pytest.mark.parametrize('sequence', [
+    '', 'A', 'ACG', 'ACGT', 'ACGTA', 'acgt', 'NNNN', 'ACGTNNNNRYacgtnnAC',
+    'nnnACGTrykmACG-*', 'ACGTACGTGGCCTTAA' * 13,
+])
+def test_round_trip(sequence):
+    assert twobit.decode(twobit.encode(sequence)) == sequence
+    assert twobit.decode(twobit.encode(sequence.encode('ascii'))) == sequence
+
+
+def test_packed_size():
+    # 12-byte header, then four bases a byte
+    assert len(twobit.encode('ACGT' * 1000)) == 12 + 1000
+    assert twobit.pack_bases(b'ACGTT') == b'\x1b\xc0'
+    assert twobit.unpack_bases(b'\x1b\xc0') == 'ACGTTAAA'
+
+
+def test_runs():
+    data = twobit.encode('ACnnNNRRaCGT')
+    header = twobit.read_header(lambda offset, size:
+                                data[offset:offset + size])
+    assert header.length == 12
+    starts, lengths, characters = header.exceptions
+    assert list(zip(starts, lengths, characters)) == \
+        [(2, 4, ord('N')), (6, 2, ord('R'))]
+    assert list(zip(*header.masks)) == [(2, 2), (8, 1)]
+
+
+def test_decode_region():
+    sequence = 'ACGTnnnnACGTNNRYacgtACGTAAAAcc'
+    data = twobit.encode(sequence)
+
+    def read(offset, size):
+        return data[offset:offset + size]
+
+    header = twobit.read_header(read)
+    for start in range(len(sequence) + 1):
+        for end in range(start, len(sequence) + 1):
+            first, last = start // 4, (end + 3) // 4
+            packed = read(header.offset + first, last - first)
+            assert twobit.decode_region(header, packed, first * 4,
+                                        start, end) == sequence[start:end]
+
+
+def test_not_ascii():
+    with pytest.raises(ValueError):
+        twobit.encode(u'ACGT\xe9')
@@ -0,0 +1,239 @@
+# Copyright (c) 2016, The Regents of the University of California.
+
+"""
+2-bit packing of DNA sequences, used by the '2bit' database storage.
+
+An encoded sequence is a header of three unsigned 32-bit little-endian
+integers (the length of the sequence, the number of exception runs and
+the number of soft-mask runs), then the exception runs as arrays of
+starts, lengths and characters, the soft-mask runs as arrays of starts
+and lengths (all unsigned 32-bit little-endian), and finally the bases,
+four per byte with the first one in the high bits. Exception runs are
+runs of the same character other than A, C, G or T (N, IUPAC codes),
+whose bases are packed as A; soft-mask runs are runs of lowercase
+letters. Sequences must be ASCII.
+
+Packing, unpacking and finding runs go through translation tables,
+hexadecimal conversions and searches for single bytes, so that they run
+in C instead of one base at a time.
+"""
+
+from __future__ import absolute_import
+
+import binascii
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+_HEADER = struct.Struct('<III')
+_RUN_ITEM = 4  # Size of the integers of the run arrays
+
+# Array type code of unsigned 32-bit integers
+_INDEX_TYPECODE = 'I' if array('I').itemsize == _RUN_ITEM else 'L'
+
+_EXCEPTION_RUNS = re.compile(br'([^ACGT])\1*')
+
+_BASES = bytearray(b'ACGT')
+_LOWERCASE = bytearray(b'abcdefghijklmnopqrstuvwxyz')
+_HEX = bytearray(b'0123456789abcdef')
+
+
+def _table(mapping):
+    """
+    Returns a bytes.translate() table making the given byte changes.
+    """
+    table = bytearray(range(256))
+    for old, new in mapping:
+        table[old] = new
+    return bytes(table)
+
+
+# Characters that are part of runs become b'1', the others b'0'
+_EXCEPTION_FLAGS = _table((byte, _HEX[byte not in _BASES])
+                          for byte in range(256))
+_MASK_FLAGS = _table((byte, _HEX[byte in _LOWERCASE]) for byte in range(256))
+
+# Packing goes through hexadecimal: the digits 0-3 of two bases read as a
+# hex byte become the hex digit of the pair, and two such digits read as
+# a hex byte become the packed byte. Unpacking does the reverse.
+# Characters other than ACGT are packed as A
+_BASE_DIGITS = _table((byte, _HEX[max(_BASES.find(bytearray([byte])), 0)])
+                      for byte in range(256))
+_DIGIT_BASES = _table(zip(_HEX[:4], _BASES))
+_PAIRS = [((high << 4) | low, _HEX[(high << 2) | low])
+          for high in range(4) for low in range(4)]
+_PAIR_DIGITS = _table(_PAIRS)
+_DIGIT_PAIRS = _table((digit, pair) for pair, digit in _PAIRS)
+
+
+class Header(object):
+
+    """
+    The length and the runs of an encoded sequence, and the offset of its
+    packed bases.
+    """
+
+    def __init__(self, length, exceptions, masks, offset):
+        self.length = length
+        self.exceptions = exceptions  # (starts, lengths, characters)
+        self.masks = masks  # (starts, lengths)
+        self.offset = offset
+
+
+def _to_bytes(values):
+    values = array(_INDEX_TYPECODE, values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    try:
+        return values.tobytes()
+    except AttributeError:  # Python 2
+        return values.tostring()
+
+
+def _from_bytes(data):
+    values = array(_INDEX_TYPECODE)
+    try:
+        values.frombytes(data)
+    except AttributeError:  # Python 2
+        values.fromstring(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _flagged(flags):
+    """
+    Iterator over the (start, end) of the runs of b'1' in 'flags'.
+    """
+    end = 0
+    while True:
+        start = flags.find(b'1', end)
+        if start == -1:
+            return
+        end = flags.find(b'0', start)
+        if end == -1:
+            end = len(flags)
+        yield start, end
+
+
+def pack_bases(data):
+    """
+    Returns the bases of the uppercase ASCII bytes 'data' packed four per
+    byte, anything else than ACGT as A.
+    """
+    digits = data.translate(_BASE_DIGITS)
+    digits += b'0' * (-len(digits) % 4)
+    pairs = binascii.unhexlify(digits).translate(_PAIR_DIGITS)
+    return binascii.unhexlify(pairs)
+
+
+def unpack_bases(packed):
+    """
+    Returns the bases packed in 'packed', four per byte.
+    """
+    pairs = binascii.hexlify(packed).translate(_DIGIT_PAIRS)
+    return binascii.hexlify(pairs).translate(_DIGIT_BASES).decode('ascii')
+
+
+def encode(sequence):
+    """
+    Returns the encoded form of 'sequence', an ASCII str or bytes.
+    """
+    if not isinstance(sequence, bytes):
+        try:
+            sequence = sequence.encode('ascii')
+        except UnicodeError:
+            raise ValueError("2-bit packing needs ASCII sequences")
+    upper = sequence.upper()
+
+    exceptions = ([], [], [])
+    for start, end in _flagged(upper.translate(_EXCEPTION_FLAGS)):
+        for match in _EXCEPTION_RUNS.finditer(upper, start, end):
+            exceptions[0].append(match.start())
+            exceptions[1].append(match.end() - match.start())
+            exceptions[2].append(bytearray(match.group(1))[0])
+
+    masks = ([], [])
+    if upper != sequence:
+        for start, end in _flagged(sequence.translate(_MASK_FLAGS)):
+            masks[0].append(start)
+            masks[1].append(end - start)
+
+    header = _HEADER.pack(len(sequence), len(exceptions[0]), len(masks[0]))
+    return b''.join([header] + [_to_bytes(values)
+                                for values in exceptions + masks] +
+                    [pack_bases(upper)])
+
+
+def read_header(read):
+    """
+    Returns the Header of an encoded sequence, using read(offset, size)
+    to read the parts of it that are needed.
+    """
+    length, nexceptions, nmasks = _HEADER.unpack(read(0, _HEADER.size))
+    offset = _HEADER.size
+    size = (3 * nexceptions + 2 * nmasks) * _RUN_ITEM
+    runs = _from_bytes(read(offset, size)) if size else array(_INDEX_TYPECODE)
+    exceptions = tuple(runs[i * nexceptions:(i + 1) * nexceptions]
+                       for i in range(3))
+    masks = tuple(runs[3 * nexceptions + i * nmasks:
+                       3 * nexceptions + (i + 1) * nmasks]
+                  for i in range(2))
+    return Header(length, exceptions, masks, offset + size)
+
+
+def _overlapping(starts, lengths, start, end):
+    """
+    Iterator over the index, start and end of the runs overlapping
+    [start, end), clipped to it.
+    """
+    i = max(bisect_right(starts, start) - 1, 0)
+    while i < len(starts) and starts[i] < end:
+        if starts[i] + lengths[i] > start:
+            yield i, max(starts[i], start), min(starts[i] + lengths[i], end)
+        i += 1
+
+
+def decode_region(header, packed, offset, start, end):
+    """
+    Returns the region [start, end) of an encoded sequence, given its
+    Header and its packed bases from base 'offset' (a multiple of four)
+    on, at least up to 'end'.
+    """
+    bases = unpack_bases(packed)[start - offset:end - offset]
+
+    starts, lengths, characters = header.exceptions
+    pieces = []
+    position = start
+    for i, run_start, run_end in _overlapping(starts, lengths, start, end):
+        pieces.append(bases[position - start:run_start - start])
+        pieces.append(chr(characters[i]) * (run_end - run_start))
+        position = run_end
+    if pieces:
+        pieces.append(bases[position - start:])
+        bases = ''.join(pieces)
+
+    starts, lengths = header.masks
+    pieces = []
+    position = start
+    for i, run_start, run_end in _overlapping(starts, lengths, start, end):
+        pieces.append(bases[position - start:run_start - start])
+        pieces.append(bases[run_start - start:run_end - start].lower())
+        position = run_end
+    if pieces:
+        pieces.append(bases[position - start:])
+        bases = ''.join(pieces)
+    return bases
+
+
+def decode(data):
+    """
+    Returns the sequence encoded in 'data'.
+    """
+    def read(offset, size):
+        return data[offset:offset + size]
+
+    header = read_header(read)
+    return decode_region(header, data[header.offset:], 0, 0, header.length)
@@ -1,5 +1,12 @@
 # Copyright (c) 2016, The Regents of the University of California.
 
+# Default amount of data read at a time by the block-buffered parsers
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+# Parsing modes: 'text' decodes the input as UTF-8 into str, 'bytes'
+# leaves names, sequences and qualities as the bytes read from the file
+MODES = ('text', 'bytes')
+
 
 def to_str(line):
     try:
@@ -8,3 +15,68 @@ def to_str(line):
         pass
 
     return line
+
+
+def _as_is(line):
+    return line
+
+
+def check_mode(mode):
+    """
+    Raise ValueError if 'mode' is not a known parsing mode.
+    """
+    if mode not in MODES:
+        raise ValueError("unknown mode '%s', must be one of: %s" %
+                         (mode, ', '.join(MODES)))
+
+
+def get_decoder(mode):
+    """
+    Return the function applied to raw input in the given parsing mode.
+    """
+    check_mode(mode)
+    if mode == 'bytes':
+        return _as_is
+    return to_str
+
+
+def literals(mode, *values):
+    """
+    Return the given str literals as bytes when parsing in 'bytes' mode,
+    so that they can be compared against or joined with the input.
+    """
+    if mode == 'bytes':
+        return tuple(value.encode('ascii') for value in values)
+    return values
+
+
+def iter_line_blocks(handle, bufsize=DEFAULT_BLOCK_SIZE, decode=to_str):
+    """
+    Iterator over the given file handle returning blocks of roughly
+    'bufsize' characters that always end on a line boundary. Partial
+    lines are carried over to the next block; only the last block may
+    lack a trailing newline. Each block is passed through 'decode'.
+    """
+    tail = []
+    while True:
+        block = handle.read(bufsize)
+        if not block:
+            break
+
+        newline = b'\n' if isinstance(block, bytes) else '\n'
+        end = block.rfind(newline) + 1
+        if end == 0:  # No line ends in this block, keep reading
+            tail.append(block)
+            continue
+
+        if tail:
+            tail.append(block[:end])
+            yield decode(block[:0].join(tail))
+        else:
+            yield decode(block[:end])
+        tail = [block[end:]]
+
+    if tail:
+        last = tail[0][:0].join(tail)
+        if last:
+            yield decode(last)
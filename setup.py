@@ -30,6 +30,7 @@ setup(name='screed',
       setup_requires=['pytest-runner'],
       tests_require=['pytest >= 3.0', 'pytest-cov'],
       install_requires=['bz2file'],
+      extras_require={'zstd': ['zstandard'], 'lz4': ['lz4']},
       entry_points={'console_scripts': [
           'screed = screed.__main__:main'
           ]